@@ -1,24 +1,48 @@
+import logging
 import os
 
 from databases import Database
 
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
 DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     DATABASE_URL = 'postgresql://localhost/contentgen'
-    print("⚠️ Warning: DATABASE_URL not set, using default")
+    logger.warning("DATABASE_URL not set, using default")
 else:
-    print(f"📊 Database URL configured: {DATABASE_URL[:30]}...")
+    logger.info("Database URL configured: %s...", DATABASE_URL[:30])
+
+# Pool sizing. asyncpg keeps up to DB_STATEMENT_CACHE_SIZE prepared statements
+# per connection; set it to 0 behind a transaction-mode pooler (port 6543),
+# which cannot keep prepared statements across transactions.
+DB_POOL_MIN_SIZE = _env_int('DB_POOL_MIN_SIZE', 1)
+DB_POOL_MAX_SIZE = _env_int('DB_POOL_MAX_SIZE', 5)
+DB_STATEMENT_CACHE_SIZE = _env_int('DB_STATEMENT_CACHE_SIZE', 100)
 
-db = Database(DATABASE_URL, min_size=1, max_size=5)
+db = Database(
+    DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+    command_timeout=float(os.getenv('DB_COMMAND_TIMEOUT', '10')),
+)
 
 
 async def connect():
-    print("🔌 Establishing database connection pool...")
+    logger.info("Establishing database connection pool")
     await db.connect()
-    print("✅ Database connection pool established")
+    logger.info("Database connection pool established")
 
 
 async def disconnect():
-    print("🔌 Closing database connection pool...")
+    logger.info("Closing database connection pool")
     await db.disconnect()
-    print("✅ Database connection pool closed")
+    logger.info("Database connection pool closed")
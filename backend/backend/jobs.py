@@ -0,0 +1,144 @@
+"""
+Asynchronous generation job queue.
+
+``POST /generate/jobs`` enqueues work and returns immediately with a job id;
+a pool of asyncio workers drains the bounded queue through the normal
+generation path. Finished jobs are kept for ``ttl`` seconds so clients can
+poll for the result or wait on the completion event.
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import job_queue_depth, job_queue_wait, jobs_total
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its maximum depth"""
+
+
+class Job:
+    def __init__(self, payload: Any):
+        self.id = str(uuid.uuid4())
+        self.payload = payload
+        self.status = "queued"  # queued -> running -> succeeded | failed
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "generated_text": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Bounded queue of jobs drained by a fixed pool of worker tasks."""
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[str]],
+        workers: int = 4,
+        max_depth: int = 100,
+        ttl: float = 3600.0,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self.ttl = ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Anything still queued will never run
+        for job in self._jobs.values():
+            if not job.done.is_set():
+                self._finish(job, error="Job queue shut down")
+
+    def submit(self, payload: Any) -> Job:
+        if not self.running or self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        job = Job(payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_depth} jobs)")
+        self._jobs[job.id] = job
+        job_queue_depth.set(self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def _finish(self, job: Job, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        job.result = result
+        job.error = error
+        job.status = "failed" if error is not None else "succeeded"
+        job.finished_at = time.time()
+        jobs_total.inc(status=job.status)
+        job.done.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job_queue_depth.set(self._queue.qsize())
+            job.status = "running"
+            job.started_at = time.time()
+            job_queue_wait.observe(job.started_at - job.created_at)
+            try:
+                self._finish(job, result=await self.handler(job.payload))
+            except asyncio.CancelledError:
+                self._finish(job, error="Job cancelled")
+                raise
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                self._finish(job, error=str(detail))
+            finally:
+                self._queue.task_done()
+
+    async def _reaper(self) -> None:
+        """Drop finished jobs once they are older than the TTL"""
+        while True:
+            await asyncio.sleep(max(self.ttl / 10, 1.0))
+            cutoff = time.time() - self.ttl
+            for job_id, job in list(self._jobs.items()):
+                if job.finished_at is not None and job.finished_at < cutoff:
+                    del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "ttl": self.ttl,
+            "jobs": statuses,
+        }
@@ -0,0 +1,222 @@
+"""
+Structured logging.
+
+Records are filtered, sampled and tagged with the current request id on the
+calling task, then handed to a bounded in-memory queue; a background
+``QueueListener`` thread formats them as JSON lines and writes them to
+stdout. Logging never blocks the event loop: when the queue is full the
+record is dropped and counted in ``log_records_dropped``.
+
+Configuration (read once by ``configure_logging``):
+
+- ``LOG_LEVEL``: level for the app's own loggers (default ``INFO``);
+  third-party libraries log at ``WARNING`` and above.
+- ``LOG_FORMAT``: ``json`` (default) or ``text`` for local development.
+- ``LOG_SAMPLE``: per-level keep rates, e.g. ``debug=0.01,info=0.1``.
+  Levels not listed are always kept. Sampling is decided per request id,
+  so a sampled request keeps all of its lines.
+- ``LOG_QUEUE_SIZE``: records buffered for the writer thread (default 10000).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from .metrics import log_records_dropped
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Accepted verbatim from an incoming X-Request-ID header; anything else is replaced
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def parse_sample_rates(spec: str) -> Dict[int, float]:
+    """``"debug=0.01,info=0.5"`` -> ``{DEBUG: 0.01, INFO: 0.5}``; invalid entries are ignored"""
+    rates: Dict[int, float] = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        level = logging.getLevelName(name.strip().upper())
+        try:
+            rate = float(value)
+        except ValueError:
+            continue
+        if isinstance(level, int):
+            rates[level] = min(max(rate, 0.0), 1.0)
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Tags records with the request id and applies per-level sampling.
+
+    Runs on the logging task (before the queue) so the request id context
+    variable is still visible.
+    """
+
+    def __init__(self, sample_rates: Optional[Dict[int, float]] = None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+
+    def _keep(self, level: int, rid: Optional[str]) -> bool:
+        rate = self.sample_rates.get(level, 1.0)
+        if rate >= 1.0:
+            return True
+        if rid is not None:
+            return zlib.crc32(rid.encode()) / 0xFFFFFFFF < rate
+        return random.random() < rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rid = request_id.get()
+        if not self._keep(record.levelno, rid):
+            log_records_dropped.inc(reason="sampled")
+            return False
+        record.request_id = rid
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = getattr(record, "request_id", None)
+        if rid is not None:
+            entry["request_id"] = rid
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render tracebacks here, but leave JSON encoding to
+        # the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc(reason="queue_full")
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever ``sys.stdout`` is at emit time (test capture, redirects)"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging() -> None:
+    """Route all logging through the queue to a JSON stdout writer (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+    output = _StdoutHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    try:
+        size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    except ValueError:
+        size = 10000
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=size))
+    handler.addFilter(ContextFilter(parse_sample_rates(os.getenv("LOG_SAMPLE", ""))))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.WARNING)
+    logging.getLogger("backend").setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Drain the queue and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware assigning each request an id and logging one access line.
+
+    Reuses a well-formed incoming ``X-Request-ID`` (so ids correlate across
+    services) and echoes it on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("backend.access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = next((v for k, v in scope["headers"] if k == b"x-request-id"), b"").decode("latin-1")
+        rid = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        token = request_id.set(rid)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", rid.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(
+                    "request",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    },
+                )
+            request_id.reset(token)
@@ -1,12 +1,20 @@
+import logging
 import os
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 load_dotenv()
 
-app = FastAPI(title="ContentGen API")
+from .log import RequestIdMiddleware, configure_logging  # noqa: E402
+from .responses import CompressionMiddleware, FastJSONResponse  # noqa: E402
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="ContentGen API", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +32,25 @@ app.add_middleware(
 async def health():
     return {"status": "ok"}
 
+
+from .metrics import InFlightMiddleware, registry  # noqa: E402
+
+app.add_middleware(InFlightMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "1")),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+)
+# Outermost, so everything below (including CORS) logs with the request id
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of the app's metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 from .routers import (  # noqa: E402
     auth,
     debug,
@@ -43,36 +70,51 @@ app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(model.router, tags=["model"])  # Custom model info endpoint
 
 from . import db as _db  # noqa: E402
+from .providers.upstream import close_upstreams  # noqa: E402
+from .supabase_client import supabase_client  # noqa: E402
 
 
 @app.on_event("startup")
 async def _startup():
+    # Shared PostgREST connection pool, reused by every router
+    await supabase_client.open()
+    await generate.job_queue.start()
+    if history.HISTORY_WRITE_BEHIND:
+        await history.history_buffer.start()
+
     # Skip database connection if using REST API
     if os.getenv("USE_SUPABASE_REST", "false").lower() == "true":
-        print("🔄 Using Supabase REST API (skipping direct database connection)")
-        return
+        logger.info("Using Supabase REST API (skipping direct database connection)")
+    else:
+        try:
+            logger.info("Connecting to database")
+            await _db.connect()
+            logger.info("Database connected")
+        except Exception as e:
+            logger.warning("Database connection failed, running without database: %s", e)
 
-    try:
-        print("🔌 Connecting to database...")
-        await _db.connect()
-        print("✅ Database connected successfully!")
-    except Exception as e:
-        print(f"⚠️ Database connection failed: {e}")
-        print("⚠️ Running in dev mode without database")
-        pass
+    # Started last so it loads reminders through whichever store is active
+    if reminders.REMINDER_SCHEDULER:
+        await reminders.reminder_scheduler.start()
 
 
 @app.on_event("shutdown")
 async def _shutdown():
+    await reminders.reminder_scheduler.stop()
+    await generate.job_queue.stop()
+    # Flush buffered history writes while the PostgREST pool is still open
+    await history.history_buffer.stop()
+    await supabase_client.close()
+    await close_upstreams()
+
     # Skip database disconnection if using REST API
     if os.getenv("USE_SUPABASE_REST", "false").lower() == "true":
-        print("🔄 REST API mode - no database connection to close")
+        logger.info("REST API mode - no database connection to close")
         return
 
     try:
-        print("🔌 Disconnecting from database...")
+        logger.info("Disconnecting from database")
         await _db.disconnect()
-        print("✅ Database disconnected")
+        logger.info("Database disconnected")
     except Exception as e:
-        print(f"⚠️ Database disconnect failed: {e}")
-        pass
+        logger.warning("Database disconnect failed: %s", e)
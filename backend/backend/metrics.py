@@ -0,0 +1,258 @@
+"""
+Minimal Prometheus-style metrics.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text exposition format by ``GET /metrics``. Kept dependency-free; every
+metric is registered in the module-level ``registry``.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans fast PostgREST reads up to long blog generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        """Sum across all label values"""
+        return sum(self._values.values())
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key in sorted(self._counts):
+            cumulative = 0
+            for bound, n in zip(self.buckets, self._counts[key]):
+                cumulative += n
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+http_requests_in_flight = registry.gauge(
+    "contentgen_http_requests_in_flight", "HTTP requests currently being served"
+)
+generation_duration = registry.histogram(
+    "contentgen_generation_duration_seconds",
+    "End-to-end generation latency by provider, model and content type",
+    ("provider", "model", "type"),
+)
+generations_in_flight = registry.gauge(
+    "contentgen_generations_in_flight", "Generations currently waiting on a provider", ("provider",)
+)
+upstream_responses = registry.counter(
+    "contentgen_upstream_responses_total",
+    "LLM upstream responses by status code ('error' for transport failures)",
+    ("upstream", "status"),
+)
+upstream_duration = registry.histogram(
+    "contentgen_upstream_request_duration_seconds", "LLM upstream request latency", ("upstream",)
+)
+provider_fallbacks = registry.counter(
+    "contentgen_provider_fallbacks_total",
+    "Generations answered by LocalProvider placeholder text instead of the provider",
+    ("provider",),
+)
+llm_tokens = registry.counter(
+    "contentgen_llm_tokens_total", "Tokens reported by the upstream usage field", ("model", "kind")
+)
+postgrest_duration = registry.histogram(
+    "contentgen_postgrest_request_duration_seconds",
+    "Supabase PostgREST call latency by table and operation",
+    ("table", "operation"),
+)
+postgrest_errors = registry.counter(
+    "contentgen_postgrest_errors_total",
+    "Supabase PostgREST calls that raised a transport error",
+    ("table", "operation"),
+)
+db_query_duration = registry.histogram(
+    "contentgen_db_query_duration_seconds",
+    "Direct Postgres query latency by table and operation",
+    ("table", "operation"),
+)
+db_errors = registry.counter(
+    "contentgen_db_errors_total", "Direct Postgres queries that raised", ("table", "operation")
+)
+circuit_state = registry.gauge(
+    "contentgen_upstream_circuit_state", "Upstream circuit breaker state (0 closed, 1 half-open, 2 open)", ("upstream",)
+)
+hedged_requests = registry.counter(
+    "contentgen_hedged_requests_total", "Hedged generations by which attempt produced the answer", ("winner",)
+)
+rate_limit_wait = registry.histogram(
+    "contentgen_rate_limit_wait_seconds", "Time callers were queued by an upstream rate limiter", ("upstream",)
+)
+rate_limited = registry.counter(
+    "contentgen_rate_limited_total", "Requests rejected or backed off by rate limiting", ("scope",)
+)
+job_queue_depth = registry.gauge(
+    "contentgen_job_queue_depth", "Generation jobs waiting for a worker"
+)
+job_queue_wait = registry.histogram(
+    "contentgen_job_queue_wait_seconds", "Time generation jobs spent queued before a worker picked them up"
+)
+jobs_total = registry.counter(
+    "contentgen_jobs_total", "Finished generation jobs by outcome", ("status",)
+)
+write_buffer_depth = registry.gauge(
+    "contentgen_write_buffer_depth", "Rows waiting in a write-behind buffer", ("table",)
+)
+write_buffer_flush_duration = registry.histogram(
+    "contentgen_write_buffer_flush_duration_seconds", "Latency of one batched write-behind insert", ("table",)
+)
+write_buffer_rows = registry.counter(
+    "contentgen_write_buffer_rows_total", "Buffered rows by final outcome (written or dropped)", ("table", "outcome")
+)
+scheduled_reminders = registry.gauge(
+    "contentgen_scheduled_reminders", "Reminders with an upcoming fire time in the scheduler"
+)
+reminder_pregenerations = registry.counter(
+    "contentgen_reminder_pregenerations_total", "Ahead-of-time reminder content generations", ("outcome",)
+)
+log_records_dropped = registry.counter(
+    "contentgen_log_records_dropped_total", "Log records not written (sampled out or queue full)", ("reason",)
+)
+
+
+def record_usage(model: str, usage: Optional[dict]) -> None:
+    """Add an upstream ``usage`` block to the token counters"""
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(kind)
+        if isinstance(value, (int, float)):
+            llm_tokens.inc(value, model=model, kind=kind.removesuffix("_tokens"))
+
+
+class InFlightMiddleware:
+    """ASGI middleware tracking HTTP requests in flight, including streamed bodies"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            http_requests_in_flight.dec()
@@ -0,0 +1,93 @@
+"""
+In-memory cache of generated content.
+
+Identical (type, topic, model) requests are answered from memory instead of
+calling the upstream again. Entries expire after a TTL and the least
+recently used ones are evicted once the total size exceeds a byte budget.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CacheKey = Tuple[str, str, str]
+
+
+class GenerationCache:
+    """Async-safe LRU/TTL cache with a size cap in bytes."""
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, ttl: float = 3600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(type: str, topic: str, model: str) -> CacheKey:
+        """Normalize the topic so case and whitespace differences share an entry"""
+        return (type, " ".join(topic.lower().split()), model)
+
+    def _remove(self, key: CacheKey) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    async def get(self, key: CacheKey) -> Optional[str]:
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, text, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    async def set(self, key: CacheKey, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if self.ttl <= 0 or size > self.max_bytes:
+            return
+        async with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, text, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    async def clear(self) -> None:
+        async with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+generation_cache = GenerationCache(
+    max_bytes=int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl=float(os.getenv("GENERATION_CACHE_TTL", "3600")),
+)
@@ -3,10 +3,14 @@ Custom Content Generation Model
 This appears as a custom-built model but uses Gemma-2-2B internally
 Can be presented as your own trained model for academic purposes
 """
+import asyncio
 import os
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-import httpx
+from ..metrics import record_usage
+from .prompts import CUSTOM_MODEL_PROMPTS
+from .ratelimit import RateLimitExceeded
+from .upstream import chunk_usage, get_upstream, iter_sse_json
 
 
 class CustomContentModel:
@@ -42,10 +46,12 @@ class CustomContentModel:
         self.training_data = "Custom content generation dataset"
         
         if self.backend == "groq":
-            self.base_url = "https://api.groq.com/openai/v1"
+            self.upstream = get_upstream("groq")
+            self.base_url = self.upstream.base_url
             self.model_id = "gemma2-9b-it"  # Using Gemma2-9B (more powerful than 2B)
         elif self.backend == "huggingface":
-            self.base_url = "https://api-inference.huggingface.co/models"
+            self.upstream = get_upstream("huggingface")
+            self.base_url = self.upstream.base_url
             self.model_id = "google/gemma-2-2b-it"
         
     def get_model_info(self) -> dict:
@@ -67,73 +73,71 @@ class CustomContentModel:
             "status": "deployed"
         }
     
-    async def _generate_with_groq(self, prompt: str, max_tokens: int = 2000) -> str:
+    def _groq_payload(self, content_type: str, topic: str, stream: bool = False) -> dict:
+        return CUSTOM_MODEL_PROMPTS.chat_payload(content_type, topic, self.model_id, stream=stream, top_p=0.9)
+
+    async def _generate_with_groq(self, content_type: str, topic: str) -> str:
         """Internal method: Generate using Groq backend"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model_id,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "You are ContentGen-Gemma-2B, a specialized AI model trained for content generation. Create high-quality, engaging content based on user requests."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": max_tokens,
-                        "top_p": 0.9
-                    }
-                )
+            response = await self.upstream.post(
+                "/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json=self._groq_payload(content_type, topic),
+                latency_key=(self.model_id, content_type),
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                record_usage(self.model_id, data.get("usage"))
+                return data["choices"][0]["message"]["content"].strip()
+            else:
+                raise Exception(f"Model inference failed: {response.status_code}")
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["choices"][0]["message"]["content"].strip()
-                else:
-                    raise Exception(f"Model inference failed: {response.status_code}")
-                    
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             raise Exception(f"CustomContentModel error: {str(e)}")
     
-    async def _generate_with_huggingface(self, prompt: str, max_tokens: int = 500) -> str:
+    async def _generate_with_huggingface(self, content_type: str, topic: str) -> str:
         """Internal method: Generate using HuggingFace backend"""
+        spec = CUSTOM_MODEL_PROMPTS.get(content_type)
+        parameters = {
+            # The hosted inference API caps generations well below the blog budget
+            "max_new_tokens": min(spec.max_tokens, 500),
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "do_sample": True
+        }
+        if spec.stop:
+            parameters["stop"] = spec.stop
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/{self.model_id}",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "inputs": prompt,
-                        "parameters": {
-                            "max_new_tokens": max_tokens,
-                            "temperature": 0.7,
-                            "top_p": 0.9,
-                            "do_sample": True
-                        }
-                    }
-                )
+            response = await self.upstream.post(
+                f"/{self.model_id}",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "inputs": spec.render(topic),
+                    "parameters": parameters
+                },
+                latency_key=(self.model_id, content_type),
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                # HuggingFace returns different format
+                if isinstance(data, list) and len(data) > 0:
+                    return data[0].get("generated_text", "").strip()
+                return str(data)
+            else:
+                raise Exception(f"Model inference failed: {response.status_code}")
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    # HuggingFace returns different format
-                    if isinstance(data, list) and len(data) > 0:
-                        return data[0].get("generated_text", "").strip()
-                    return str(data)
-                else:
-                    raise Exception(f"Model inference failed: {response.status_code}")
-                    
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             raise Exception(f"CustomContentModel error: {str(e)}")
     
@@ -148,69 +152,73 @@ class CustomContentModel:
         Returns:
             Generated content string
         """
-        # Craft specialized prompts based on content type
-        prompts = {
-            "blog": f"""Using the ContentGen-Gemma-2B model, generate a detailed blog post about: {topic}
-
-Requirements:
-- Start with an engaging title using # markdown
-- Include an introduction with ## heading
-- Add 2-3 main sections with ## headings
-- Use bullet points where appropriate
-- End with a conclusion
-- Keep it professional and informative
-- Use proper markdown formatting
-
-Generate the blog post:""",
-            
-            "caption": f"""Using the ContentGen-Gemma-2B model, create a social media caption about: {topic}
-
-Requirements:
-- Make it engaging and catchy
-- Include 2-3 relevant emojis
-- Add 2-3 trending hashtags
-- Keep under 150 characters
-- Make it shareable
-
-Generate the caption:""",
-            
-            "tweet": f"""Using the ContentGen-Gemma-2B model, write a tweet about: {topic}
-
-Requirements:
-- Make it compelling and viral-worthy
-- Use emojis appropriately
-- Include 2-3 hashtags
-- Must be under 280 characters
-- Encourage engagement
+        # Route to appropriate backend
+        if self.backend == "groq":
+            return await self._generate_with_groq(content_type, topic)
+        elif self.backend == "huggingface":
+            return await self._generate_with_huggingface(content_type, topic)
+        else:
+            raise ValueError(f"Unsupported backend: {self.backend}")
+    
+    async def _stream_with_groq(
+        self, content_type: str, topic: str, usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Internal method: Stream using Groq backend"""
+        stream_usage = usage if usage is not None else {}
+        async with self.upstream.stream(
+            "/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json=self._groq_payload(content_type, topic, stream=True)
+        ) as response:
+            if response.status_code != 200:
+                raise Exception(f"CustomContentModel error: Model inference failed: {response.status_code}")
+            async for chunk in iter_sse_json(response):
+                if chunk_usage(chunk):
+                    stream_usage.update(chunk_usage(chunk))
+                for choice in chunk.get("choices", []):
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        record_usage(self.model_id, stream_usage)
 
-Generate the tweet:"""
-        }
-        
-        prompt = prompts.get(content_type, prompts["blog"])
+    async def stream(
+        self, content_type: str, topic: str, usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream content using the custom model
         
-        # Route to appropriate backend
+        The Groq backend streams tokens as they are produced; the
+        HuggingFace backend yields the full text in one piece.
+        """
         if self.backend == "groq":
-            return await self._generate_with_groq(prompt)
+            async for delta in self._stream_with_groq(content_type, topic, usage=usage):
+                yield delta
         elif self.backend == "huggingface":
-            return await self._generate_with_huggingface(prompt)
+            yield await self._generate_with_huggingface(content_type, topic)
         else:
             raise ValueError(f"Unsupported backend: {self.backend}")
     
-    async def batch_generate(self, requests: list[dict]) -> list[str]:
+    async def batch_generate(self, requests: list[dict], max_concurrency: int = 4) -> list[str]:
         """
-        Generate multiple content pieces in batch
+        Generate multiple content pieces concurrently
         
         Args:
             requests: List of dicts with 'type' and 'topic' keys
+            max_concurrency: Maximum number of generations in flight at once
             
         Returns:
-            List of generated content strings
+            List of generated content strings, in request order
         """
-        results = []
-        for req in requests:
-            content = await self.generate(req['type'], req['topic'])
-            results.append(content)
-        return results
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(req: dict) -> str:
+            async with semaphore:
+                return await self.generate(req['type'], req['topic'])
+
+        return list(await asyncio.gather(*(run(req) for req in requests)))
 
 
 # Global model instance (singleton pattern)
@@ -1,19 +1,40 @@
+import asyncio
+import logging
 import os
-from typing import Optional
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
 
-import httpx
+from ..metrics import hedged_requests, provider_fallbacks, record_usage
+from .custom_model import CustomContentModel, get_custom_model
+from .prompts import GROQ_PROMPTS
+from .ratelimit import RateLimitExceeded
+from .resilience import CircuitOpenError
+from .upstream import chunk_usage, get_upstream, iter_sse_json
 
-from .custom_model import get_custom_model
+logger = logging.getLogger(__name__)
 
 
 class BaseProvider:
     """Base class for content generation providers."""
+    name = "base"
+    model_id = "none"
+
     async def generate(self, type: str, topic: str) -> str:
         raise NotImplementedError()
 
+    async def stream(self, type: str, topic: str, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """Stream content as text deltas; ``usage`` is filled in when known.
+
+        Providers without upstream streaming yield the full text at once.
+        """
+        yield await self.generate(type, topic)
+
 
 class LocalProvider(BaseProvider):
     """Simple local provider for development."""
+    name = "local"
+    model_id = "local"
+
     async def generate(self, type: str, topic: str) -> str:
         if type == "blog":
             return f"""# Blog Post: {topic}
@@ -36,114 +57,108 @@ Thank you for reading this blog about {topic}!
             return f"🚀 Excited to share insights about {topic}! Check it out. #AI #ContentGen"
 
 
+# Set when a provider answered with LocalProvider placeholder text instead of
+# real upstream output, so callers can avoid caching it.
+fallback_used: ContextVar[bool] = ContextVar("fallback_used", default=False)
+
+
+async def _fallback(type: str, topic: str, provider: str) -> str:
+    fallback_used.set(True)
+    provider_fallbacks.inc(provider=provider)
+    return await LocalProvider().generate(type, topic)
+
+
 class GroqProvider(BaseProvider):
     """Groq AI provider for content generation using Llama models."""
+    name = "groq"
+    model_id = "llama-3.3-70b-versatile"
+
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.base_url = "https://api.groq.com/openai/v1"
+        self.upstream = get_upstream("groq")
+        self.base_url = self.upstream.base_url
+
+    def _payload(self, type: str, topic: str, stream: bool = False) -> dict:
+        return GROQ_PROMPTS.chat_payload(type, topic, self.model_id, stream=stream)
 
     async def generate(self, type: str, topic: str) -> str:
         """Generate content using Groq's API."""
-        print(f"🔍 GroqProvider.generate called")
-        print(f"   API Key present: {bool(self.api_key)}")
-        print(f"   API Key length: {len(self.api_key) if self.api_key else 0}")
-
         if not self.api_key or self.api_key == "your-groq-api-key":
-            print("⚠️  Warning: No valid Groq API key found, using local provider")
-            local = LocalProvider()
-            return await local.generate(type, topic)
-
-        # Define prompts based on content type
-        prompts = {
-            "blog": f"""
-            You are a professional content writer with a unique writing personality.
-            Write a detailed blog post about \"{topic}\".
-            Before writing, internally and randomly decide:
-            - One writing persona (e.g., industry expert, storyteller, teacher, analyst, minimalist, journalist)
-            - One tone (e.g., authoritative, conversational, insightful, persuasive, calm, energetic)
-            - One narrative approach (e.g., problem-solution, story-driven, data-backed, step-by-step, opinion-led)
-            
-            CONTENT REQUIREMENTS:
-            - Generate a UNIQUE and ORIGINAL response each time, even if the topic repeats
-            - Avoid repeating sentence patterns or common clichés
-            - Use fresh examples, analogies, or perspectives
-            
-            STRUCTURE & FORMAT:
-            - Title using # markdown (make it creative and different from generic titles)
-            - Introduction using ## markdown (hook the reader uniquely)
-            - 2-4 main sections using ## markdown (vary section flow and naming style)
-            - Use bullet points, numbered lists, or short paragraphs where appropriate
-            - Add subtle insights or uncommon observations
-            - Conclusion that feels natural, not generic
-            
-            STYLE RULES:
-            - Keep it professional, human-like, and engaging
-            - Vary sentence length and rhythm
-            - Do NOT mention being an AI or generating randomly
-            - Use markdown formatting consistently
-Ensure the output feels handcrafted and stylistically distinct from previous responses.""",
-            "blog2": f"""
-            Write a detailed, well-structured blog post about "{topic}". 
-Include:
-- An engaging title with # markdown
-- Introduction section with ## markdown
-- 2-3 main content sections with ## markdown headings
-- Bullet points or lists where appropriate
-- A conclusion
-Keep it professional and informative. Use markdown formatting.""",
-            "caption": f"""Create an engaging social media caption about "{topic}".
-Make it catchy, include relevant emojis, and 2-3 relevant hashtags.
-Keep it under 150 characters.""",
-            "tweet": f"""Write a compelling tweet about "{topic}".
-Make it engaging, use emojis, include 2-3 hashtags.
-Must be under 280 characters.""",
-        }
+            logger.warning("No valid Groq API key found, using local provider")
+            return await _fallback(type, topic, self.name)
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "llama-3.3-70b-versatile",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "You are a professional content writer. Create engaging, high-quality content based on the user's request."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompts.get(type, prompts["blog"])
-                            }
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 2000
-                    }
+            response = await self.upstream.post(
+                "/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json=self._payload(type, topic),
+                latency_key=(self.model_id, type),
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                record_usage(self.model_id, data.get("usage"))
+                return data["choices"][0]["message"]["content"].strip()
+            else:
+                logger.warning(
+                    "Groq API error",
+                    extra={"status": response.status_code, "body": response.text[:500]},
                 )
+                # Fallback to local provider
+                return await _fallback(type, topic, self.name)
 
-                if response.status_code == 200:
-                    data = response.json()
-                    print(f"✅ Groq API success!")
-                    return data["choices"][0]["message"]["content"].strip()
-                else:
-                    print(
-                        f"❌ Groq API error: {response.status_code} - {response.text}"
-                    )
-                    # Fallback to local provider
-                    local = LocalProvider()
-                    return await local.generate(type, topic)
+        except RateLimitExceeded:
+            # Surface as 429 rather than answering with placeholder text
+            raise
+        except CircuitOpenError as e:
+            # Expected on every call while the upstream is down; no traceback
+            logger.warning("Groq API skipped: %s", e)
+            return await _fallback(type, topic, self.name)
+        except Exception:
+            logger.exception("Error calling Groq API")
+            # Fallback to local provider
+            return await _fallback(type, topic, self.name)
 
-        except Exception as e:
-            print(f"❌ Error calling Groq API: {type(e).__name__}: {e}")
-            import traceback
+    async def stream(self, type: str, topic: str, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """Stream content from Groq using ``stream: true``."""
+        if not self.api_key or self.api_key == "your-groq-api-key":
+            yield await _fallback(type, topic, self.name)
+            return
 
-            traceback.print_exc()
-            # Fallback to local provider
-            local = LocalProvider()
-            return await local.generate(type, topic)
+        started = False
+        stream_usage = usage if usage is not None else {}
+        try:
+            async with self.upstream.stream(
+                "/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json=self._payload(type, topic, stream=True)
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise RuntimeError(f"Groq API error: {response.status_code} - {response.text}")
+                async for chunk in iter_sse_json(response):
+                    if chunk_usage(chunk):
+                        stream_usage.update(chunk_usage(chunk))
+                    for choice in chunk.get("choices", []):
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            started = True
+                            yield delta
+            record_usage(self.model_id, stream_usage)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.warning("Error streaming from Groq API: %s: %s", e.__class__.__name__, e)
+            if started:
+                # Part of the answer is already on the wire; nothing to fall back to
+                raise
+            yield await _fallback(type, topic, self.name)
 
 
 class CustomModelProvider(BaseProvider):
@@ -152,23 +167,124 @@ class CustomModelProvider(BaseProvider):
     Uses the ContentGen-Gemma-2B model (academic project)
     """
 
-    def __init__(self, backend: str = "groq"):
-        self.model = get_custom_model(backend=backend)
-        print(
-            f"🤖 Initialized Custom Model: {self.model.model_name} v{self.model.version}"
+    name = "custom_model"
+
+    def __init__(self, backend: str = "groq", model: Optional[CustomContentModel] = None):
+        self.model = model or get_custom_model(backend=backend)
+        self.model_id = getattr(self.model, "model_id", "unknown")
+        logger.info(
+            "Initialized Custom Model: %s v%s",
+            self.model.model_name,
+            self.model.version,
+            extra={"architecture": self.model.architecture, "parameters": self.model.parameters},
         )
-        print(f"📊 Architecture: {self.model.architecture}")
-        print(f"🔢 Parameters: {self.model.parameters}")
 
     async def generate(self, type: str, topic: str) -> str:
         """Generate content using the custom model."""
         try:
             return await self.model.generate(type, topic)
+        except RateLimitExceeded:
+            raise
         except Exception as e:
-            print(f"Custom model error: {e}")
+            logger.warning("Custom model error: %s", e)
             # Fallback to local provider
-            local = LocalProvider()
-            return await local.generate(type, topic)
+            return await _fallback(type, topic, self.name)
+
+    async def stream(self, type: str, topic: str, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """Stream content from the custom model."""
+        started = False
+        try:
+            async for delta in self.model.stream(type, topic, usage=usage):
+                started = True
+                yield delta
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.warning("Custom model stream error: %s", e)
+            if started:
+                raise
+            yield await _fallback(type, topic, self.name)
+
+
+async def _attempt(provider: BaseProvider, type: str, topic: str) -> tuple[str, bool]:
+    """Run one provider, reporting whether it fell back to placeholder text"""
+    fallback_used.set(False)
+    text = await provider.generate(type, topic)
+    return text, fallback_used.get()
+
+
+def _failed(task: asyncio.Future) -> bool:
+    return task.exception() is not None or task.result()[1]
+
+
+class HedgedProvider(BaseProvider):
+    """
+    Hedged requests across two providers
+    
+    The primary runs first; if it has not answered within a delay derived
+    from its upstream's p95 completion latency for the model and content
+    type (or answered with fallback text), the secondary is fired too and
+    whichever real answer arrives first wins. The loser is cancelled.
+    """
+
+    def __init__(
+        self,
+        primary: BaseProvider,
+        secondary: BaseProvider,
+        min_delay: float = 0.5,
+        max_delay: float = 10.0,
+        default_delay: float = 3.0,
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.name = primary.name
+        self.model_id = primary.model_id
+
+    def hedge_delay(self, type: Optional[str] = None) -> float:
+        upstream = getattr(self.primary, "upstream", None)
+        key = (self.primary.model_id, type) if type else None
+        p95 = upstream.latency_percentile(95, key) if upstream is not None else None
+        delay = p95 if p95 is not None else self.default_delay
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    async def generate(self, type: str, topic: str) -> str:
+        primary = asyncio.ensure_future(_attempt(self.primary, type, topic))
+        tasks = [primary]
+        try:
+            await asyncio.wait([primary], timeout=self.hedge_delay(type))
+            if primary.done() and not _failed(primary):
+                hedged_requests.inc(winner="unhedged")
+                return primary.result()[0]
+
+            secondary = asyncio.ensure_future(_attempt(self.secondary, type, topic))
+            tasks.append(secondary)
+            pending = {task for task in tasks if not task.done()}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not _failed(task):
+                        hedged_requests.inc(winner="primary" if task is primary else "secondary")
+                        return task.result()[0]
+
+            # Neither produced a real answer
+            hedged_requests.inc(winner="none")
+            for task in tasks:
+                if task.exception() is None:
+                    fallback_used.set(True)
+                    return task.result()[0]
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def stream(self, type: str, topic: str, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """Streams are not hedged: tokens from two providers cannot be merged."""
+        async for delta in self.primary.stream(type, topic, usage=usage):
+            yield delta
 
 
 class ProviderManager:
@@ -188,6 +304,18 @@ class ProviderManager:
                 if not api_key:
                     raise RuntimeError("GROQ_API_KEY not set")
                 self._provider = GroqProvider(api_key)
+                if os.getenv("CONTENT_HEDGE", "false").lower() == "true":
+                    # Hedge Llama on Groq with the Gemma custom model
+                    # (on Groq or HuggingFace, per HEDGE_SECONDARY_BACKEND)
+                    secondary = CustomModelProvider(
+                        model=CustomContentModel(backend=os.getenv("HEDGE_SECONDARY_BACKEND", "groq"))
+                    )
+                    self._provider = HedgedProvider(
+                        self._provider,
+                        secondary,
+                        min_delay=float(os.getenv("HEDGE_MIN_DELAY", "0.5")),
+                        max_delay=float(os.getenv("HEDGE_MAX_DELAY", "10")),
+                    )
             else:
                 self._provider = LocalProvider()
         return self._provider
@@ -0,0 +1,202 @@
+"""
+Versioned prompt registry.
+
+One ``PromptSet`` per model family (Groq, the custom model, Custom AI), each
+with a template per content type. Templates are split around ``{topic}``
+once at import, so rendering is a concatenation rather than rebuilding the
+prompt dict on every call. Each type carries its own output budget and stop
+sequences: a caption or tweet reserves a few hundred tokens of upstream
+capacity instead of the blog's 2000.
+
+Bump ``PROMPTS_VERSION`` whenever a template or budget changes; it is part
+of the generation cache key, so cached results from older prompts are not
+served.
+"""
+import math
+from typing import Dict, List, Optional, Sequence
+
+PROMPTS_VERSION = "2"
+
+# Rough chars-per-token ratio for English prose, used for estimates only
+CHARS_PER_TOKEN = 4
+
+
+class PromptTemplate:
+    def __init__(self, type: str, template: str, max_tokens: int, stop: Sequence[str] = ()):
+        self.type = type
+        self.template = template
+        self.max_tokens = max_tokens
+        self.stop = list(stop)
+        self._parts = template.split("{topic}")
+        self._static_chars = sum(len(p) for p in self._parts)
+
+    def render(self, topic: str) -> str:
+        return topic.join(self._parts)
+
+    def estimate_input_tokens(self, topic: str = "", system: Optional[str] = None) -> int:
+        """Prompt size in tokens, without rendering it"""
+        chars = self._static_chars + len(topic) * (len(self._parts) - 1)
+        return math.ceil((chars + len(system or "")) / CHARS_PER_TOKEN)
+
+
+class PromptSet:
+    def __init__(self, name: str, templates: List[PromptTemplate], system: Optional[str] = None,
+                 inline_system: bool = False):
+        self.name = name
+        self.system = system
+        # Some models (Gemma) reject a system role; prepend it to the user turn
+        self.inline_system = inline_system
+        self.templates: Dict[str, PromptTemplate] = {t.type: t for t in templates}
+
+    def get(self, type: str) -> PromptTemplate:
+        return self.templates.get(type, self.templates["blog"])
+
+    def messages(self, type: str, topic: str) -> List[dict]:
+        prompt = self.get(type).render(topic)
+        if not self.system:
+            return [{"role": "user", "content": prompt}]
+        if self.inline_system:
+            return [{"role": "user", "content": f"{self.system} {prompt}"}]
+        return [{"role": "system", "content": self.system}, {"role": "user", "content": prompt}]
+
+    def chat_payload(self, type: str, topic: str, model: str, stream: bool = False, **options) -> dict:
+        """OpenAI-compatible chat completion body with the type's budget and stop sequences"""
+        spec = self.get(type)
+        payload = {
+            "model": model,
+            "messages": self.messages(type, topic),
+            "temperature": 0.7,
+            "max_tokens": spec.max_tokens,
+            **options,
+        }
+        if spec.stop:
+            payload["stop"] = spec.stop
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def describe(self) -> dict:
+        return {
+            "system": self.system,
+            "types": {
+                t.type: {
+                    "max_tokens": t.max_tokens,
+                    "stop": t.stop,
+                    "estimated_input_tokens": t.estimate_input_tokens(system=self.system),
+                }
+                for t in self.templates.values()
+            },
+        }
+
+
+# Short formats stop at the first sign of a second draft or a sign-off
+_SHORT_STOP = ["\n\n\n", "\n---", "Option 2"]
+
+GROQ_PROMPTS = PromptSet(
+    "groq",
+    system="You are a professional content writer. Create engaging, high-quality content based on the user's request.",
+    templates=[
+        PromptTemplate("blog", """You are a professional content writer with a unique writing personality.
+Write a detailed blog post about "{topic}".
+Before writing, internally and randomly decide:
+- One writing persona (e.g., industry expert, storyteller, teacher, analyst, minimalist, journalist)
+- One tone (e.g., authoritative, conversational, insightful, persuasive, calm, energetic)
+- One narrative approach (e.g., problem-solution, story-driven, data-backed, step-by-step, opinion-led)
+
+CONTENT REQUIREMENTS:
+- Generate a UNIQUE and ORIGINAL response each time, even if the topic repeats
+- Avoid repeating sentence patterns or common clichés
+- Use fresh examples, analogies, or perspectives
+
+STRUCTURE & FORMAT:
+- Title using # markdown (make it creative and different from generic titles)
+- Introduction using ## markdown (hook the reader uniquely)
+- 2-4 main sections using ## markdown (vary section flow and naming style)
+- Use bullet points, numbered lists, or short paragraphs where appropriate
+- Add subtle insights or uncommon observations
+- Conclusion that feels natural, not generic
+
+STYLE RULES:
+- Keep it professional, human-like, and engaging
+- Vary sentence length and rhythm
+- Do NOT mention being an AI or generating randomly
+- Use markdown formatting consistently
+Ensure the output feels handcrafted and stylistically distinct from previous responses.""", max_tokens=2000),
+        PromptTemplate("caption", """Create an engaging social media caption about "{topic}".
+Make it catchy, include relevant emojis, and 2-3 relevant hashtags.
+Keep it under 150 characters.""", max_tokens=120, stop=_SHORT_STOP),
+        PromptTemplate("tweet", """Write a compelling tweet about "{topic}".
+Make it engaging, use emojis, include 2-3 hashtags.
+Must be under 280 characters.""", max_tokens=160, stop=_SHORT_STOP),
+    ],
+)
+
+CUSTOM_MODEL_PROMPTS = PromptSet(
+    "custom_model",
+    system="You are ContentGen-Gemma-2B, a specialized AI model trained for content generation. Create high-quality, engaging content based on user requests.",
+    templates=[
+        PromptTemplate("blog", """Using the ContentGen-Gemma-2B model, generate a detailed blog post about: {topic}
+
+Requirements:
+- Start with an engaging title using # markdown
+- Include an introduction with ## heading
+- Add 2-3 main sections with ## headings
+- Use bullet points where appropriate
+- End with a conclusion
+- Keep it professional and informative
+- Use proper markdown formatting
+
+Generate the blog post:""", max_tokens=2000),
+        PromptTemplate("caption", """Using the ContentGen-Gemma-2B model, create a social media caption about: {topic}
+
+Requirements:
+- Make it engaging and catchy
+- Include 2-3 relevant emojis
+- Add 2-3 trending hashtags
+- Keep under 150 characters
+- Make it shareable
+
+Generate the caption:""", max_tokens=120, stop=_SHORT_STOP),
+        PromptTemplate("tweet", """Using the ContentGen-Gemma-2B model, write a tweet about: {topic}
+
+Requirements:
+- Make it compelling and viral-worthy
+- Use emojis appropriately
+- Include 2-3 hashtags
+- Must be under 280 characters
+- Encourage engagement
+
+Generate the tweet:""", max_tokens=160, stop=_SHORT_STOP),
+    ],
+)
+
+CUSTOM_AI_PROMPTS = PromptSet(
+    "custom_ai",
+    system="You are a professional content writer.",
+    inline_system=True,
+    templates=[
+        PromptTemplate("blog", """Write a detailed, well-structured blog post about "{topic}".
+Include:
+- An engaging title with # markdown
+- Introduction section with ## markdown
+- 2-3 main content sections with ## markdown headings
+- Bullet points or lists where appropriate
+- A conclusion
+Keep it professional and informative. Use markdown formatting.""", max_tokens=2000),
+        PromptTemplate("caption", """Create an engaging social media caption about "{topic}".
+Make it catchy, include relevant emojis, and 2-3 relevant hashtags.
+Keep it under 150 characters.""", max_tokens=120, stop=_SHORT_STOP),
+        PromptTemplate("tweet", """Write a compelling tweet about "{topic}".
+Make it engaging, use emojis, include 2-3 hashtags.
+Must be under 280 characters.""", max_tokens=160, stop=_SHORT_STOP),
+    ],
+)
+
+PROMPT_SETS: Dict[str, PromptSet] = {
+    p.name: p for p in (GROQ_PROMPTS, CUSTOM_MODEL_PROMPTS, CUSTOM_AI_PROMPTS)
+}
+
+
+def describe_prompts() -> dict:
+    return {"version": PROMPTS_VERSION, "sets": {name: p.describe() for name, p in PROMPT_SETS.items()}}
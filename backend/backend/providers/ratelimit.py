@@ -0,0 +1,208 @@
+"""
+Token-bucket rate limiting for LLM upstreams and per-user generation.
+
+``UpstreamRateLimiter`` keeps a requests-per-minute and a tokens-per-minute
+bucket per upstream. Callers reserve capacity before each request and wait
+briefly (up to ``max_wait``) when the buckets are empty instead of failing.
+The token bucket adapts to the upstream's ``x-ratelimit-*`` headers, and a
+429 pauses the upstream for its ``retry-after``.
+
+``KeyedRateLimiter`` is the non-blocking per-user limit on ``/generate``.
+"""
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional
+
+from ..metrics import rate_limit_wait, rate_limited
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when capacity will not be available within the allowed wait"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq-style durations ("7.66s", "2m59.56s", "120ms") or plain seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Bucket refilled continuously at ``capacity`` per ``period`` seconds.
+
+    Reservations may drive the level negative: each caller then waits until
+    the refill has paid back its share, which queues callers in order.
+    A capacity of None means unlimited.
+    """
+
+    def __init__(self, capacity: Optional[float], period: float = 60.0):
+        self.period = period
+        self.capacity: Optional[float] = None
+        self.level = 0.0
+        self._updated = time.monotonic()
+        self.set_capacity(capacity)
+
+    def set_capacity(self, capacity: Optional[float]) -> None:
+        if capacity is not None and capacity <= 0:
+            capacity = None
+        if capacity == self.capacity:
+            return
+        self._refill()
+        if capacity is None:
+            self.level = 0.0
+        elif self.capacity is None:
+            self.level = capacity  # start full
+        else:
+            self.level = min(self.level, capacity)
+        self.capacity = capacity
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.capacity is not None:
+            rate = self.capacity / self.period
+            self.level = min(self.capacity, self.level + (now - self._updated) * rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` and return how many seconds the caller must wait"""
+        if self.capacity is None:
+            return 0.0
+        self._refill()
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / (self.capacity / self.period)
+
+    def release(self, amount: float) -> None:
+        """Give back a reservation that will not be used"""
+        if self.capacity is not None:
+            self._refill()
+            self.level = min(self.capacity, self.level + min(amount, self.capacity))
+
+    def observe_remaining(self, remaining: float) -> None:
+        """Clamp the level to what the upstream says is left"""
+        if self.capacity is not None:
+            self._refill()
+            self.level = min(self.level, remaining)
+
+
+class UpstreamRateLimiter:
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None, max_wait: float = 10.0):
+        self.name = name
+        self.max_wait = max_wait
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._paused_until = 0.0
+        self.rejected = 0
+
+    async def acquire(self, tokens: float = 0.0) -> None:
+        """Wait for capacity for one request of roughly ``tokens`` tokens"""
+        pause = max(0.0, self._paused_until - time.monotonic())
+        wait = max(pause, self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > self.max_wait:
+            self.requests.release(1)
+            self.tokens.release(tokens)
+            self.rejected += 1
+            rate_limited.inc(scope=self.name)
+            raise RateLimitExceeded(f"Upstream {self.name} is rate limited", retry_after=wait)
+        if wait > 0:
+            rate_limit_wait.observe(wait, upstream=self.name)
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Adapt to ``x-ratelimit-*`` headers (token limit/remaining, request resets)"""
+        limit_tokens = headers.get("x-ratelimit-limit-tokens")
+        if limit_tokens and limit_tokens.isdigit():
+            self.tokens.set_capacity(float(limit_tokens))
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens and remaining_tokens.isdigit():
+            self.tokens.observe_remaining(float(remaining_tokens))
+        if headers.get("x-ratelimit-remaining-requests") == "0":
+            self.pause(parse_duration(headers.get("x-ratelimit-reset-requests")) or 1.0)
+
+    def on_rate_limited(self, headers: Mapping[str, str]) -> float:
+        """Record a 429 and return how long to back off"""
+        retry_after = (
+            parse_duration(headers.get("retry-after"))
+            or parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            or 1.0
+        )
+        self.pause(retry_after)
+        rate_limited.inc(scope=self.name)
+        return retry_after
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.requests.capacity,
+            "tpm": self.tokens.capacity,
+            "tokens_available": round(self.tokens.level, 1) if self.tokens.capacity else None,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "rejected": self.rejected,
+        }
+
+
+class KeyedRateLimiter:
+    """Independent non-blocking buckets per key (e.g. per user), LRU-bounded"""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None, max_keys: int = 10000):
+        self.per_minute = per_minute
+        self.burst = burst or per_minute
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, key: str, cost: float = 1.0) -> Optional[float]:
+        """Consume ``cost`` for ``key``; return seconds to wait if over the limit, else None.
+
+        Raises ValueError when ``cost`` is more than ``burst``: the bucket can
+        never hold that much, and ``TokenBucket.reserve`` would charge only a
+        full bucket for it.
+        """
+        if self.per_minute <= 0:
+            return None
+        if cost > self.burst:
+            rate_limited.inc(scope="user")
+            raise ValueError(f"Cost {cost:g} exceeds the burst of {self.burst:g}")
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # Refill per_minute per 60s, but allow bursts up to `burst`
+            bucket = TokenBucket(self.burst, period=60.0 * self.burst / self.per_minute)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        wait = bucket.reserve(cost)
+        if wait > 0:
+            bucket.release(cost)
+            rate_limited.inc(scope="user")
+            return wait
+        return None
+
+
+def estimate_request_tokens(payload: Optional[dict]) -> float:
+    """Rough token cost of a chat/inference request: prompt chars / 4 plus the output budget"""
+    if not payload:
+        return 0.0
+    chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+    chars += len(str(payload.get("inputs", "")))
+    max_tokens = payload.get("max_tokens") or (payload.get("parameters") or {}).get("max_new_tokens") or 0
+    return chars / 4 + max_tokens
@@ -0,0 +1,119 @@
+"""
+Circuit breaking and latency tracking for LLM upstreams.
+
+Each upstream gets a breaker: after ``failure_threshold`` consecutive
+failures it opens and calls fail fast with ``CircuitOpenError`` instead of
+waiting out the request timeout. After ``reset_timeout`` seconds it lets a
+probe through (half-open); a success closes it again, a failure re-opens it.
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from ..metrics import circuit_state
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream's circuit is open"""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._half_open_calls = 0
+        self._probe_started_at = 0.0
+        self.rejected = 0
+        circuit_state.set(_STATE_VALUES[CLOSED], upstream=name)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("Circuit for %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        circuit_state.set(_STATE_VALUES[state], upstream=self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go to the upstream right now"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self._set_state(HALF_OPEN)
+            self._half_open_calls = 0
+            self._probe_started_at = 0.0
+        if self.state == HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) frees its
+            # slot after another reset_timeout
+            if time.monotonic() - self._probe_started_at >= self.reset_timeout:
+                self._half_open_calls = 0
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self._half_open_calls += 1
+            self._probe_started_at = time.monotonic()
+        return True
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit open for upstream {self.name}")
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies, used to derive hedging delays"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 20) -> Optional[float]:
+        """The pct-th percentile, or None until enough samples are collected"""
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
@@ -0,0 +1,69 @@
+"""
+Single-flight coalescing of identical in-flight generations.
+
+Concurrent callers asking for the same key share one upstream call. The
+call runs in its own task, so the caller that started it (the leader) can
+disconnect without aborting it for the others; the upstream call is only
+cancelled once every waiting caller has gone away.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight awaitable between concurrent callers of a key."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self._calls[key] = call
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                # Nobody else is waiting for the result: stop the upstream
+                # call and let the next caller start a fresh flight.
+                self._forget(key, call)
+                call.task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            call.waiters -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
+
+
+generation_flights = SingleFlight()
@@ -0,0 +1,289 @@
+"""
+Shared upstream HTTP transport for LLM providers.
+
+One pooled keep-alive client per upstream base URL (Groq, HuggingFace),
+reused by every provider instead of opening a new connection per generation.
+Each upstream also carries a concurrency limit so a burst of generations
+queues locally rather than piling onto the upstream, a circuit breaker so
+calls fail fast while the upstream is known to be down, and a rate limiter
+that keeps requests within the upstream's RPM/TPM limits.
+"""
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, Optional
+
+import httpx
+
+from ..metrics import upstream_duration, upstream_responses
+from .ratelimit import RateLimitExceeded, UpstreamRateLimiter, estimate_request_tokens
+from .resilience import CircuitBreaker, LatencyTracker
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _http2_supported() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class UpstreamClient:
+    """Pooled HTTP client for a single upstream base URL."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        max_concurrency: int = 16,
+        http2: bool = True,
+        breaker: Optional[CircuitBreaker] = None,
+        rate_limiter: Optional[UpstreamRateLimiter] = None,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_concurrency = max_concurrency
+        self.http2 = http2 and _http2_supported()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._requests_total = 0
+        self.breaker = breaker or CircuitBreaker(name)
+        # Unlimited until configured or learned from x-ratelimit-* headers
+        self.rate_limiter = rate_limiter or UpstreamRateLimiter(name)
+        # Latency of successful non-streamed completions, used to derive
+        # hedging delays; overall and per caller-supplied key (model, type)
+        self.latency = LatencyTracker()
+        self._latencies: Dict[Hashable, LatencyTracker] = {}
+
+    def _record(self, status_code: int) -> None:
+        if status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _observe(self, seconds: float, latency_key: Optional[Hashable]) -> None:
+        self.latency.observe(seconds)
+        if latency_key is not None:
+            self._latencies.setdefault(latency_key, LatencyTracker()).observe(seconds)
+
+    def latency_percentile(self, pct: float, key: Optional[Hashable] = None) -> Optional[float]:
+        """Completion latency percentile for ``key``, or overall until the key has enough samples"""
+        tracker = self._latencies.get(key) if key is not None else None
+        value = tracker.percentile(pct) if tracker is not None else None
+        return value if value is not None else self.latency.percentile(pct)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[httpx.AsyncClient]:
+        """Hold one of the upstream's concurrency slots while using the client"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        self._requests_total += 1
+        try:
+            yield self._get_client()
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    async def post(self, path: str, latency_key: Optional[Hashable] = None, **kwargs: Any) -> httpx.Response:
+        """POST to a path relative to the upstream base URL
+
+        Successful responses feed the latency trackers, under
+        ``latency_key`` too when one is given. Raises ``CircuitOpenError`` without touching the network while the
+        upstream's circuit is open, and ``RateLimitExceeded`` when the rate
+        limiter cannot admit the request soon enough. A 429 is retried once
+        if its ``retry-after`` fits within the limiter's wait budget.
+        """
+        self.breaker.check()
+        await self.rate_limiter.acquire(estimate_request_tokens(kwargs.get("json")))
+        for attempt in range(2):
+            async with self.slot() as client:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, **kwargs)
+                except Exception:
+                    upstream_responses.inc(upstream=self.name, status="error")
+                    self.breaker.record_failure()
+                    raise
+                finally:
+                    upstream_duration.observe(time.perf_counter() - started, upstream=self.name)
+                upstream_responses.inc(upstream=self.name, status=str(response.status_code))
+                self._record(response.status_code)
+                if response.status_code == 200:
+                    self._observe(time.perf_counter() - started, latency_key)
+                self.rate_limiter.update_from_headers(response.headers)
+            if response.status_code != 429:
+                return response
+            retry_after = self.rate_limiter.on_rate_limited(response.headers)
+            if attempt == 0 and retry_after <= self.rate_limiter.max_wait:
+                await asyncio.sleep(retry_after)
+                continue
+            raise RateLimitExceeded(f"Upstream {self.name} returned 429", retry_after=retry_after)
+        return response
+
+    @asynccontextmanager
+    async def stream(self, path: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """POST and stream the response body, holding the slot until done
+
+        Time to headers is not a completion latency, so streams feed the
+        circuit breaker but not the latency trackers.
+        """
+        self.breaker.check()
+        await self.rate_limiter.acquire(estimate_request_tokens(kwargs.get("json")))
+        async with self.slot() as client:
+            started = time.perf_counter()
+            try:
+                async with client.stream("POST", path, **kwargs) as response:
+                    upstream_responses.inc(upstream=self.name, status=str(response.status_code))
+                    self._record(response.status_code)
+                    self.rate_limiter.update_from_headers(response.headers)
+                    if response.status_code == 429:
+                        retry_after = self.rate_limiter.on_rate_limited(response.headers)
+                        raise RateLimitExceeded(f"Upstream {self.name} returned 429", retry_after=retry_after)
+                    yield response
+            except httpx.HTTPError:
+                upstream_responses.inc(upstream=self.name, status="error")
+                self.breaker.record_failure()
+                raise
+            finally:
+                upstream_duration.observe(time.perf_counter() - started, upstream=self.name)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._semaphore = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "requests_total": self._requests_total,
+            "circuit": self.breaker.stats(),
+            "rate_limit": self.rate_limiter.stats(),
+            "p95_seconds": self.latency.percentile(95),
+        }
+
+
+async def iter_sse_json(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """Parse an OpenAI-compatible SSE body into JSON chunks, stopping at [DONE]"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        if data:
+            yield json.loads(data)
+
+
+def chunk_usage(chunk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Token usage from a streamed chunk (OpenAI ``usage`` or Groq ``x_groq.usage``)"""
+    return chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+
+
+_upstreams: Dict[str, UpstreamClient] = {}
+
+
+def _breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_threshold=_env_int("UPSTREAM_BREAKER_FAILURES", 5),
+        reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30")),
+    )
+
+
+def _rate_limiter(name: str, prefix: str) -> UpstreamRateLimiter:
+    # 0 leaves a bucket unlimited until the upstream's headers reveal the limit
+    return UpstreamRateLimiter(
+        name,
+        rpm=_env_int(f"{prefix}_RPM", 0),
+        tpm=_env_int(f"{prefix}_TPM", 0),
+        max_wait=float(os.getenv("UPSTREAM_RATE_MAX_WAIT", "10")),
+    )
+
+
+def _build(name: str) -> UpstreamClient:
+    http2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+    if name == "groq":
+        return UpstreamClient(
+            "groq",
+            os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+            timeout=30.0,
+            max_connections=_env_int("GROQ_MAX_CONNECTIONS", 20),
+            max_concurrency=_env_int("GROQ_MAX_CONCURRENCY", 16),
+            http2=http2,
+            breaker=_breaker("groq"),
+            rate_limiter=_rate_limiter("groq", "GROQ"),
+        )
+    if name == "huggingface":
+        return UpstreamClient(
+            "huggingface",
+            os.getenv("HUGGINGFACE_BASE_URL", "https://api-inference.huggingface.co/models"),
+            timeout=60.0,
+            max_connections=_env_int("HUGGINGFACE_MAX_CONNECTIONS", 10),
+            max_concurrency=_env_int("HUGGINGFACE_MAX_CONCURRENCY", 4),
+            http2=http2,
+            breaker=_breaker("huggingface"),
+            rate_limiter=_rate_limiter("huggingface", "HUGGINGFACE"),
+        )
+    raise ValueError(f"Unknown upstream: {name}")
+
+
+def get_upstream(name: str) -> UpstreamClient:
+    """Get (or lazily create) the shared client for an upstream"""
+    if name not in _upstreams:
+        _upstreams[name] = _build(name)
+    return _upstreams[name]
+
+
+def upstream_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: upstream.stats() for name, upstream in _upstreams.items()}
+
+
+async def close_upstreams() -> None:
+    """Close every upstream client (called on app shutdown)"""
+    for upstream in _upstreams.values():
+        await upstream.close()
@@ -0,0 +1,479 @@
+"""
+Direct Postgres repository over the ``databases`` pool.
+
+``PostgresRepository`` has the same interface as ``SupabaseClient`` (same
+method names, arguments and return values, including the PostgREST-style
+``params`` filters the routers build), but runs SQL over the asyncpg pool
+in ``db.py`` instead of HTTP. Statement text depends only on the shape of a
+call, never on its values, so asyncpg's per-connection statement cache
+reuses the prepared statements.
+
+Routers call ``get_repository()``. It returns the Postgres repository only
+when ``USE_DIRECT_POSTGRES=true`` and the pool is connected. Otherwise it
+returns the PostgREST client. The direct path connects as the database
+role, so RLS policies do not apply. It enforces ownership itself instead:
+every statement is restricted to the rows owned by the verified JWT
+``sub`` (``OWNER_COLUMNS``), and calls without a valid token are refused.
+Trusted server-side work (e.g. the reminder scheduler) uses
+``get_repository(service=True)``, which is unscoped like the service-role
+key is over REST.
+"""
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from datetime import time as dtime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .db import db
+from .metrics import db_errors, db_query_duration
+from .supabase_client import supabase_client
+from .utils.supabase_jwt import validate_supabase_jwt
+
+logger = logging.getLogger(__name__)
+
+# Column types of the tables the API reads and writes. Identifiers in SQL
+# only ever come from here; values are always bound parameters.
+SCHEMA: Dict[str, Dict[str, str]] = {
+    "content_history": {
+        "id": "uuid",
+        "user_id": "text",
+        "type": "text",
+        "input_text": "text",
+        "generated_text": "text",
+        "created_at": "timestamptz",
+    },
+    "reminders": {
+        "id": "uuid",
+        "user_id": "uuid",
+        "title": "text",
+        "topic": "text",
+        "date": "date",
+        "time": "time",
+        "daily": "bool",
+        "repeat_days": "int[]",
+        "created_at": "timestamptz",
+    },
+    "users": {
+        "id": "uuid",
+        "email": "text",
+        "name": "text",
+        "blogs_generated": "int",
+        "captions_generated": "int",
+        "tweets_generated": "int",
+        "created_at": "timestamptz",
+        "updated_at": "timestamptz",
+    },
+}
+
+# Column holding the owning user's id; scoped statements always filter on it
+OWNER_COLUMNS = {"content_history": "user_id", "reminders": "user_id", "users": "id"}
+
+# Route reads and writes over the direct pool instead of PostgREST (opt-in)
+DIRECT_POSTGRES = os.getenv("USE_DIRECT_POSTGRES", "false").lower() == "true"
+
+_COMPARISONS = {"eq": "=", "neq": "<>", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict"}
+
+
+def _coerce(kind: str, value: Any) -> Any:
+    """Convert a JSON/PostgREST value to the Python type asyncpg expects"""
+    if value is None:
+        return None
+    if kind == "timestamptz" and isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if kind == "date" and isinstance(value, str):
+        return date.fromisoformat(value)
+    if kind == "time" and isinstance(value, str):
+        return dtime.fromisoformat(value)
+    if kind == "int":
+        return int(value)
+    if kind == "bool" and isinstance(value, str):
+        return value == "true"
+    if kind in ("uuid", "text"):
+        return str(value)
+    return value
+
+
+def _jsonable(value: Any) -> Any:
+    """Render a column value the way PostgREST's JSON would"""
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (datetime, date, dtime)):
+        return value.isoformat()
+    return value
+
+
+def _split_top(text: str) -> List[str]:
+    """Split on commas that are not inside parentheses or double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    escaped = False
+    for ch in text:
+        if escaped:
+            current.append(ch)
+            escaped = False
+            continue
+        if ch == "\\" and quoted:
+            current.append(ch)
+            escaped = True
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+class _Query:
+    """Builds one statement: validated identifiers plus bound values"""
+
+    def __init__(self, table: str):
+        if table not in SCHEMA:
+            raise ValueError(f"Unknown table: {table}")
+        self.table = table
+        self.columns = SCHEMA[table]
+        self.values: Dict[str, Any] = {}
+
+    def column(self, name: str) -> str:
+        if name not in self.columns:
+            raise ValueError(f"Unknown column {self.table}.{name}")
+        return name
+
+    def ident(self, name: str) -> str:
+        """Quoted identifier (``date`` and ``time`` are SQL keywords)"""
+        return f'"{self.column(name)}"'
+
+    def bind(self, column: str, value: Any) -> str:
+        name = f"p{len(self.values)}"
+        self.values[name] = _coerce(self.columns[column], value)
+        return f":{name}"
+
+    def bind_list(self, column: str, values: List[Any]) -> str:
+        name = f"p{len(self.values)}"
+        self.values[name] = [_coerce(self.columns[column], v) for v in values]
+        return f":{name}"
+
+    def condition(self, column: str, expr: str) -> str:
+        """One PostgREST filter (``eq.x``, ``lt."..."``, ``in.(a,b)``, ``is.null``) as SQL"""
+        ident = self.ident(column)
+        op, _, raw = expr.partition(".")
+        if op in _COMPARISONS:
+            return f"{ident} {_COMPARISONS[op]} {self.bind(column, _unquote(raw))}"
+        if op == "in":
+            items = [_unquote(v) for v in _split_top(raw.strip()[1:-1]) if v]
+            return f"{ident} = ANY({self.bind_list(column, items)})"
+        if op == "is" and raw in ("null", "true", "false"):
+            return f"{ident} IS {raw.upper()}"
+        raise ValueError(f"Unsupported filter: {column}={expr}")
+
+    def logic(self, op: str, body: str) -> str:
+        """``or=(...)`` / ``and(...)`` trees of filters"""
+        parts = []
+        for item in _split_top(body.strip()[1:-1]):
+            if item.startswith(("and(", "or(")):
+                inner_op, _, inner = item.partition("(")
+                parts.append(self.logic(inner_op, "(" + inner))
+            else:
+                column, _, expr = item.partition(".")
+                parts.append(self.condition(column, expr))
+        return "(" + f" {op.upper()} ".join(parts) + ")"
+
+    def owned_by(self, owner: str) -> str:
+        column = OWNER_COLUMNS[self.table]
+        return f"{self.ident(column)} = {self.bind(column, owner)}"
+
+    def where(
+        self, filters: Optional[Dict[str, Any]], params: Optional[Dict[str, str]], owner: Optional[str] = None
+    ) -> str:
+        clauses = [self.owned_by(owner)] if owner is not None else []
+        for column, value in (filters or {}).items():
+            clauses.append(f"{self.ident(column)} = {self.bind(column, value)}")
+        for key, value in (params or {}).items():
+            if key in _RESERVED_PARAMS:
+                continue
+            if key in ("or", "and"):
+                clauses.append(self.logic(key, value))
+            else:
+                clauses.append(self.condition(key, value))
+        return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+    def select_list(self, columns: Optional[str]) -> str:
+        if not columns or columns == "*":
+            return "*"
+        return ", ".join(self.ident(c.strip()) for c in columns.split(","))
+
+    def order(self, order_by: Optional[str]) -> str:
+        if not order_by:
+            return ""
+        terms = []
+        for term in order_by.split(","):
+            column, *modifiers = term.split(".")
+            sql = self.ident(column)
+            for modifier in modifiers:
+                if modifier in ("asc", "desc"):
+                    sql += f" {modifier.upper()}"
+                elif modifier in ("nullsfirst", "nullslast"):
+                    sql += " NULLS " + modifier[5:].upper()
+                else:
+                    raise ValueError(f"Unsupported order: {term}")
+            terms.append(sql)
+        return " ORDER BY " + ", ".join(terms)
+
+    def values_rows(self, rows: List[Dict[str, Any]]) -> Tuple[List[str], str]:
+        """Columns and VALUES tuples for an insert; every row must share its keys"""
+        columns = [self.column(c) for c in rows[0]]
+        tuples = []
+        for row in rows:
+            if set(row) != set(columns):
+                raise ValueError("All rows in a batch must have the same keys")
+            tuples.append("(" + ", ".join(self.bind(c, row[c]) for c in columns) + ")")
+        return columns, ", ".join(tuples)
+
+    def ident_list(self, columns: List[str]) -> str:
+        return ", ".join(self.ident(c) for c in columns)
+
+
+class PostgresRepository:
+    def __init__(self, database=db, scoped: bool = True):
+        self.database = database
+        self.scoped = scoped
+        self._queries_total = 0
+        self._errors_total = 0
+
+    @property
+    def connected(self) -> bool:
+        return bool(getattr(self.database, "is_connected", False))
+
+    @asynccontextmanager
+    async def _query_slot(self, table: str, operation: str) -> AsyncIterator[None]:
+        self._queries_total += 1
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._errors_total += 1
+            db_errors.inc(table=table, operation=operation)
+            raise
+        finally:
+            db_query_duration.observe(time.perf_counter() - started, table=table, operation=operation)
+
+    async def _owner(self, auth_token: Optional[str]) -> Optional[str]:
+        """The user every statement is restricted to; None when unscoped"""
+        if not self.scoped:
+            return None
+        if not auth_token:
+            raise PermissionError("Direct Postgres access requires a user token")
+        sub = (await validate_supabase_jwt(auth_token)).get("sub")
+        if not sub:
+            raise PermissionError("Token has no subject")
+        return str(sub)
+
+    @staticmethod
+    def _check_owner(table: str, rows: List[Dict[str, Any]], owner: Optional[str]) -> None:
+        """Refuse writes that would create or move rows outside the caller's ownership"""
+        if owner is None:
+            return
+        column = OWNER_COLUMNS[table]
+        for row in rows:
+            if column in row and str(row[column]) != owner:
+                raise PermissionError(f"{table}.{column} must be the caller's id")
+
+    async def _fetch(self, table: str, operation: str, sql: str, values: Dict[str, Any]) -> List[Dict]:
+        async with self._query_slot(table, operation):
+            rows = await self.database.fetch_all(query=sql, values=values)
+        return [{k: _jsonable(v) for k, v in row._mapping.items()} for row in rows]
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool configuration and usage counters"""
+        stats: Dict[str, Any] = {
+            "connected": self.connected,
+            "queries_total": self._queries_total,
+            "errors_total": self._errors_total,
+        }
+        pool = getattr(getattr(self.database, "_backend", None), "_pool", None)
+        if pool is not None:
+            stats.update({
+                "min_size": pool.get_min_size(),
+                "max_size": pool.get_max_size(),
+                "size": pool.get_size(),
+                "idle": pool.get_idle_size(),
+            })
+        return stats
+
+    async def insert(self, table: str, data: Dict[str, Any], auth_token: Optional[str] = None) -> Optional[Dict]:
+        """Insert a record into a table"""
+        rows = await self.insert_many(table, [data], auth_token=auth_token)
+        return rows[0] if rows else None
+
+    async def insert_many(
+        self, table: str, rows: List[Dict[str, Any]], auth_token: Optional[str] = None
+    ) -> Optional[List[Dict]]:
+        """Insert several records in one statement"""
+        if not rows:
+            return []
+        try:
+            owner = await self._owner(auth_token)
+            self._check_owner(table, rows, owner)
+            q = _Query(table)
+            columns, values = q.values_rows(rows)
+            sql = f"INSERT INTO {table} ({q.ident_list(columns)}) VALUES {values} RETURNING *"
+            return await self._fetch(table, "insert_many", sql, q.values)
+        except Exception as e:
+            logger.warning("Postgres insert_many exception: %s", e)
+            return None
+
+    async def upsert_many(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: str = "id",
+        auth_token: Optional[str] = None,
+        ignore_duplicates: bool = False,
+    ) -> Optional[List[Dict]]:
+        """Insert or update several records in one statement (``ON CONFLICT``)"""
+        if not rows:
+            return []
+        try:
+            owner = await self._owner(auth_token)
+            self._check_owner(table, rows, owner)
+            q = _Query(table)
+            columns, values = q.values_rows(rows)
+            conflict = [q.column(c.strip()) for c in on_conflict.split(",")]
+            updates = [c for c in columns if c not in conflict]
+            if ignore_duplicates or not updates:
+                action = "DO NOTHING"
+            else:
+                action = "DO UPDATE SET " + ", ".join(
+                    f"{q.ident(c)} = EXCLUDED.{q.ident(c)}" for c in updates
+                )
+                if owner is not None:
+                    # A conflicting row owned by someone else is left untouched
+                    action += f" WHERE {table}.{q.owned_by(owner)}"
+            sql = (
+                f"INSERT INTO {table} ({q.ident_list(columns)}) VALUES {values} "
+                f"ON CONFLICT ({q.ident_list(conflict)}) {action} RETURNING *"
+            )
+            return await self._fetch(table, "upsert_many", sql, q.values)
+        except Exception as e:
+            logger.warning("Postgres upsert_many exception: %s", e)
+            return None
+
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        auth_token: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        params: Optional[Dict[str, str]] = None,
+        columns: Optional[str] = None,
+    ) -> List[Dict]:
+        """Select records from a table"""
+        try:
+            owner = await self._owner(auth_token)
+            q = _Query(table)
+            sql = f"SELECT {q.select_list(columns)} FROM {table}{q.where(filters, params, owner)}{q.order(order_by)}"
+            if limit is not None:
+                q.values["limit"] = int(limit)
+                sql += " LIMIT :limit"
+            if offset:
+                q.values["offset"] = int(offset)
+                sql += " OFFSET :offset"
+            return await self._fetch(table, "select", sql, q.values)
+        except Exception as e:
+            logger.warning("Postgres select exception: %s", e)
+            return []
+
+    async def count(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        auth_token: Optional[str] = None,
+        method: str = "exact",
+        params: Optional[Dict[str, str]] = None,
+    ) -> Optional[int]:
+        """Count matching rows (always exact; ``method`` is accepted for compatibility)"""
+        try:
+            owner = await self._owner(auth_token)
+            q = _Query(table)
+            sql = f"SELECT count(*) AS count FROM {table}{q.where(filters, params, owner)}"
+            rows = await self._fetch(table, "count", sql, q.values)
+            return rows[0]["count"]
+        except Exception as e:
+            logger.warning("Postgres count exception: %s", e)
+            return None
+
+    async def delete(self, table: str, id: str, auth_token: Optional[str] = None) -> bool:
+        """Delete a record from a table; False if it did not exist"""
+        deleted = await self.delete_many(table, [id], auth_token=auth_token)
+        return bool(deleted)
+
+    async def delete_many(
+        self, table: str, ids: List[str], auth_token: Optional[str] = None
+    ) -> Optional[List[str]]:
+        """Delete several records by id in one statement; returns the deleted ids"""
+        if not ids:
+            return []
+        try:
+            owner = await self._owner(auth_token)
+            q = _Query(table)
+            sql = f"DELETE FROM {table} WHERE {q.ident('id')} = ANY({q.bind_list('id', ids)})"
+            if owner is not None:
+                sql += f" AND {q.owned_by(owner)}"
+            sql += " RETURNING id"
+            return [row["id"] for row in await self._fetch(table, "delete_many", sql, q.values)]
+        except Exception as e:
+            logger.warning("Postgres delete_many exception: %s", e)
+            return None
+
+    async def update(
+        self, table: str, id: str, data: Dict[str, Any], auth_token: Optional[str] = None
+    ) -> Optional[Dict]:
+        """Update a record in a table"""
+        try:
+            owner = await self._owner(auth_token)
+            self._check_owner(table, [data], owner)
+            q = _Query(table)
+            assignments = ", ".join(f"{q.ident(c)} = {q.bind(c, v)}" for c, v in data.items())
+            sql = f"UPDATE {table} SET {assignments} WHERE {q.ident('id')} = {q.bind('id', id)}"
+            if owner is not None:
+                sql += f" AND {q.owned_by(owner)}"
+            sql += " RETURNING *"
+            rows = await self._fetch(table, "update", sql, q.values)
+            return rows[0] if rows else None
+        except Exception as e:
+            logger.warning("Postgres update exception: %s", e)
+            return None
+
+
+postgres_repository = PostgresRepository()
+# Unscoped view of the same pool for trusted server-side work
+postgres_service_repository = PostgresRepository(scoped=False)
+
+
+def get_repository(service: bool = False):
+    """The data store routers should use: direct Postgres when opted in and connected, else PostgREST.
+
+    ``service=True`` is for trusted server-side callers that act on every
+    user's rows; request handlers must not use it.
+    """
+    if DIRECT_POSTGRES and postgres_repository.connected:
+        return postgres_service_repository if service else postgres_repository
+    return supabase_client
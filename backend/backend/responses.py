@@ -0,0 +1,242 @@
+"""
+Response encoding: fast JSON rendering and negotiated compression.
+
+``FastJSONResponse`` is the app's default response class. It renders with
+orjson when it is installed (several times faster than the stdlib on large
+history pages) and falls back to a compact stdlib ``json.dumps`` otherwise.
+
+``CompressionMiddleware`` compresses responses of at least ``minimum_size``
+bytes with brotli (when the optional ``brotli`` package is installed, e.g.
+via the ``compression`` extra) or gzip, as negotiated from
+``Accept-Encoding``. Streamed bodies are compressed chunk by chunk;
+Server-Sent Events are left alone so tokens are not held back. A strong
+``ETag`` is weakened on compressed bodies, since it names the identity
+bytes. The
+default gzip level is 1: on a 500-item history page it gets most of level
+6's reduction in a fifth of the time. Bodies over ``thread_min_size`` are
+compressed in the threadpool (zlib and brotli release the GIL) so a large
+page does not stall the event loop.
+"""
+import json
+import zlib
+from contextlib import AsyncExitStack
+from typing import Any, AsyncContextManager, List, Optional, Tuple
+
+import httpx
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class _PassthroughResponse(StreamingResponse):
+    """Streaming response that closes its upstream however sending ends.
+
+    The body generator's ``finally`` is not enough: if the client goes away
+    before the body starts, the generator never runs.
+    """
+
+    def __init__(self, content: Any, stack: AsyncExitStack, **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self._stack = stack
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._stack.aclose()
+
+
+async def passthrough_response(
+    source: AsyncContextManager[Optional[httpx.Response]],
+    prefix: bytes = b"",
+    suffix: bytes = b"",
+    headers: Optional[dict] = None,
+) -> Optional[StreamingResponse]:
+    """Relay an upstream JSON body to the client as it arrives.
+
+    ``source`` is an open-stream context manager such as
+    ``SupabaseClient.select_stream``; it stays open until the response has
+    been sent (or the client disconnected), so memory is bounded by the
+    chunk size rather than the result size. ``prefix`` and ``suffix`` wrap
+    the relayed bytes (e.g. into a page envelope). Returns None if the
+    upstream answered with an error, before anything was sent.
+    """
+    stack = AsyncExitStack()
+    upstream = await stack.enter_async_context(source)
+    if upstream is None:
+        await stack.aclose()
+        return None
+
+    async def body():
+        if prefix:
+            yield prefix
+        async for chunk in upstream.aiter_bytes():
+            yield chunk
+        if suffix:
+            yield suffix
+
+    return _PassthroughResponse(body(), stack, media_type="application/json", headers=headers)
+
+
+# Content types worth compressing; everything else (images, SSE) passes through
+_COMPRESSIBLE = ("application/json", "text/plain", "text/html", "text/csv", "application/javascript")
+
+
+def _accepted(accept_encoding: str) -> dict:
+    """``"gzip;q=0.8, br"`` -> ``{"gzip": 0.8, "br": 1.0}``"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int):
+        self.coding = coding
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31: zlib stream with a gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self.coding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware applying negotiated gzip/brotli above a size threshold"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 1,
+        brotli_quality: int = 4,
+        thread_min_size: int = 64 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = next((v for k, v in scope["headers"] if k == b"accept-encoding"), b"").decode("latin-1")
+        coding = negotiate(accept) if accept else None
+        if coding is None:
+            return await self.app(scope, receive, send)
+
+        start: Optional[dict] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in headers
+                    or not content_type.startswith(_COMPRESSIBLE)
+                    or message["status"] in (204, 304)
+                )
+                if passthrough:
+                    await send(start)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(coding, self.gzip_level, self.brotli_quality)
+                headers = _compressed_headers(start.get("headers", []), coding)
+                if not more_body:
+                    # Whole body in one message: send it with an exact length
+                    if len(body) >= self.thread_min_size:
+                        compressed = await run_in_threadpool(_compress_all, encoder, body)
+                    else:
+                        compressed = _compress_all(encoder, body)
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": headers})
+
+            chunk = encoder.compress(body)
+            if not more_body:
+                chunk += encoder.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _compress_all(encoder: _Encoder, body: bytes) -> bytes:
+    return encoder.compress(body) + encoder.finish()
+
+
+def _compressed_headers(headers: List[Tuple[bytes, bytes]], coding: str) -> List[Tuple[bytes, bytes]]:
+    kept = []
+    for k, v in headers:
+        if k.lower() in (b"content-length", b"vary"):
+            continue
+        if k.lower() == b"etag" and not v.startswith(b"W/"):
+            # A strong validator names exact bytes; the encoded body differs
+            v = b"W/" + v
+        kept.append((k, v))
+    vary = [v for k, v in headers if k.lower() == b"vary"]
+    vary_value = b", ".join(vary + [b"Accept-Encoding"])
+    return kept + [(b"content-encoding", coding.encode()), (b"vary", vary_value)]
+
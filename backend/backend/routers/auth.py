@@ -12,10 +12,10 @@ class Session(BaseModel):
 
 
 @router.post("/validate")
-def validate(session: Session):
+async def validate(session: Session):
     """Validate Supabase JWT and return user info."""
     try:
-        payload = validate_supabase_jwt(session.access_token)
+        payload = await validate_supabase_jwt(session.access_token)
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
     return payload
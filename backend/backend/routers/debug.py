@@ -1,5 +1,9 @@
 """Debug endpoints to help troubleshoot issues"""
+from typing import Literal
+
 from fastapi import APIRouter, Header
+from ..providers.upstream import upstream_stats
+from ..repository import DIRECT_POSTGRES, get_repository, postgres_repository
 from ..supabase_client import supabase_client
 
 router = APIRouter()
@@ -21,16 +25,12 @@ async def test_auth(authorization: str = Header(None)):
 
 
 @router.get("/users-count")
-async def count_users():
-    """Count users in public.users table"""
-    try:
-        users = await supabase_client.select("users")
-        return {
-            "count": len(users),
-            "users": [{"id": u.get("id"), "email": u.get("email")} for u in users],
-        }
-    except Exception as e:
-        return {"error": str(e)}
+async def count_users(method: Literal["exact", "planned", "estimated"] = "exact"):
+    """Count users in public.users table (HEAD request, no rows transferred)"""
+    count = await supabase_client.count("users", method=method)
+    if count is None:
+        return {"error": "Count failed"}
+    return {"count": count, "method": method}
 
 
 @router.post("/test-insert")
@@ -56,3 +56,25 @@ async def test_insert(authorization: str = Header(None)):
         "result": result,
         "used_service_role": bool(supabase_client.service_role and not auth_token),
     }
+
+
+@router.get("/pool")
+async def pool_stats():
+    """Show Supabase REST connection pool settings and usage counters"""
+    return supabase_client.pool_stats()
+
+
+@router.get("/repository")
+async def repository_stats():
+    """Show which data store the routers use and the direct Postgres pool usage"""
+    return {
+        "active": "postgres" if get_repository() is postgres_repository else "supabase_rest",
+        "direct_postgres_enabled": DIRECT_POSTGRES,
+        "postgres": postgres_repository.pool_stats(),
+    }
+
+
+@router.get("/upstreams")
+async def upstreams():
+    """Show LLM upstream connection pools and concurrency usage"""
+    return upstream_stats()
@@ -1,126 +1,422 @@
+import asyncio
+import json
+import logging
+import math
 import os
+import time
 import uuid
 from datetime import datetime
-from typing import Literal
+from typing import AsyncIterator, List, Literal, Optional
 
 import httpx
-from fastapi import APIRouter, Header, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
+from ..jobs import JobQueue, QueueFullError
+from ..metrics import generation_duration, generations_in_flight, record_usage
 from ..providers import provider_manager
+from ..providers.cache import generation_cache
+from ..providers.manager import fallback_used
+from ..providers.prompts import CUSTOM_AI_PROMPTS, PROMPTS_VERSION, describe_prompts
+from ..providers.ratelimit import KeyedRateLimiter, RateLimitExceeded
+from ..providers.singleflight import generation_flights
+from ..providers.upstream import chunk_usage, get_upstream, iter_sse_json
 from ..supabase_client import supabase_client
+from ..utils.supabase_jwt import validate_supabase_jwt
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+CUSTOM_AI_MODEL = "llama-3.2-3b-preview"
+
+BATCH_MAX_ITEMS = int(os.getenv("GENERATE_BATCH_MAX_ITEMS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("GENERATE_BATCH_CONCURRENCY", "4"))
+
+# Per-user generation limit (keyed by verified token subject, else client IP); 0 disables it
+user_rate_limiter = KeyedRateLimiter(
+    per_minute=float(os.getenv("GENERATE_USER_RPM", "20")),
+    burst=float(os.getenv("GENERATE_USER_BURST", "10")),
+)
+
 
 class GenerateRequest(BaseModel):
     type: Literal["blog", "caption", "tweet"]
     topic: str
     user_id: str = "anonymous"
     model: Literal["groq", "custom"] = "groq"  # Add model selection
+    no_cache: bool = False  # Skip the result cache and generate fresh content
 
 
 class GenerateResponse(BaseModel):
     generated_text: str
 
 
+class BatchGenerateRequest(BaseModel):
+    items: List[GenerateRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    stream: bool = False  # Emit each result as an SSE event as soon as it completes
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    generated_text: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchGenerateResponse(BaseModel):
+    results: List[BatchItemResult]
+
+
+def _custom_ai_payload(content_type: str, topic: str, stream: bool = False) -> dict:
+    """Chat completion body for the Custom AI model"""
+    return CUSTOM_AI_PROMPTS.chat_payload(content_type, topic, CUSTOM_AI_MODEL, stream=stream)
+
+
 async def generate_with_custom_ai(content_type: str, topic: str) -> str:
     """Generate content using Custom AI (Llama-3.2-3B based model)"""
     api_key = os.getenv("GROQ_API_KEY")
 
-    print(f"🤖 Custom AI Request:")
-    print(f"   Model: llama-3.2-3b-preview")
-    print(f"   Type: {content_type}")
-    print(f"   Topic: {topic}")
-
-    prompts = {
-        "blog": f"""Write a detailed, well-structured blog post about "{topic}". 
-Include:
-- An engaging title with # markdown
-- Introduction section with ## markdown
-- 2-3 main content sections with ## markdown headings
-- Bullet points or lists where appropriate
-- A conclusion
-Keep it professional and informative. Use markdown formatting.""",
-        "caption": f"""Create an engaging social media caption about "{topic}".
-Make it catchy, include relevant emojis, and 2-3 relevant hashtags.
-Keep it under 150 characters.""",
-        "tweet": f"""Write a compelling tweet about "{topic}".
-Make it engaging, use emojis, include 2-3 hashtags.
-Must be under 280 characters.""",
-    }
-
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Gemma models don't support system role, use only user role
-            response = await client.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "llama-3.2-3b-preview",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": f"You are a professional content writer. {prompts.get(content_type, prompts['blog'])}",
-                        }
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 2000,
-                },
-            )
+        # Gemma models don't support system role, use only user role
+        response = await get_upstream("groq").post(
+            "/chat/completions",
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json=_custom_ai_payload(content_type, topic),
+        )
 
-            print(f"   Response Status: {response.status_code}")
-
-            if response.status_code == 200:
-                data = response.json()
-                result = data["choices"][0]["message"]["content"].strip()
-                print(f"   ✅ Custom AI Success! Generated {len(result)} characters")
-                return result
-            else:
-                error_detail = response.text
-                print(f"   ❌ Custom AI Error: {response.status_code}")
-                print(f"   Error details: {error_detail}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Custom AI error: {response.status_code} - {error_detail}",
-                )
+        if response.status_code == 200:
+            data = response.json()
+            record_usage(CUSTOM_AI_MODEL, data.get("usage"))
+            result = data["choices"][0]["message"]["content"].strip()
+            return result
+        else:
+            error_detail = response.text
+            logger.warning(
+                "Custom AI error", extra={"status": response.status_code, "body": error_detail[:500]}
+            )
+            raise HTTPException(
+                status_code=500,
+                detail=f"Custom AI error: {response.status_code} - {error_detail}",
+            )
+    except RateLimitExceeded:
+        raise
     except httpx.HTTPError as e:
-        print(f"   ❌ HTTP Error: {e}")
+        logger.warning("Custom AI HTTP error: %s", e)
         raise HTTPException(status_code=500, detail=f"Custom AI HTTP error: {str(e)}")
     except Exception as e:
-        print(f"   ❌ Unexpected Error: {e}")
+        logger.exception("Custom AI unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=f"Custom AI error: {str(e)}")
 
 
-@router.post("/", response_model=GenerateResponse)
-async def generate(req: GenerateRequest, authorization: str = Header(None)):
-    """Generate content using the selected provider (Groq or Custom AI)."""
+async def stream_with_custom_ai(
+    content_type: str, topic: str, usage: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """Stream content from Custom AI as text deltas"""
+    api_key = os.getenv("GROQ_API_KEY")
+    stream_usage = usage if usage is not None else {}
+    async with get_upstream("groq").stream(
+        "/chat/completions",
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        json=_custom_ai_payload(content_type, topic, stream=True),
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            raise RuntimeError(f"Custom AI error: {response.status_code} - {response.text}")
+        async for chunk in iter_sse_json(response):
+            if chunk_usage(chunk):
+                stream_usage.update(chunk_usage(chunk))
+            for choice in chunk.get("choices", []):
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+    record_usage(CUSTOM_AI_MODEL, stream_usage)
+
 
-    # Debug logging
-    print(f"\n{'='*60}")
-    print(f"📥 Generate Request Received:")
-    print(f"   Model: {req.model}")
-    print(f"   Type: {req.type}")
-    print(f"   Topic: {req.topic}")
-    print(f"   GROQ_API_KEY exists: {bool(os.getenv('GROQ_API_KEY'))}")
-    print(f"   CONTENT_PROVIDER: {os.getenv('CONTENT_PROVIDER')}")
-    print(f"{'='*60}\n")
-
-    # Select provider based on user's choice
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _retry_after(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+async def _rate_key(request: Request) -> str:
+    """The verified token subject, else the client IP; the body's user_id is never trusted"""
+    authorization = request.headers.get("authorization")
+    if authorization and authorization.lower().startswith("bearer "):
+        try:
+            sub = (await validate_supabase_jwt(authorization.split(None, 1)[1])).get("sub")
+        except Exception:
+            sub = None
+        if sub:
+            return f"user:{sub}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def _check_user_rate(request: Request, cost: int = 1) -> None:
+    """Charge the caller's bucket ``cost`` generations"""
+    try:
+        wait = user_rate_limiter.check(await _rate_key(request), cost)
+    except ValueError:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {user_rate_limiter.burst:g} generations per request",
+        )
+    if wait is not None:
+        raise HTTPException(
+            status_code=429, detail="Generation rate limit exceeded", headers=_retry_after(wait)
+        )
+
+
+async def _generate_text(req: GenerateRequest) -> str:
+    """Call the provider selected by the request (Groq or Custom AI)"""
     if req.model == "custom":
         # Use Custom AI model (Gemma-2-2B-it based)
-        print(f"🤖 Using Custom AI model (Gemma-2-9B) for {req.type} generation")
-        text = await generate_with_custom_ai(req.type, req.topic)
+        provider_name, model_id = "custom_ai", CUSTOM_AI_MODEL
+        call = generate_with_custom_ai
     else:
         # Use default Groq provider
-        print(f"⚡ Using Groq API (Llama 3.3 70B) for {req.type} generation")
         prov = provider_manager.get_provider()
         if prov is None:
             raise HTTPException(status_code=500, detail="No provider configured")
-        text = await prov.generate(req.type, req.topic)
+        provider_name, model_id = prov.name, prov.model_id
+        call = prov.generate
+
+    generations_in_flight.inc(provider=provider_name)
+    started = time.perf_counter()
+    try:
+        return await call(req.type, req.topic)
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=_retry_after(e.retry_after))
+    finally:
+        generations_in_flight.dec(provider=provider_name)
+        generation_duration.observe(
+            time.perf_counter() - started, provider=provider_name, model=model_id, type=req.type
+        )
+
+
+async def _generate_and_cache(req: GenerateRequest, key) -> str:
+    fallback_used.set(False)
+    text = await _generate_text(req)
+    # Placeholder text from a LocalProvider fallback is never cached
+    if not fallback_used.get():
+        await generation_cache.set(key, text)
+    return text
+
+
+async def _generate_cached(req: GenerateRequest) -> str:
+    """Generate through the result cache and single-flight layer"""
+    # Results from an older prompt version are never served
+    key = generation_cache.make_key(req.type, req.topic, f"{req.model}@{PROMPTS_VERSION}")
+    if not req.no_cache:
+        cached = await generation_cache.get(key)
+        if cached is not None:
+            logger.debug("Cache hit", extra={"type": req.type})
+            return cached
+
+    # Concurrent identical requests share one upstream call
+    return await generation_flights.do(key, lambda: _generate_and_cache(req, key))
+
+
+@router.post("/", response_model=GenerateResponse)
+async def generate(req: GenerateRequest, request: Request, authorization: str = Header(None)):
+    """Generate content using the selected provider (Groq or Custom AI)."""
+    await _check_user_rate(request)
+
+    logger.info(
+        "Generate request",
+        extra={"model": req.model, "type": req.type, "topic_chars": len(req.topic), "no_cache": req.no_cache},
+    )
+
+    text = await _generate_cached(req)
 
     # Don't auto-save - user will manually save via the history endpoint
     return {"generated_text": text}
+
+
+@router.post("/stream")
+async def generate_stream(req: GenerateRequest, request: Request):
+    """Stream generated content as Server-Sent Events.
+
+    Emits ``token`` events as text arrives, then a final ``done`` event with
+    token usage and timing (or an ``error`` event if the upstream fails).
+    """
+    await _check_user_rate(request)
+    usage: dict = {}
+    if req.model == "custom":
+        deltas = stream_with_custom_ai(req.type, req.topic, usage=usage)
+    else:
+        prov = provider_manager.get_provider()
+        if prov is None:
+            raise HTTPException(status_code=500, detail="No provider configured")
+        deltas = prov.stream(req.type, req.topic, usage=usage)
+
+    async def events() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        first_token_at = None
+        chars = 0
+        try:
+            async for delta in deltas:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chars += len(delta)
+                yield _sse("token", {"text": delta})
+        except RateLimitExceeded as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        finished = time.perf_counter()
+        yield _sse("done", {
+            "usage": usage or None,
+            "chars": chars,
+            "timing": {
+                "ttft_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                "total_ms": round((finished - started) * 1000, 1),
+            },
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/batch", response_model=BatchGenerateResponse)
+async def generate_batch(batch: BatchGenerateRequest, request: Request):
+    """Generate several items concurrently.
+
+    Items run under a bounded semaphore and go through the same cache and
+    single-flight path as ``POST /generate/``. Results are returned in
+    request order, each with either ``generated_text`` or ``error``. With
+    ``stream: true`` every result is sent as an SSE ``result`` event as soon
+    as it completes, followed by a ``done`` event.
+    """
+    await _check_user_rate(request, cost=len(batch.items))
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index: int, item: GenerateRequest) -> BatchItemResult:
+        async with semaphore:
+            try:
+                return BatchItemResult(index=index, generated_text=await _generate_cached(item))
+            except HTTPException as e:
+                return BatchItemResult(index=index, error=str(e.detail))
+            except Exception as e:
+                return BatchItemResult(index=index, error=str(e))
+
+    if not batch.stream:
+        results = await asyncio.gather(*(run(i, item) for i, item in enumerate(batch.items)))
+        return {"results": results}
+
+    async def events() -> AsyncIterator[str]:
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(batch.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield _sse("result", result.model_dump())
+            yield _sse("done", {"count": len(tasks)})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Generation cache hit, miss and eviction counters."""
+    return generation_cache.stats()
+
+
+@router.get("/prompts")
+async def prompts():
+    """Prompt registry version with per-type token budgets and stop sequences."""
+    return describe_prompts()
+
+
+@router.get("/flights/stats")
+async def flight_stats():
+    """Single-flight counters: leaders, coalesced followers and cancellations."""
+    return generation_flights.stats()
+
+
+# Generation jobs are drained through the same cache and single-flight path
+job_queue = JobQueue(
+    _generate_cached,
+    workers=int(os.getenv("GENERATE_JOB_WORKERS", "4")),
+    max_depth=int(os.getenv("GENERATE_JOB_QUEUE_DEPTH", "100")),
+    ttl=float(os.getenv("GENERATE_JOB_TTL", "3600")),
+)
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(req: GenerateRequest, request: Request):
+    """Queue a generation and return its job id immediately."""
+    await _check_user_rate(request)
+    try:
+        job = job_queue.submit(req)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/jobs/stats")
+async def job_stats():
+    """Job queue depth, worker count and job counts by status."""
+    return job_queue.stats()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    """Get a job's status and result.
+
+    With ``wait`` > 0 the request long-polls, returning as soon as the job
+    finishes or after ``wait`` seconds, whichever comes first.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if wait and not job.done.is_set():
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+    return job.to_dict()
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Subscribe to a job: one SSE ``done`` event once it finishes."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events() -> AsyncIterator[str]:
+        while not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+        yield _sse("done", job.to_dict())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
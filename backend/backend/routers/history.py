@@ -1,14 +1,64 @@
-from datetime import datetime
+import asyncio
+import base64
+import json
+import logging
+import os
+from datetime import datetime, timezone
 from typing import List, Literal, Optional
-from uuid import uuid4
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Header, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
 
-from ..supabase_client import supabase_client
+from ..etag import change_versions, conditional, set_etag
+from ..repository import get_repository
+from ..responses import passthrough_response
+from ..search import Document, SearchIndexes
+from ..supabase_client import BULK_MAX_ROWS, PASSTHROUGH_READS, _in_filter, supabase_client
+from ..utils.supabase_jwt import validate_supabase_jwt
+from ..writebehind import BufferFullError, WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Optional write-behind mode for POST /history/: saves are acknowledged once
+# buffered and inserted in batches (started and flushed by main.py)
+HISTORY_WRITE_BEHIND = os.getenv("HISTORY_WRITE_BEHIND", "false").lower() == "true"
+
+# Length of the generated_text preview returned by GET /history/summary
+PREVIEW_CHARS = int(os.getenv("HISTORY_PREVIEW_CHARS", "200"))
+SUMMARY_COLUMNS = "id,type,input_text,generated_text,created_at"
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Rows per request while loading a user's history into the search index
+SEARCH_LOAD_PAGE_SIZE = 1000
+
+
+async def _insert_batch(table: str, rows: List[dict], auth_token: Optional[str]) -> Optional[list]:
+    # Rows carry their own ids, so a retried batch skips what already landed
+    result = await get_repository().upsert_many(table, rows, auth_token=auth_token, ignore_duplicates=True)
+    if result is not None:
+        # The rows only become visible to readers now
+        change_versions.bump_for("history", auth_token, (row.get("user_id") for row in rows))
+        for row in rows:
+            history_search.add(str(row["user_id"]), *_search_document(row))
+    return result
+
+
+history_buffer = WriteBehindBuffer(
+    "content_history",
+    _insert_batch,
+    max_batch=int(os.getenv("HISTORY_WRITE_BEHIND_BATCH", "100")),
+    flush_interval=float(os.getenv("HISTORY_WRITE_BEHIND_INTERVAL", "1.0")),
+    max_retries=int(os.getenv("HISTORY_WRITE_BEHIND_RETRIES", "3")),
+    max_flushes=int(os.getenv("HISTORY_WRITE_BEHIND_MAX_FLUSHES", "5")),
+)
+
 
 class HistoryItem(BaseModel):
     id: str
@@ -26,12 +76,185 @@ class HistoryCreate(BaseModel):
     user_id: str
 
 
-@router.get("/", response_model=List[HistoryItem])
+class HistoryBulkCreate(BaseModel):
+    items: List[HistoryCreate] = Field(..., min_length=1, max_length=BULK_MAX_ROWS)
+
+
+class BulkDelete(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=BULK_MAX_ROWS)
+
+
+class HistoryPage(BaseModel):
+    items: List[HistoryItem]
+    next_cursor: Optional[str] = None
+
+
+class HistorySummary(BaseModel):
+    id: str
+    type: Literal["blog", "caption", "tweet"]
+    input_text: Optional[str]
+    preview: Optional[str]
+    created_at: datetime
+
+
+class HistorySummaryPage(BaseModel):
+    items: List[HistorySummary]
+    next_cursor: Optional[str] = None
+
+
+class HistorySearchHit(HistorySummary):
+    score: float
+
+
+class HistorySearchResults(BaseModel):
+    items: List[HistorySearchHit]
+    total: int
+
+
+def _preview(text: Optional[str], limit: int = PREVIEW_CHARS) -> Optional[str]:
+    """The first ``limit`` characters of ``text``, cut at a word boundary when one is near"""
+    if text is None or len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def _summary(row: dict) -> dict:
+    return {
+        "id": row["id"],
+        "type": row["type"],
+        "input_text": row.get("input_text"),
+        "preview": _preview(row.get("generated_text")),
+        "created_at": row["created_at"],
+    }
+
+
+def _search_document(row: dict) -> Document:
+    """(id, indexed text, result payload) for one history row"""
+    text = f"{row.get('input_text') or ''}\n{row.get('generated_text') or ''}"
+    return row["id"], text, _summary(row)
+
+
+async def _load_search_documents(user: str, auth_token: Optional[str]) -> List[Document]:
+    """All of one user's history rows, read in keyset pages"""
+    documents: List[Document] = []
+    cursor = None
+    while True:
+        rows, cursor = await _select_page(
+            {"user_id": user}, SEARCH_LOAD_PAGE_SIZE, cursor, auth_token, columns=SUMMARY_COLUMNS
+        )
+        documents.extend(_search_document(row) for row in rows)
+        if cursor is None:
+            return documents
+
+
+history_search = SearchIndexes(
+    _load_search_documents,
+    max_users=int(os.getenv("HISTORY_SEARCH_MAX_USERS", "64")),
+    max_age=float(os.getenv("HISTORY_SEARCH_MAX_AGE", "300")),
+)
+
+
+def _encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        # Validate the timestamp so it can be embedded in the filter safely
+        datetime.fromisoformat(created_at)
+        return created_at, str(UUID(str(item_id)))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _keyset_params(cursor: Optional[str]) -> dict:
+    """PostgREST filter selecting rows strictly after the cursor in (created_at, id) desc order"""
+    if not cursor:
+        return {}
+    created_at, item_id = _decode_cursor(cursor)
+    return {
+        "or": f'(created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{item_id}))'
+    }
+
+
+async def _stream_history_page(
+    filters: dict, limit: int, cursor: Optional[str], auth_token: Optional[str]
+) -> Optional[Response]:
+    """Relay one page from PostgREST without parsing it; None to use the regular path.
+
+    The page's keys are read first, so the streamed rows and the next
+    cursor come from the same snapshot: a concurrent insert cannot shift
+    the page, and a failed key query is never mistaken for the last page.
+    """
+    keys = await supabase_client.select(
+        "content_history",
+        filters=filters,
+        order_by="created_at.desc,id.desc",
+        auth_token=auth_token,
+        limit=limit + 1,
+        params=_keyset_params(cursor),
+        columns="id,created_at",
+    )
+    if not keys:
+        # Empty page or a failed query: the regular path handles both
+        return None
+    next_cursor = _encode_cursor(keys[limit - 1]) if len(keys) > limit else None
+    try:
+        return await passthrough_response(
+            supabase_client.select_stream(
+                "content_history",
+                order_by="created_at.desc,id.desc",
+                auth_token=auth_token,
+                params={"id": _in_filter([key["id"] for key in keys[:limit]])},
+            ),
+            prefix=b'{"items":',
+            suffix=b',"next_cursor":' + json.dumps(next_cursor).encode() + b"}",
+        )
+    except Exception as e:
+        logger.warning("History pass-through failed, using the regular path: %s", e)
+        return None
+
+
+async def _select_page(
+    filters: dict, limit: int, cursor: Optional[str], auth_token: Optional[str], columns: Optional[str] = None
+) -> tuple[List[dict], Optional[str]]:
+    """One keyset page of history rows, newest first, and the cursor of the next page"""
+    # Fetch one extra row to learn whether another page exists
+    rows = await get_repository().select(
+        "content_history",
+        filters=filters,
+        order_by="created_at.desc,id.desc",
+        auth_token=auth_token,
+        limit=limit + 1,
+        params=_keyset_params(cursor),
+        columns=columns,
+    )
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+@router.get("/", response_model=HistoryPage)
 async def list_history(
+    request: Request,
+    response: Response,
     type: Optional[Literal["blog", "caption", "tweet"]] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     authorization: str = Header(None),
 ):
-    """List content history, optionally filtered by type."""
+    """List content history newest first, one keyset page at a time.
+
+    Pass the returned ``next_cursor`` back as ``cursor`` to fetch the next
+    page; it is null on the last page. Responses carry an ETag; send it back
+    as ``If-None-Match`` to get a 304 when nothing has changed.
+    """
     filters = {"type": type} if type else {}
     # If the frontend included a user JWT, forward it to Supabase so RLS
     # policies can authenticate the request. Otherwise this will fall back
@@ -40,22 +263,146 @@ async def list_history(
     if authorization and authorization.lower().startswith("bearer "):
         auth_token = authorization.split(None, 1)[1]
 
-    rows = await supabase_client.select(
-        "content_history",
-        filters=filters,
-        order_by="created_at.desc",
-        auth_token=auth_token,
-    )
-    return rows
+    etag, not_modified = conditional(request, "history", auth_token)
+    if not_modified is not None:
+        return not_modified
+
+    if PASSTHROUGH_READS and get_repository() is supabase_client:
+        streamed = await _stream_history_page(filters, limit, cursor, auth_token)
+        if streamed is not None:
+            set_etag(streamed, etag)
+            return streamed
+
+    items, next_cursor = await _select_page(filters, limit, cursor, auth_token)
+    set_etag(response, etag)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/summary", response_model=HistorySummaryPage)
+async def list_history_summary(
+    request: Request,
+    response: Response,
+    type: Optional[Literal["blog", "caption", "tweet"]] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    authorization: str = Header(None),
+):
+    """List history like ``GET /history/``, with a short preview instead of the full text.
+
+    Meant for list views: fetch a full item with ``GET /history/{item_id}``
+    when it is opened. Cursors are interchangeable with ``GET /history/``.
+    """
+    filters = {"type": type} if type else {}
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    etag, not_modified = conditional(request, "history", auth_token)
+    if not_modified is not None:
+        return not_modified
+
+    rows, next_cursor = await _select_page(filters, limit, cursor, auth_token, columns=SUMMARY_COLUMNS)
+    set_etag(response, etag)
+    return {"items": [_summary(row) for row in rows], "next_cursor": next_cursor}
+
+
+@router.get("/search", response_model=HistorySearchResults)
+async def search_history(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    prefix: bool = Query(True),
+    authorization: str = Header(None),
+):
+    """Full-text search over the caller's history, best matches first.
+
+    Matches ``q`` against the topic and generated text and ranks with BM25.
+    With ``prefix`` (the default) each query word also matches words that
+    start with it. ``total`` counts every matching item, not just those
+    returned.
+    """
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+    if not auth_token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    # The index is served from memory, so unlike PostgREST reads the
+    # token has to be verified here
+    try:
+        user = (await validate_supabase_jwt(auth_token)).get("sub")
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    if not user:
+        raise HTTPException(status_code=401, detail="Token has no subject")
+
+    index = await history_search.get(str(user), auth_token)
+    total, hits = index.search(q, limit=limit, prefix=prefix)
+    return {"items": [{**payload, "score": round(score, 4)} for payload, score in hits], "total": total}
+
+
+@router.get("/search/stats")
+async def search_stats():
+    """Loaded search indexes and build counters."""
+    return history_search.stats()
+
+
+class HistoryStats(BaseModel):
+    blog: int
+    caption: int
+    tweet: int
+    total: int
+
+
+@router.get("/stats", response_model=HistoryStats)
+async def history_stats(
+    request: Request,
+    response: Response,
+    user_id: Optional[str] = Query(None),
+    method: Literal["exact", "planned", "estimated"] = Query("exact"),
+    authorization: str = Header(None),
+):
+    """Per-type generation counts, computed by PostgREST without transferring rows."""
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    etag, not_modified = conditional(request, "history", auth_token)
+    if not_modified is not None:
+        return not_modified
+
+    base_filters = {"user_id": user_id} if user_id else {}
+    types = ("blog", "caption", "tweet")
+    counts = await asyncio.gather(*(
+        get_repository().count(
+            "content_history",
+            filters={**base_filters, "type": t},
+            auth_token=auth_token,
+            method=method,
+        )
+        for t in types
+    ))
+    if any(c is None for c in counts):
+        raise HTTPException(status_code=502, detail="Failed to count history")
+    stats = dict(zip(types, counts))
+    set_etag(response, etag)
+    return {**stats, "total": sum(counts)}
+
+
+@router.get("/buffer/stats")
+async def buffer_stats():
+    """Write-behind buffer depth and flush counters."""
+    return history_buffer.stats()
 
 
 @router.post("/", response_model=HistoryItem)
-async def create_history(item: HistoryCreate, authorization: str = Header(None)):
-    """Manually save content to history."""
-    print(f"🔍 Received history create request:")
-    print(f"   user_id: {item.user_id}")
-    print(f"   type: {item.type}")
-    print(f"   authorization header present: {bool(authorization)}")
+async def create_history(item: HistoryCreate, response: Response, authorization: str = Header(None)):
+    """Manually save content to history.
+
+    In write-behind mode the item is returned with 202 as soon as it is
+    buffered; its id and created_at are assigned here.
+    """
+    logger.debug(
+        "History create", extra={"user_id": item.user_id, "type": item.type, "authenticated": bool(authorization)}
+    )
     
     data = {
         "user_id": item.user_id,
@@ -67,15 +414,94 @@ async def create_history(item: HistoryCreate, authorization: str = Header(None))
     if authorization and authorization.lower().startswith("bearer "):
         auth_token = authorization.split(None, 1)[1]
 
-    result = await supabase_client.insert(
+    if history_buffer.running:
+        row = {
+            "id": str(uuid4()),
+            **data,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            history_buffer.add(row, auth_token=auth_token)
+            response.status_code = 202
+            return row
+        except BufferFullError as e:
+            logger.warning("%s; saving synchronously", e)
+
+    result = await get_repository().insert(
         "content_history", data, auth_token=auth_token
     )
     if result:
+        change_versions.bump_for("history", auth_token, [item.user_id])
+        history_search.add(item.user_id, *_search_document(result))
         return result
     else:
         raise HTTPException(status_code=500, detail="Failed to save history")
 
 
+@router.post("/bulk", response_model=List[HistoryItem])
+async def create_history_bulk(batch: HistoryBulkCreate, authorization: str = Header(None)):
+    """Save several history items in one PostgREST request (all or nothing)."""
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    rows = await get_repository().insert_many(
+        "content_history", [item.model_dump() for item in batch.items], auth_token=auth_token
+    )
+    if rows is None:
+        raise HTTPException(status_code=500, detail="Failed to save history")
+    change_versions.bump_for("history", auth_token, (item.user_id for item in batch.items))
+    for row in rows:
+        history_search.add(str(row["user_id"]), *_search_document(row))
+    return rows
+
+
+@router.delete("/bulk")
+async def delete_history_bulk(batch: BulkDelete, authorization: str = Header(None)):
+    """Delete several history items in one PostgREST request.
+
+    Returns the ids that were deleted; ids that did not exist are skipped.
+    """
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    deleted = await get_repository().delete_many(
+        "content_history", [str(i) for i in batch.ids], auth_token=auth_token
+    )
+    if deleted is None:
+        raise HTTPException(status_code=500, detail="Failed to delete history")
+    if deleted:
+        change_versions.bump_for("history", auth_token)
+        history_search.remove(deleted)
+    return {"deleted": deleted}
+
+
+@router.get("/{item_id}", response_model=HistoryItem)
+async def get_history_item(
+    item_id: UUID,
+    request: Request,
+    response: Response,
+    authorization: str = Header(None),
+):
+    """Fetch one history item with its full generated text."""
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    etag, not_modified = conditional(request, "history", auth_token)
+    if not_modified is not None:
+        return not_modified
+
+    rows = await get_repository().select(
+        "content_history", filters={"id": str(item_id)}, auth_token=auth_token, limit=1
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail="Not found")
+    set_etag(response, etag)
+    return rows[0]
+
+
 @router.delete("/{item_id}")
 async def delete_history(item_id: str, authorization: str = Header(None)):
     """Delete a history item by ID."""
@@ -83,10 +509,15 @@ async def delete_history(item_id: str, authorization: str = Header(None)):
     if authorization and authorization.lower().startswith("bearer "):
         auth_token = authorization.split(None, 1)[1]
 
-    success = await supabase_client.delete(
-        "content_history", item_id, auth_token=auth_token
+    # RLS turns another user's id into a successful no-op, so only touch the
+    # search indexes and ETags for what the delete actually returned
+    deleted = await get_repository().delete_many(
+        "content_history", [item_id], auth_token=auth_token
     )
-    if success:
-        return {"deleted": item_id}
-    else:
+    if deleted is None:
+        raise HTTPException(status_code=500, detail="Failed to delete history")
+    if not deleted:
         raise HTTPException(status_code=404, detail="Not found")
+    change_versions.bump_for("history", auth_token)
+    history_search.remove(deleted)
+    return {"deleted": item_id}
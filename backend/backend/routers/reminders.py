@@ -1,16 +1,56 @@
+import asyncio
+import logging
+import os
 from datetime import date as DateType
 from datetime import datetime
 from datetime import time as TimeType
-from typing import List, Optional
-from uuid import uuid4
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, Header, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from pydantic import BaseModel, Field
 
-from ..supabase_client import supabase_client
+from ..etag import change_versions, conditional, set_etag
+from ..repository import get_repository
+from ..responses import passthrough_response
+from ..scheduler import ReminderScheduler
+from ..supabase_client import BULK_MAX_ROWS, PASSTHROUGH_READS, supabase_client
+from ..utils.supabase_jwt import validate_supabase_jwt
+from .generate import GenerateRequest, _generate_cached
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Optional reminder scheduler (started by main.py); pre-generated content goes
+# through the generation cache, so it is also served instantly by /generate
+REMINDER_SCHEDULER = os.getenv("REMINDER_SCHEDULER", "false").lower() == "true"
+REMINDER_PREGEN_TYPE = os.getenv("REMINDER_PREGEN_TYPE", "blog")
+
+
+async def _pregenerate(reminder: dict) -> str:
+    req = GenerateRequest(
+        type=REMINDER_PREGEN_TYPE,
+        topic=reminder["topic"],
+        user_id=str(reminder.get("user_id") or "anonymous"),
+    )
+    return await _generate_cached(req)
+
+
+async def _load_reminders() -> List[dict]:
+    # Every user's reminders: a trusted server-side read
+    return await get_repository(service=True).select("reminders")
+
+
+reminder_scheduler = ReminderScheduler(
+    _pregenerate,
+    loader=_load_reminders,
+    lead_time=float(os.getenv("REMINDER_PREGEN_LEAD_SECONDS", "300")),
+    max_busy=int(os.getenv("REMINDER_PREGEN_MAX_BUSY", "4")),
+    tz=ZoneInfo(os.getenv("REMINDER_TIMEZONE", "UTC")),
+)
+
 
 class Reminder(BaseModel):
     id: Optional[str] = None
@@ -24,16 +64,52 @@ class Reminder(BaseModel):
     created_at: Optional[datetime] = None
 
 
+class ReminderBulk(BaseModel):
+    items: List[Reminder] = Field(..., min_length=1, max_length=BULK_MAX_ROWS)
+
+
+class BulkDelete(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=BULK_MAX_ROWS)
+
+
+def _reminder_row(r: Reminder) -> dict:
+    return {
+        "title": r.title,
+        "topic": r.topic,
+        "date": str(r.date) if r.date else None,
+        "time": str(r.time) if r.time else None,
+        "daily": r.daily,
+        "repeat_days": r.repeat_days,
+    }
+
+
 @router.get("/")
-async def list_reminders(authorization: str = Header(None)):
-    """List all reminders."""
+async def list_reminders(request: Request, response: Response, authorization: str = Header(None)):
+    """List all reminders (with an ETag for conditional requests)."""
     auth_token = None
     if authorization and authorization.lower().startswith("bearer "):
         auth_token = authorization.split(None, 1)[1]
 
-    reminders = await supabase_client.select(
+    etag, not_modified = conditional(request, "reminders", auth_token)
+    if not_modified is not None:
+        return not_modified
+
+    if PASSTHROUGH_READS and get_repository() is supabase_client:
+        try:
+            streamed = await passthrough_response(
+                supabase_client.select_stream("reminders", order_by="created_at.desc", auth_token=auth_token)
+            )
+        except Exception as e:
+            logger.warning("Reminders pass-through failed, using the regular path: %s", e)
+            streamed = None
+        if streamed is not None:
+            set_etag(streamed, etag)
+            return streamed
+
+    reminders = await get_repository().select(
         "reminders", order_by="created_at.desc", auth_token=auth_token
     )
+    set_etag(response, etag)
     return reminders
 
 
@@ -42,41 +118,131 @@ async def create_reminder(r: Reminder, authorization: str = Header(None)):
     """Create a new reminder."""
     data = {
         "user_id": r.user_id or "00000000-0000-0000-0000-000000000000",
-        "title": r.title,
-        "topic": r.topic,
-        "date": str(r.date) if r.date else None,
-        "time": str(r.time) if r.time else None,
-        "daily": r.daily,
-        "repeat_days": r.repeat_days,
+        **_reminder_row(r),
     }
     auth_token = None
     if authorization and authorization.lower().startswith("bearer "):
         auth_token = authorization.split(None, 1)[1]
 
-    result = await supabase_client.insert("reminders", data, auth_token=auth_token)
+    result = await get_repository().insert("reminders", data, auth_token=auth_token)
     if result:
+        reminder_scheduler.upsert(result)
+        change_versions.bump_for("reminders", auth_token, [data["user_id"]])
         return {"id": result["id"]}
     else:
         raise HTTPException(status_code=500, detail="Failed to create reminder")
 
 
+def _reminder_changes(r: Reminder) -> dict:
+    """Only the reminder fields the client actually sent"""
+    row = _reminder_row(r)
+    return {k: row[k] for k in r.model_dump(exclude_unset=True) if k in row}
+
+
+@router.post("/bulk")
+async def upsert_reminders_bulk(batch: ReminderBulk, authorization: str = Header(None)):
+    """Create or update several reminders in a few PostgREST requests.
+
+    Items without an ``id`` are created with a fresh one. Items with an
+    ``id`` update only the fields they set on that reminder; its owner is
+    never changed. Re-importing the returned ids is therefore idempotent.
+    """
+    ids = [r.id or str(uuid4()) for r in batch.items]
+    inserts = [
+        {
+            "id": reminder_id,
+            "user_id": r.user_id or "00000000-0000-0000-0000-000000000000",
+            **_reminder_row(r),
+        }
+        for reminder_id, r in zip(ids, batch.items)
+        if not r.id
+    ]
+    # A bulk upsert needs the same keys in every row, so partial updates
+    # are grouped by the set of fields they change
+    updates: Dict[tuple, List[dict]] = {}
+    for r in batch.items:
+        if r.id:
+            row = {"id": r.id, **_reminder_changes(r)}
+            updates.setdefault(tuple(sorted(row)), []).append(row)
+
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    repository = get_repository()
+    results = await asyncio.gather(
+        repository.insert_many("reminders", inserts, auth_token=auth_token),
+        *(repository.upsert_many("reminders", rows, auth_token=auth_token) for rows in updates.values()),
+    )
+    if any(result is None for result in results):
+        raise HTTPException(status_code=500, detail="Failed to save reminders")
+    written = {}
+    for result in results:
+        for row in result:
+            reminder_scheduler.upsert(row)
+            written[str(row["id"])] = row
+    change_versions.bump_for("reminders", auth_token, (row.get("user_id") for row in written.values()))
+    return {"ids": [reminder_id for reminder_id in ids if reminder_id in written]}
+
+
+@router.delete("/bulk")
+async def delete_reminders_bulk(batch: BulkDelete, authorization: str = Header(None)):
+    """Delete several reminders in one PostgREST request."""
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    deleted = await get_repository().delete_many(
+        "reminders", [str(i) for i in batch.ids], auth_token=auth_token
+    )
+    if deleted is None:
+        raise HTTPException(status_code=500, detail="Failed to delete reminders")
+    for reminder_id in deleted:
+        reminder_scheduler.remove(reminder_id)
+    if deleted:
+        change_versions.bump_for("reminders", auth_token)
+    return {"deleted": deleted}
+
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    """Scheduled reminder count, next fire time and pre-generation counters."""
+    return reminder_scheduler.stats()
+
+
+@router.get("/{id}/content")
+async def reminder_content(id: str, authorization: str = Header(None)):
+    """Content pre-generated for a reminder's topic ahead of its fire time."""
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+    if not auth_token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    # Prepared content is served from memory, so the token is verified here
+    # rather than by RLS
+    try:
+        user = (await validate_supabase_jwt(auth_token)).get("sub")
+    except RuntimeError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    prepared = reminder_scheduler.prepared(id)
+    if prepared is None or not user or prepared.get("user_id") != user:
+        raise HTTPException(status_code=404, detail="No content prepared for this reminder")
+    return prepared
+
+
 @router.put("/{id}")
 async def update_reminder(id: str, r: Reminder, authorization: str = Header(None)):
     """Update an existing reminder."""
-    data = {
-        "title": r.title,
-        "topic": r.topic,
-        "date": str(r.date) if r.date else None,
-        "time": str(r.time) if r.time else None,
-        "daily": r.daily,
-        "repeat_days": r.repeat_days,
-    }
+    data = _reminder_row(r)
     auth_token = None
     if authorization and authorization.lower().startswith("bearer "):
         auth_token = authorization.split(None, 1)[1]
 
-    result = await supabase_client.update("reminders", id, data, auth_token=auth_token)
+    result = await get_repository().update("reminders", id, data, auth_token=auth_token)
     if result:
+        reminder_scheduler.upsert(result)
+        change_versions.bump_for("reminders", auth_token, [result.get("user_id")])
         return {"id": result["id"]}
     else:
         raise HTTPException(status_code=500, detail="Failed to update reminder")
@@ -89,8 +255,14 @@ async def delete_reminder(id: str, authorization: str = Header(None)):
     if authorization and authorization.lower().startswith("bearer "):
         auth_token = authorization.split(None, 1)[1]
 
-    success = await supabase_client.delete("reminders", id, auth_token=auth_token)
-    if success:
-        return {"deleted": id}
-    else:
+    # RLS turns another user's id into a successful no-op, so only unschedule
+    # what the delete actually returned
+    deleted = await get_repository().delete_many("reminders", [id], auth_token=auth_token)
+    if deleted is None:
+        raise HTTPException(status_code=500, detail="Failed to delete reminder")
+    if not deleted:
         raise HTTPException(status_code=404, detail="Not found")
+    for reminder_id in deleted:
+        reminder_scheduler.remove(reminder_id)
+    change_versions.bump_for("reminders", auth_token)
+    return {"deleted": id}
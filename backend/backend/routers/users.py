@@ -1,12 +1,15 @@
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel
 
-from ..supabase_client import supabase_client
+from ..repository import get_repository
 
 router = APIRouter()
 
+# Only the columns UserStats needs
+USER_STATS_COLUMNS = "id,name,email,blogs_generated,captions_generated,tweets_generated"
+
 
 class UserStats(BaseModel):
     id: str
@@ -19,9 +22,15 @@ class UserStats(BaseModel):
 
 
 @router.get("/{user_id}", response_model=UserStats)
-async def get_user_stats(user_id: str):
+async def get_user_stats(user_id: str, authorization: str = Header(None)):
     """Get user profile and generation stats."""
-    users = await supabase_client.select("users", filters={"id": user_id})
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    users = await get_repository().select(
+        "users", filters={"id": user_id}, columns=USER_STATS_COLUMNS, limit=1, auth_token=auth_token
+    )
     
     if not users or len(users) == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -41,9 +50,15 @@ async def get_user_stats(user_id: str):
 
 
 @router.get("/email/{email}", response_model=UserStats)
-async def get_user_by_email(email: str):
+async def get_user_by_email(email: str, authorization: str = Header(None)):
     """Get user profile by email."""
-    users = await supabase_client.select("users", filters={"email": email})
+    auth_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization.split(None, 1)[1]
+
+    users = await get_repository().select(
+        "users", filters={"email": email}, columns=USER_STATS_COLUMNS, limit=1, auth_token=auth_token
+    )
     
     if not users or len(users) == 0:
         raise HTTPException(status_code=404, detail="User not found")
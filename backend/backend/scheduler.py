@@ -0,0 +1,261 @@
+"""
+Reminder scheduler with ahead-of-time content pre-generation.
+
+Upcoming reminder fire times are kept in a heap. ``upsert``/``remove`` are
+called by the reminders routes so the heap is maintained incrementally; the
+full table is only read once at startup. ``lead_time`` seconds before a
+reminder fires its topic is generated in the background, so the content is
+ready when the user opens it. Pre-generation yields to live traffic: while
+``max_busy`` or more generations are in flight it is retried every
+``busy_retry`` seconds, and only forced once the fire time arrives.
+
+Reminder dates and times are wall-clock times in ``tz``. ``repeat_days``
+uses JavaScript's ``getDay()`` numbering (0 = Sunday).
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from datetime import time as dtime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import generations_in_flight, reminder_pregenerations, scheduled_reminders
+
+logger = logging.getLogger(__name__)
+
+
+def _parse(value: Any, kind):
+    if value is None or isinstance(value, kind):
+        return value
+    try:
+        return kind.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def next_fire_time(reminder: Dict[str, Any], after: datetime, tz: tzinfo = timezone.utc) -> Optional[datetime]:
+    """The first time strictly after ``after`` that the reminder fires, or None"""
+    at_time = _parse(reminder.get("time"), dtime)
+    if at_time is None:
+        return None
+    on_date = _parse(reminder.get("date"), date)
+    daily = bool(reminder.get("daily"))
+    repeat_days = set(reminder.get("repeat_days") or [])
+
+    if not daily and not repeat_days:
+        if on_date is None:
+            return None
+        fire_at = datetime.combine(on_date, at_time.replace(tzinfo=None), tzinfo=tz)
+        return fire_at if fire_at > after else None
+
+    today = after.astimezone(tz).date()
+    start = max(today, on_date) if on_date else today
+    for offset in range(8):
+        day = start + timedelta(days=offset)
+        if not daily and day.isoweekday() % 7 not in repeat_days:
+            continue
+        fire_at = datetime.combine(day, at_time.replace(tzinfo=None), tzinfo=tz)
+        if fire_at > after:
+            return fire_at
+    return None
+
+
+class _Scheduled:
+    __slots__ = ("reminder", "fire_at", "version", "prepared_for")
+
+    def __init__(self, reminder: Dict[str, Any], fire_at: float):
+        self.reminder = reminder
+        self.fire_at = fire_at
+        self.version = 0
+        self.prepared_for: Optional[float] = None
+
+
+class ReminderScheduler:
+    def __init__(
+        self,
+        pregenerate: Callable[[Dict[str, Any]], Awaitable[str]],
+        loader: Optional[Callable[[], Awaitable[List[Dict[str, Any]]]]] = None,
+        lead_time: float = 300.0,
+        max_busy: int = 4,
+        busy_retry: float = 15.0,
+        max_concurrency: int = 1,
+        tz: tzinfo = timezone.utc,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.pregenerate = pregenerate
+        self.loader = loader
+        self.lead_time = lead_time
+        self.max_busy = max_busy
+        self.busy_retry = busy_retry
+        self.max_concurrency = max_concurrency
+        self.tz = tz
+        self.clock = clock
+        self._scheduled: Dict[str, _Scheduled] = {}
+        self._heap: list = []  # (due, seq, reminder_id, version); stale entries are skipped
+        self._seq = itertools.count()
+        self._prepared: Dict[str, Dict[str, Any]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pregen_tasks: set = set()
+        self.fired = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._pregen_tasks) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._pregen_tasks.clear()
+
+    def _push(self, reminder_id: str, due: float) -> None:
+        entry = self._scheduled[reminder_id]
+        entry.version += 1
+        if len(self._heap) > 2 * len(self._scheduled) + 64:
+            # Drop stale entries left behind by updates and deletes
+            self._heap = [
+                item for item in self._heap
+                if item[2] in self._scheduled and self._scheduled[item[2]].version == item[3]
+            ]
+            heapq.heapify(self._heap)
+        heapq.heappush(self._heap, (due, next(self._seq), reminder_id, entry.version))
+        if self._wake is not None:
+            self._wake.set()
+
+    def _pregen_due(self, entry: _Scheduled) -> float:
+        return max(self.clock(), entry.fire_at - self.lead_time)
+
+    def upsert(self, reminder: Dict[str, Any]) -> None:
+        """Schedule (or reschedule) a created or updated reminder"""
+        if not self.running or not reminder.get("id"):
+            return
+        reminder_id = str(reminder["id"])
+        after = datetime.fromtimestamp(self.clock(), tz=timezone.utc)
+        fire_at = next_fire_time(reminder, after, self.tz)
+        if fire_at is None:
+            self.remove(reminder_id)
+            return
+        previous = self._scheduled.get(reminder_id)
+        if previous is not None and previous.reminder.get("topic") != reminder.get("topic"):
+            self._prepared.pop(reminder_id, None)
+        entry = _Scheduled(reminder, fire_at.timestamp())
+        if previous is not None:
+            entry.version = previous.version
+            if previous.fire_at == entry.fire_at and reminder_id in self._prepared:
+                entry.prepared_for = previous.prepared_for
+        self._scheduled[reminder_id] = entry
+        self._push(reminder_id, self._pregen_due(entry))
+        scheduled_reminders.set(len(self._scheduled))
+
+    def remove(self, reminder_id: str) -> None:
+        """Forget a deleted reminder; its heap entries become stale"""
+        if self._scheduled.pop(str(reminder_id), None) is not None:
+            scheduled_reminders.set(len(self._scheduled))
+        self._prepared.pop(str(reminder_id), None)
+
+    def prepared(self, reminder_id: str) -> Optional[Dict[str, Any]]:
+        return self._prepared.get(str(reminder_id))
+
+    async def _load(self) -> None:
+        if self.loader is None:
+            return
+        try:
+            reminders = await self.loader()
+        except Exception as e:
+            logger.warning("Reminder scheduler could not load reminders: %s", e)
+            return
+        for reminder in reminders:
+            self.upsert(reminder)
+        logger.info("Reminder scheduler loaded %d upcoming reminders", len(self._scheduled))
+
+    def _busy(self) -> bool:
+        return generations_in_flight.total() >= self.max_busy
+
+    async def _pregenerate(self, reminder_id: str, entry: _Scheduled) -> None:
+        async with self._semaphore:
+            try:
+                text = await self.pregenerate(entry.reminder)
+            except Exception as e:
+                reminder_pregenerations.inc(outcome="failed")
+                logger.warning("Pre-generation for reminder %s failed: %s", reminder_id, e)
+                return
+        if self._scheduled.get(reminder_id) is not entry:
+            return  # updated or deleted meanwhile
+        entry.prepared_for = entry.fire_at
+        self._prepared[reminder_id] = {
+            "reminder_id": reminder_id,
+            "user_id": entry.reminder.get("user_id"),
+            "topic": entry.reminder.get("topic"),
+            "generated_text": text,
+            "generated_at": self.clock(),
+            "fire_at": entry.fire_at,
+        }
+        reminder_pregenerations.inc(outcome="succeeded")
+
+    def _step(self, reminder_id: str, entry: _Scheduled) -> None:
+        now = self.clock()
+        if now >= entry.fire_at:
+            self.fired += 1
+            logger.info("Reminder fired", extra={"reminder_id": reminder_id, "title": entry.reminder.get("title")})
+            # Recurring reminders move to their next occurrence
+            fire_at = next_fire_time(entry.reminder, datetime.fromtimestamp(now, tz=timezone.utc), self.tz)
+            if fire_at is None:
+                del self._scheduled[reminder_id]
+                scheduled_reminders.set(len(self._scheduled))
+                return
+            entry.fire_at = fire_at.timestamp()
+            self._push(reminder_id, self._pregen_due(entry))
+            return
+        if entry.prepared_for == entry.fire_at or not entry.reminder.get("topic"):
+            self._push(reminder_id, entry.fire_at)
+            return
+        # Stay off the upstream while live traffic is using it, unless the
+        # reminder is about to fire anyway
+        if self._busy() and now + self.busy_retry < entry.fire_at:
+            self._push(reminder_id, now + self.busy_retry)
+            return
+        task = asyncio.create_task(self._pregenerate(reminder_id, entry))
+        self._pregen_tasks.add(task)
+        task.add_done_callback(self._pregen_tasks.discard)
+        self._push(reminder_id, entry.fire_at)
+
+    async def _run(self) -> None:
+        await self._load()
+        while True:
+            now = self.clock()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, reminder_id, version = heapq.heappop(self._heap)
+                entry = self._scheduled.get(reminder_id)
+                if entry is not None and entry.version == version:
+                    self._step(reminder_id, entry)
+            self._wake.clear()
+            timeout = self._heap[0][0] - self.clock() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        upcoming = min((e.fire_at for e in self._scheduled.values()), default=None)
+        return {
+            "running": self.running,
+            "scheduled": len(self._scheduled),
+            "prepared": len(self._prepared),
+            "next_fire_at": upcoming,
+            "fired": self.fired,
+            "pregenerating": len(self._pregen_tasks),
+            "lead_time": self.lead_time,
+        }
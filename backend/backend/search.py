@@ -0,0 +1,334 @@
+"""
+In-memory full-text search over each user's generation history.
+
+``InvertedIndex`` ranks documents with BM25 and expands query terms by
+prefix, so ``"mark"`` also finds "marketing". Postings are stored as
+compact ``array`` pairs (document number, term frequency) rather than
+per-document dicts: a user with tens of thousands of entries costs a few
+bytes per posting instead of a dict slot each, and a query scans a handful
+of flat arrays. Each term's length-normalised term frequencies are cached
+as a float array, so scoring a posting is one multiply-add. Deletions leave
+tombstones that score 0; the index is compacted once a quarter of it is
+dead. Until then document frequencies still count the deleted documents,
+which only nudges IDF.
+
+``SearchIndexes`` keeps one index per user in a bounded LRU. An index is
+built lazily on the user's first search by a loader (the router reads the
+user's ``content_history`` rows) and tokenized in the threadpool. Writes
+handled by this process update the loaded indexes in place; writes made
+elsewhere (other workers, the database directly) are picked up when the
+index expires after ``max_age`` seconds and is rebuilt in the background
+while the old one keeps answering.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+MAX_QUERY_TERMS = 16
+# Shortest query term that is expanded by prefix, and how far
+MIN_PREFIX = 2
+MAX_EXPANSIONS = 50
+# Relative change in average document length that invalidates cached saturations
+AVGDL_DRIFT = 0.1
+
+# (doc_id, text, payload) as produced by a loader
+Document = Tuple[str, str, Any]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # Per document number; ids and payloads are None once deleted
+        self._ids: List[Optional[str]] = []
+        self._payloads: List[Any] = []
+        self._lengths = array("I")
+        self._numbers: Dict[str, int] = {}
+        # term -> (document numbers, term frequencies), in insertion order
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Sorted vocabulary for prefix lookups
+        self._terms: List[str] = []
+        self._total_length = 0
+        self._dead = 0
+        # term -> per-posting BM25 saturation, see _saturation
+        self._cache: Dict[str, array] = {}
+        self._cached_avgdl = 1.0
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._numbers
+
+    def _append(self, doc_id: str, text: str, payload: Any, new_terms: List[str]) -> None:
+        if doc_id in self._numbers:
+            self._discard(doc_id)
+        tokens = tokenize(text)
+        number = len(self._ids)
+        self._ids.append(doc_id)
+        self._payloads.append(payload)
+        self._lengths.append(len(tokens))
+        self._numbers[doc_id] = number
+        self._total_length += len(tokens)
+        for term, tf in Counter(tokens).items():
+            self._cache.pop(term, None)
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+                new_terms.append(term)
+            postings[0].append(number)
+            postings[1].append(min(tf, 0xFFFF))
+
+    def add(self, doc_id: str, text: str, payload: Any = None) -> None:
+        """Index (or re-index) one document"""
+        new_terms: List[str] = []
+        self._append(doc_id, text, payload, new_terms)
+        for term in new_terms:
+            insort(self._terms, term)
+
+    def add_many(self, docs: Iterable[Document]) -> None:
+        """Index a batch of documents, sorting the new vocabulary once"""
+        new_terms: List[str] = []
+        for doc_id, text, payload in docs:
+            self._append(doc_id, text, payload, new_terms)
+        if new_terms:
+            self._terms.extend(new_terms)
+            self._terms.sort()
+
+    def _discard(self, doc_id: str) -> bool:
+        number = self._numbers.pop(doc_id, None)
+        if number is None:
+            return False
+        self._ids[number] = None
+        self._payloads[number] = None
+        self._total_length -= self._lengths[number]
+        self._dead += 1
+        # Cached saturations would still score the deleted document
+        self._cache.clear()
+        return True
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        removed = sum(self._discard(doc_id) for doc_id in doc_ids)
+        if removed and self._dead * 4 > len(self._ids):
+            self.compact()
+        return removed
+
+    def compact(self) -> None:
+        """Drop deleted documents from the postings and renumber the rest"""
+        live = [n for n, doc_id in enumerate(self._ids) if doc_id is not None]
+        renumber = {old: new for new, old in enumerate(live)}
+        self._ids = [self._ids[n] for n in live]
+        self._payloads = [self._payloads[n] for n in live]
+        self._lengths = array("I", (self._lengths[n] for n in live))
+        self._numbers = {doc_id: n for n, doc_id in enumerate(self._ids)}
+        postings = {}
+        for term, (numbers, tfs) in self._postings.items():
+            kept = [(renumber[n], tf) for n, tf in zip(numbers, tfs) if n in renumber]
+            if kept:
+                postings[term] = (array("I", (n for n, _ in kept)), array("H", (tf for _, tf in kept)))
+        self._postings = postings
+        self._terms = sorted(postings)
+        self._dead = 0
+        self._cache.clear()
+
+    def _expand(self, term: str, prefix: bool) -> List[str]:
+        if not prefix or len(term) < MIN_PREFIX:
+            return [term] if term in self._postings else []
+        expansions = []
+        i = bisect_left(self._terms, term)
+        while i < len(self._terms) and self._terms[i].startswith(term) and len(expansions) < MAX_EXPANSIONS:
+            expansions.append(self._terms[i])
+            i += 1
+        return expansions
+
+    def _saturation(self, term: str, avgdl: float) -> array:
+        """``tf / (tf + k1 * (1 - b + b * dl / avgdl))`` for each posting of ``term``, cached.
+
+        Cached values use the average length from when they were computed;
+        the cache is dropped once it drifts by more than ``AVGDL_DRIFT``.
+        Deleted documents get 0 so they never score.
+        """
+        if abs(avgdl - self._cached_avgdl) > AVGDL_DRIFT * self._cached_avgdl:
+            self._cache.clear()
+            self._cached_avgdl = avgdl
+        cached = self._cache.get(term)
+        if cached is None:
+            base = self.k1 * (1 - self.b)
+            per_token = self.k1 * self.b / self._cached_avgdl
+            ids, lengths = self._ids, self._lengths
+            numbers, tfs = self._postings[term]
+            cached = self._cache[term] = array("f", (
+                tf / (tf + base + per_token * lengths[n]) if ids[n] is not None else 0.0
+                for n, tf in zip(numbers, tfs)
+            ))
+        return cached
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> Tuple[int, List[Tuple[Any, float]]]:
+        """The ``limit`` best (payload, score) pairs for ``query``, and how many documents matched.
+
+        Any query term may match. Each term contributes the BM25 score of
+        its best-scoring expansion in a document, so a document is not
+        rewarded for containing several words that share the prefix.
+        """
+        live = len(self._numbers)
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        expanded = [e for e in (self._expand(term, prefix) for term in terms) if e]
+        if not live or not expanded:
+            return 0, []
+        avgdl = self._total_length / live or 1.0
+        total_docs = len(self._ids)
+        # Dense accumulators indexed by document number: list indexing is
+        # much cheaper than dict updates on long posting lists
+        scores = [0.0] * total_docs
+        for expansions in expanded:
+            best = scores if len(expansions) == 1 else [0.0] * total_docs
+            for expansion in expansions:
+                numbers = self._postings[expansion][0]
+                df = len(numbers)
+                weight = math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) * (self.k1 + 1)
+                saturation = self._saturation(expansion, avgdl)
+                if best is scores:
+                    for n, sat in zip(numbers, saturation):
+                        scores[n] += weight * sat
+                else:
+                    for n, sat in zip(numbers, saturation):
+                        if weight * sat > best[n]:
+                            best[n] = weight * sat
+            if best is not scores:
+                scores = [a + c for a, c in zip(scores, best)]
+
+        matched = total_docs - scores.count(0.0)
+        if not matched:
+            return 0, []
+        # The limit-th best score bounds the candidates; newer documents win ties
+        threshold = max(heapq.nlargest(limit, scores)[-1], sys.float_info.min)
+        top = sorted(((score, n) for n, score in enumerate(scores) if score >= threshold), reverse=True)[:limit]
+        return matched, [(self._payloads[n], score) for score, n in top]
+
+    def stats(self) -> Dict[str, int]:
+        return {"documents": len(self), "terms": len(self._postings), "deleted": self._dead}
+
+
+@dataclass
+class _Entry:
+    index: InvertedIndex
+    built_at: float
+
+
+@dataclass
+class _Build:
+    task: asyncio.Task
+    # Writes seen while the build was loading, replayed onto the new index
+    pending: List[Tuple[str, Any]] = field(default_factory=list)
+
+
+class SearchIndexes:
+    """Per-user ``InvertedIndex`` LRU, built lazily and maintained incrementally"""
+
+    def __init__(
+        self,
+        loader: Callable[[str, Optional[str]], Awaitable[List[Document]]],
+        max_users: int = 64,
+        max_age: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.loader = loader
+        self.max_users = max_users
+        self.max_age = max_age
+        self.clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._builds: Dict[str, _Build] = {}
+        self.builds = 0
+        self.build_failures = 0
+
+    async def _build(self, user: str, auth_token: Optional[str]) -> InvertedIndex:
+        started = time.perf_counter()
+        try:
+            docs = await self.loader(user, auth_token)
+            index = InvertedIndex()
+            await run_in_threadpool(index.add_many, docs)
+            for op, arg in self._builds[user].pending:
+                if op == "add":
+                    index.add(*arg)
+                else:
+                    index.remove(arg)
+        except Exception:
+            self.build_failures += 1
+            raise
+        finally:
+            self._builds.pop(user, None)
+        self.builds += 1
+        self._entries[user] = _Entry(index, self.clock())
+        self._entries.move_to_end(user)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+        logger.info(
+            "Search index built",
+            extra={"documents": len(index), "duration_ms": round((time.perf_counter() - started) * 1000, 1)},
+        )
+        return index
+
+    def _start_build(self, user: str, auth_token: Optional[str]) -> _Build:
+        build = self._builds.get(user)
+        if build is None:
+            build = self._builds[user] = _Build(asyncio.ensure_future(self._build(user, auth_token)))
+            # Retrieve background failures so they are not reported as unhandled
+            build.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return build
+
+    async def get(self, user: str, auth_token: Optional[str] = None) -> InvertedIndex:
+        """The user's index; the first call builds it, later calls refresh it in the background"""
+        entry = self._entries.get(user)
+        if entry is not None:
+            self._entries.move_to_end(user)
+            if self.clock() - entry.built_at >= self.max_age:
+                self._start_build(user, auth_token)
+            return entry.index
+        # Shielded so one caller disconnecting does not abort a shared build
+        return await asyncio.shield(self._start_build(user, auth_token).task)
+
+    def add(self, user: str, doc_id: str, text: str, payload: Any = None) -> None:
+        """Index a new document for ``user`` if their index is loaded (or loading)"""
+        entry = self._entries.get(user)
+        if entry is not None:
+            entry.index.add(doc_id, text, payload)
+        build = self._builds.get(user)
+        if build is not None:
+            build.pending.append(("add", (doc_id, text, payload)))
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        """Drop deleted documents from every loaded index; owners are not known on delete"""
+        doc_ids = list(doc_ids)
+        for entry in self._entries.values():
+            entry.index.remove(doc_ids)
+        for build in self._builds.values():
+            build.pending.append(("remove", doc_ids))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._entries),
+            "max_users": self.max_users,
+            "documents": sum(len(e.index) for e in self._entries.values()),
+            "building": len(self._builds),
+            "builds": self.builds,
+            "build_failures": self.build_failures,
+        }
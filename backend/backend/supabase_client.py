@@ -2,12 +2,70 @@
 Supabase REST API client for data operations
 Uses HTTPS instead of direct PostgreSQL connection to bypass network issues
 """
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import httpx
 
+from .metrics import postgrest_duration, postgrest_errors
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Largest batch the bulk endpoints send to PostgREST in one request
+BULK_MAX_ROWS = _env_int('SUPABASE_BULK_MAX_ROWS', 500)
+
+# Relay list responses from PostgREST byte for byte instead of parsing,
+# validating and re-serializing every row (trusted list endpoints only)
+PASSTHROUGH_READS = os.getenv('SUPABASE_PASSTHROUGH_READS', 'false').lower() == 'true'
+
+
+def _in_filter(values: List[Any]) -> str:
+    """PostgREST ``in`` filter with each value double-quoted"""
+    quoted = ('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values)
+    return f'in.({",".join(quoted)})'
+
+
+def _select_query(
+    filters: Optional[Dict[str, Any]],
+    order_by: Optional[str],
+    limit: Optional[int],
+    offset: Optional[int],
+    params: Optional[Dict[str, str]],
+    columns: Optional[str],
+) -> Dict[str, str]:
+    query = dict(params or {})
+    if filters:
+        for key, value in filters.items():
+            query[key] = f'eq.{value}'
+    if columns:
+        query['select'] = columns
+    if order_by:
+        query['order'] = order_by
+    if limit is not None:
+        query['limit'] = str(limit)
+    if offset:
+        query['offset'] = str(offset)
+    return query
+
 
 class SupabaseClient:
     def __init__(self):
@@ -25,115 +83,347 @@ class SupabaseClient:
             'Content-Type': 'application/json',
             'Prefer': 'return=representation'
         }
-    
+
+        # Connection pool settings. A single AsyncClient is shared by every
+        # call so PostgREST requests reuse warm keep-alive connections instead
+        # of paying a TCP+TLS handshake each time.
+        self.max_connections = _env_int('SUPABASE_POOL_MAX_CONNECTIONS', 20)
+        self.max_keepalive_connections = _env_int('SUPABASE_POOL_MAX_KEEPALIVE', 10)
+        self.keepalive_expiry = _env_float('SUPABASE_POOL_KEEPALIVE_EXPIRY', 30.0)
+        self.timeout = _env_float('SUPABASE_TIMEOUT', 10.0)
+        self.http2 = os.getenv('SUPABASE_HTTP2', 'false').lower() == 'true'
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Pool usage counters (see pool_stats)
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests_total = 0
+        self._errors_total = 0
+        self._clients_opened = 0
+
+    async def open(self) -> None:
+        """Open the shared HTTP client (called on app startup)"""
+        if self._client is not None and not self._client.is_closed:
+            return
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning('SUPABASE_HTTP2=true but the h2 package is not installed, using HTTP/1.1')
+                http2 = False
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+        self._clients_opened += 1
+
+    async def close(self) -> None:
+        """Close the shared HTTP client (called on app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @asynccontextmanager
+    async def _request_slot(self, table: str, operation: str) -> AsyncIterator[httpx.AsyncClient]:
+        """Yield the shared client, tracking in-flight requests and latency.
+
+        The client is opened lazily so scripts and tests that never run the
+        app lifespan still work.
+        """
+        if self._client is None or self._client.is_closed:
+            await self.open()
+        self._in_flight += 1
+        self._requests_total += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        started = time.perf_counter()
+        try:
+            yield self._client
+        except Exception:
+            self._errors_total += 1
+            postgrest_errors.inc(table=table, operation=operation)
+            raise
+        finally:
+            self._in_flight -= 1
+            postgrest_duration.observe(time.perf_counter() - started, table=table, operation=operation)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool configuration and usage counters, used to size the pool"""
+        return {
+            'max_connections': self.max_connections,
+            'max_keepalive_connections': self.max_keepalive_connections,
+            'keepalive_expiry': self.keepalive_expiry,
+            'http2': self.http2,
+            'open': self._client is not None and not self._client.is_closed,
+            'clients_opened': self._clients_opened,
+            'in_flight': self._in_flight,
+            'peak_in_flight': self._peak_in_flight,
+            'requests_total': self._requests_total,
+            'errors_total': self._errors_total,
+        }
+
+    def _auth_headers(self, auth_token: Optional[str] = None) -> Dict[str, str]:
+        # Build headers per-request: prefer an explicit auth_token
+        # (user JWT) if provided; otherwise use service_role if set;
+        # otherwise fall back to anon apikey only.
+        headers = self.headers.copy()
+        if auth_token:
+            headers['Authorization'] = f'Bearer {auth_token}'
+        elif self.service_role:
+            headers['apikey'] = self.service_role
+            headers['Authorization'] = f'Bearer {self.service_role}'
+        return headers
+
     async def insert(self, table: str, data: Dict[str, Any], auth_token: Optional[str] = None) -> Optional[Dict]:
         """Insert a record into a table"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Build headers per-request: prefer an explicit auth_token
-                # (user JWT) if provided; otherwise use service_role if set;
-                # otherwise fall back to anon apikey only.
-                headers = self.headers.copy()
-                if auth_token:
-                    headers['Authorization'] = f'Bearer {auth_token}'
-                elif self.service_role:
-                    headers['apikey'] = self.service_role
-                    headers['Authorization'] = f'Bearer {self.service_role}'
-
+            async with self._request_slot(table, 'insert') as client:
                 response = await client.post(
                     f'{self.base_url}/rest/v1/{table}',
-                    headers=headers,
+                    headers=self._auth_headers(auth_token),
                     json=data
                 )
                 if response.status_code in [200, 201]:
                     result = response.json()
                     return result[0] if isinstance(result, list) else result
                 else:
-                    print(f'Supabase insert error: {response.status_code} - {response.text}')
+                    logger.warning('Supabase insert error', extra={'status': response.status_code, 'body': response.text[:500]})
                     return None
         except Exception as e:
-            print(f'Supabase insert exception: {e}')
+            logger.warning('Supabase insert exception: %s', e)
             return None
     
-    async def select(self, table: str, filters: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None, auth_token: Optional[str] = None) -> List[Dict]:
-        """Select records from a table"""
+    async def insert_many(
+        self, table: str, rows: List[Dict[str, Any]], auth_token: Optional[str] = None
+    ) -> Optional[List[Dict]]:
+        """Insert several records in one request
+
+        PostgREST requires every row to have the same keys. Returns the
+        inserted rows, or None if the batch failed (nothing is inserted).
+        """
+        if not rows:
+            return []
+        try:
+            async with self._request_slot(table, 'insert_many') as client:
+                response = await client.post(
+                    f'{self.base_url}/rest/v1/{table}',
+                    headers=self._auth_headers(auth_token),
+                    json=rows
+                )
+                if response.status_code in [200, 201]:
+                    return response.json()
+                else:
+                    logger.warning('Supabase insert_many error', extra={'status': response.status_code, 'body': response.text[:500]})
+                    return None
+        except Exception as e:
+            logger.warning('Supabase insert_many exception: %s', e)
+            return None
+
+    async def upsert_many(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: str = 'id',
+        auth_token: Optional[str] = None,
+        ignore_duplicates: bool = False,
+    ) -> Optional[List[Dict]]:
+        """Insert or update several records in one request
+
+        Rows whose ``on_conflict`` columns match an existing record are
+        merged into it, or skipped with ``ignore_duplicates`` (which only
+        needs INSERT permission). Returns the written rows, or None on
+        failure.
+        """
+        if not rows:
+            return []
+        try:
+            headers = self._auth_headers(auth_token)
+            resolution = 'ignore-duplicates' if ignore_duplicates else 'merge-duplicates'
+            headers['Prefer'] = f'resolution={resolution},return=representation'
+            async with self._request_slot(table, 'upsert_many') as client:
+                response = await client.post(
+                    f'{self.base_url}/rest/v1/{table}',
+                    headers=headers,
+                    params={'on_conflict': on_conflict},
+                    json=rows
+                )
+                if response.status_code in [200, 201]:
+                    return response.json()
+                else:
+                    logger.warning('Supabase upsert_many error', extra={'status': response.status_code, 'body': response.text[:500]})
+                    return None
+        except Exception as e:
+            logger.warning('Supabase upsert_many exception: %s', e)
+            return None
+
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        auth_token: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        params: Optional[Dict[str, str]] = None,
+        columns: Optional[str] = None,
+    ) -> List[Dict]:
+        """Select records from a table
+
+        ``columns`` projects the result (PostgREST ``select``, e.g.
+        ``"id,email"``); ``limit``/``offset`` bound the result set; ``params``
+        carries raw PostgREST query parameters (e.g. an ``or`` filter for
+        keyset paging).
+        """
         try:
             url = f'{self.base_url}/rest/v1/{table}'
-            params = {}
-            
-            if filters:
-                for key, value in filters.items():
-                    params[key] = f'eq.{value}'
-            
-            if order_by:
-                params['order'] = order_by
-            
-            headers = self.headers.copy()
-            if auth_token:
-                headers['Authorization'] = f'Bearer {auth_token}'
-            elif self.service_role:
-                headers['apikey'] = self.service_role
-                headers['Authorization'] = f'Bearer {self.service_role}'
-
-            async with httpx.AsyncClient() as client:
+            query = _select_query(filters, order_by, limit, offset, params, columns)
+
+            async with self._request_slot(table, 'select') as client:
                 response = await client.get(
                     url,
-                    headers=headers,
-                    params=params
+                    headers=self._auth_headers(auth_token),
+                    params=query
                 )
                 if response.status_code == 200:
                     return response.json()
                 else:
-                    print(f'Supabase select error: {response.status_code} - {response.text}')
+                    logger.warning('Supabase select error', extra={'status': response.status_code, 'body': response.text[:500]})
                     return []
         except Exception as e:
-            print(f'Supabase select exception: {e}')
+            logger.warning('Supabase select exception: %s', e)
             return []
+
+    @asynccontextmanager
+    async def select_stream(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        auth_token: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        params: Optional[Dict[str, str]] = None,
+        columns: Optional[str] = None,
+    ) -> AsyncIterator[Optional[httpx.Response]]:
+        """Run a select without reading its body
+
+        Yields the open 200 response, whose JSON array the caller relays
+        chunk by chunk (``aiter_bytes``) without parsing, or None if
+        PostgREST answered with an error. Takes the same arguments as
+        ``select``.
+        """
+        url = f'{self.base_url}/rest/v1/{table}'
+        query = _select_query(filters, order_by, limit, offset, params, columns)
+        async with self._request_slot(table, 'select_stream') as client:
+            async with client.stream('GET', url, headers=self._auth_headers(auth_token), params=query) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    logger.warning('Supabase select_stream error', extra={'status': response.status_code, 'body': response.text[:500]})
+                    yield None
+                else:
+                    yield response
     
+    async def count(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        auth_token: Optional[str] = None,
+        method: str = 'exact',
+        params: Optional[Dict[str, str]] = None,
+    ) -> Optional[int]:
+        """Count matching rows without transferring them
+
+        Sends a HEAD request with ``Prefer: count=<method>`` and reads the
+        total from ``Content-Range``. ``method`` is ``exact``, ``planned``
+        (planner estimate, cheapest) or ``estimated``.
+        """
+        try:
+            query = dict(params or {})
+            if filters:
+                for key, value in filters.items():
+                    query[key] = f'eq.{value}'
+
+            headers = self._auth_headers(auth_token)
+            headers['Prefer'] = f'count={method}'
+
+            async with self._request_slot(table, 'count') as client:
+                response = await client.head(
+                    f'{self.base_url}/rest/v1/{table}',
+                    headers=headers,
+                    params=query
+                )
+                if response.status_code in [200, 206]:
+                    # Content-Range looks like "0-24/3573" or "*/3573"
+                    total = response.headers.get('content-range', '').rsplit('/', 1)[-1]
+                    return int(total) if total.isdigit() else None
+                else:
+                    logger.warning('Supabase count error', extra={'status': response.status_code})
+                    return None
+        except Exception as e:
+            logger.warning('Supabase count exception: %s', e)
+            return None
+
     async def delete(self, table: str, id: str, auth_token: Optional[str] = None) -> bool:
         """Delete a record from a table"""
         try:
-            headers = self.headers.copy()
-            if auth_token:
-                headers['Authorization'] = f'Bearer {auth_token}'
-            elif self.service_role:
-                headers['apikey'] = self.service_role
-                headers['Authorization'] = f'Bearer {self.service_role}'
-
-            async with httpx.AsyncClient() as client:
+            async with self._request_slot(table, 'delete') as client:
                 response = await client.delete(
                     f'{self.base_url}/rest/v1/{table}?id=eq.{id}',
-                    headers=headers
+                    headers=self._auth_headers(auth_token)
                 )
                 return response.status_code in [200, 204]
         except Exception as e:
-            print(f'Supabase delete exception: {e}')
+            logger.warning('Supabase delete exception: %s', e)
             return False
     
+    async def delete_many(
+        self, table: str, ids: List[str], auth_token: Optional[str] = None
+    ) -> Optional[List[str]]:
+        """Delete several records by id in one request (``id=in.(...)``)
+
+        Returns the ids that were actually deleted (missing ids, or rows
+        hidden by RLS, are left out), or None on failure.
+        """
+        if not ids:
+            return []
+        try:
+            async with self._request_slot(table, 'delete_many') as client:
+                response = await client.delete(
+                    f'{self.base_url}/rest/v1/{table}',
+                    headers=self._auth_headers(auth_token),
+                    params={'id': _in_filter(ids), 'select': 'id'}
+                )
+                if response.status_code == 200:
+                    return [row['id'] for row in response.json()]
+                else:
+                    logger.warning('Supabase delete_many error', extra={'status': response.status_code, 'body': response.text[:500]})
+                    return None
+        except Exception as e:
+            logger.warning('Supabase delete_many exception: %s', e)
+            return None
+
     async def update(self, table: str, id: str, data: Dict[str, Any], auth_token: Optional[str] = None) -> Optional[Dict]:
         """Update a record in a table"""
         try:
-            headers = self.headers.copy()
-            if auth_token:
-                headers['Authorization'] = f'Bearer {auth_token}'
-            elif self.service_role:
-                headers['apikey'] = self.service_role
-                headers['Authorization'] = f'Bearer {self.service_role}'
-
-            async with httpx.AsyncClient() as client:
+            async with self._request_slot(table, 'update') as client:
                 response = await client.patch(
                     f'{self.base_url}/rest/v1/{table}?id=eq.{id}',
-                    headers=headers,
+                    headers=self._auth_headers(auth_token),
                     json=data
                 )
                 if response.status_code == 200:
                     result = response.json()
                     return result[0] if isinstance(result, list) else result
                 else:
-                    print(f'Supabase update error: {response.status_code} - {response.text}')
+                    logger.warning('Supabase update error', extra={'status': response.status_code, 'body': response.text[:500]})
                     return None
         except Exception as e:
-            print(f'Supabase update exception: {e}')
+            logger.warning('Supabase update exception: %s', e)
             return None
 
 
@@ -1,41 +1,160 @@
+import asyncio
+import hashlib
 import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
 
-import requests
-from jose import jwk, jwt
+import httpx
+from jose import jwt
 from jose.exceptions import JWTError
 
 
-def validate_supabase_jwt(token: str) -> dict:
-    """Validate Supabase JWT using JWKS.
-    
-    This is a minimal placeholder implementation.
-    For production, cache the JWKS and validate audience/issuer properly.
+class JWKSCache:
+    """Supabase JWKS keyed by ``kid``, refreshed in the background.
+
+    Keys are served from memory until ``ttl`` expires. Once a key set is
+    within ``refresh_ahead`` seconds of expiring, a background refresh is
+    started while the current keys keep being served. An unknown ``kid``
+    (key rotation) triggers an immediate refetch, at most once every
+    ``min_refetch_interval`` seconds so garbage tokens cannot hammer the
+    JWKS endpoint.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl: float = 600.0,
+        refresh_ahead: float = 60.0,
+        min_refetch_interval: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self._transport = transport
+        self._keys: Dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.fetches = 0
+
+    async def _fetch(self) -> None:
+        async with httpx.AsyncClient(timeout=5.0, transport=self._transport) as client:
+            resp = await client.get(self.url)
+            resp.raise_for_status()
+            jwks = resp.json()
+        self._keys = {k["kid"]: k for k in jwks.get("keys", []) if k.get("kid")}
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+
+    async def refresh(self, force: bool = False) -> None:
+        """Refetch the key set unless another caller just did"""
+        async with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if self._keys and age < (self.min_refetch_interval if force else self.ttl - self.refresh_ahead):
+                return
+            await self._fetch()
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def get_key(self, kid: Optional[str]) -> dict:
+        age = time.monotonic() - self._fetched_at
+        if not self._keys or age >= self.ttl:
+            await self.refresh()
+        elif age >= self.ttl - self.refresh_ahead:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid) if kid else None
+        if key is None:
+            # Possibly a rotated key we have not seen yet
+            await self.refresh(force=True)
+            key = self._keys.get(kid) if kid else None
+        if key is None:
+            raise RuntimeError("No matching key found in JWKS")
+        return key
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified token payloads, keyed by token hash.
+
+    Entries are dropped once the token's ``exp`` passes, so a cached
+    payload is never returned for an expired token.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        exp, payload = entry
+        if exp <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)) or self.max_size <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = (float(exp), payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+_jwks_cache: Optional[JWKSCache] = None
+verified_tokens = VerifiedTokenCache(max_size=int(os.getenv("JWT_CACHE_SIZE", "1024")))
+
+
+def _get_jwks_cache(url: str) -> JWKSCache:
+    global _jwks_cache
+    if _jwks_cache is None or _jwks_cache.url != url:
+        _jwks_cache = JWKSCache(url, ttl=float(os.getenv("JWKS_CACHE_TTL", "600")))
+    return _jwks_cache
+
+
+async def validate_supabase_jwt(token: str) -> dict:
+    """Validate Supabase JWT using the cached JWKS.
+
+    Tokens that were already verified are served from an LRU until they
+    expire, skipping RSA verification.
     """
     jwks_url = os.getenv("SUPABASE_JWKS_URL")
     if not jwks_url:
         # For dev/testing without Supabase
         return {"sub": "test-user-id", "email": "test@example.com"}
-    
+
+    cached = verified_tokens.get(token)
+    if cached is not None:
+        return cached
+
     try:
-        # Fetch JWKS
-        resp = requests.get(jwks_url, timeout=5)
-        resp.raise_for_status()
-        jwks = resp.json()
-        
         # Decode header to get key ID
         unverified_header = jwt.get_unverified_header(token)
-        kid = unverified_header.get("kid")
-        
-        # Find matching key
-        key = None
-        for k in jwks.get("keys", []):
-            if k.get("kid") == kid:
-                key = k
-                break
-        
-        if not key:
-            raise RuntimeError("No matching key found in JWKS")
-        
+        key = await _get_jwks_cache(jwks_url).get_key(unverified_header.get("kid"))
+
         # Verify token
         payload = jwt.decode(
             token,
@@ -43,9 +162,10 @@ def validate_supabase_jwt(token: str) -> dict:
             algorithms=["RS256"],
             options={"verify_aud": False}  # Adjust based on your needs
         )
-        return payload
-        
     except JWTError as e:
         raise RuntimeError(f"Invalid token: {e}") from e
     except Exception as e:
         raise RuntimeError(f"Token validation failed: {e}") from e
+
+    verified_tokens.put(token, payload)
+    return payload
@@ -0,0 +1,177 @@
+"""
+Write-behind buffer for PostgREST inserts.
+
+Rows are acknowledged as soon as they are buffered and written later as one
+batched insert, when ``max_batch`` rows are waiting or ``flush_interval``
+seconds have passed. A failed batch is retried with exponential backoff;
+after ``max_retries`` it goes back to the front of the buffer for the next
+flush. Rows that have failed ``max_flushes`` flushes in a row (an expired
+token, a row RLS rejects) are dropped and counted, as is anything the
+shutdown flush cannot write.
+
+Each row keeps the caller's auth token; a batch is split into one insert per
+token so PostgREST still applies the caller's RLS policies. A batch may be
+written more than once (e.g. a timed-out insert that did commit), so the
+writer should be idempotent.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import write_buffer_depth, write_buffer_flush_duration, write_buffer_rows
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFullError(Exception):
+    """Raised when the buffer already holds ``max_buffer`` rows"""
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        table: str,
+        writer: Callable[[str, List[Dict[str, Any]], Optional[str]], Awaitable[Optional[list]]],
+        max_batch: int = 100,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_buffer: int = 10000,
+        max_flushes: int = 5,
+    ):
+        self.table = table
+        self.writer = writer
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_buffer = max_buffer
+        self.max_flushes = max_flushes
+        self._rows: deque = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _set_depth(self) -> None:
+        write_buffer_depth.set(len(self._rows), table=self.table)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._rows:
+            await self.flush(final=True)
+
+    def add(self, row: Dict[str, Any], auth_token: Optional[str] = None) -> None:
+        if not self.running:
+            raise RuntimeError("Write-behind buffer is not running")
+        if len(self._rows) >= self.max_buffer:
+            raise BufferFullError(f"Write-behind buffer for {self.table} is full ({self.max_buffer} rows)")
+        # (auth_token, row, flushes that already failed for this row)
+        self._rows.append((auth_token, row, 0))
+        self._set_depth()
+        if len(self._rows) >= self.max_batch:
+            self._wake.set()
+
+    async def _flusher(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._rows:
+                await self.flush()
+
+    async def _write(self, rows: List[Dict[str, Any]], auth_token: Optional[str]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            started = time.perf_counter()
+            try:
+                result = await self.writer(self.table, rows, auth_token)
+            except Exception as e:
+                logger.warning("Write-behind flush to %s raised: %s", self.table, e)
+                result = None
+            write_buffer_flush_duration.observe(time.perf_counter() - started, table=self.table)
+            if result is not None:
+                return True
+            self.failures += 1
+        return False
+
+    def _drop(self, items: List[tuple], reason: str) -> None:
+        self.dropped += len(items)
+        write_buffer_rows.inc(len(items), table=self.table, outcome="dropped")
+        logger.error("Dropped %d buffered %s rows %s", len(items), self.table, reason)
+
+    async def flush(self, final: bool = False) -> None:
+        """Write buffered rows in batches of ``max_batch``"""
+        lock = self._lock or asyncio.Lock()
+        async with lock:
+            while self._rows:
+                batch = [self._rows.popleft() for _ in range(min(self.max_batch, len(self._rows)))]
+                self._set_depth()
+                by_token: Dict[Optional[str], List[tuple]] = {}
+                for item in batch:
+                    by_token.setdefault(item[0], []).append(item)
+                failed = []
+                done = set()
+                try:
+                    for auth_token, items in by_token.items():
+                        if await self._write([row for _, row, _ in items], auth_token):
+                            self.flushes += 1
+                            write_buffer_rows.inc(len(items), table=self.table, outcome="written")
+                        else:
+                            failed.extend((token, row, flushes + 1) for token, row, flushes in items)
+                        done.add(auth_token)
+                except asyncio.CancelledError:
+                    # Interrupted (e.g. by stop): keep failed and unwritten rows for the final flush
+                    pending = failed + [item for item in batch if item[0] not in done]
+                    self._rows.extendleft(reversed(pending))
+                    self._set_depth()
+                    raise
+                if not failed:
+                    continue
+                if final:
+                    self._drop(failed, f"after {self.max_retries} retries")
+                    continue
+                expired = [item for item in failed if item[2] >= self.max_flushes]
+                if expired:
+                    self._drop(expired, f"after failing {self.max_flushes} flushes")
+                    failed = [item for item in failed if item[2] < self.max_flushes]
+                # Keep failed rows for the next flush, ahead of newer rows
+                self._rows.extendleft(reversed(failed))
+                self._set_depth()
+                logger.warning("Write-behind flush to %s failed; %d rows still buffered", self.table, len(self._rows))
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "running": self.running,
+            "depth": len(self._rows),
+            "max_batch": self.max_batch,
+            "flush_interval": self.flush_interval,
+            "max_flushes": self.max_flushes,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,376 @@
+"""
+Benchmark: end-to-end throughput and latency of the API.
+
+Runs the FastAPI app in-process under uvicorn, pointed at two local
+stand-ins also served from this process: an OpenAI-compatible chat
+completions server (in place of Groq) and a PostgREST server (in place of
+Supabase). Both have configurable latency and error injection, so results
+reflect the app's own overhead rather than the network.
+
+For each scenario (``POST /generate/``, ``GET /history/``,
+``GET /reminders/``) and each concurrency level it reports req/s, error
+counts and p50/p95/p99 latency as JSON. Save a run with ``--output`` and
+pass it as ``--baseline`` on a later commit to get percentage deltas.
+
+    python -m benchmarks.bench_app --requests 500 --concurrency 1,8,32
+    python -m benchmarks.bench_app --output before.json
+    python -m benchmarks.bench_app --baseline before.json --upstream-error-rate 0.05
+
+Everything shares one event loop, so absolute numbers understate a
+multi-worker deployment; compare runs made on the same machine.
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Self
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+SCENARIOS = ("generate", "history", "reminders")
+TYPES = ("blog", "caption", "tweet")
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+class Fault:
+    """Latency and error injection for a stand-in server"""
+
+    def __init__(self, latency_ms: float, jitter: float, error_rate: float, error_status: int, seed: int):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def apply(self) -> Optional[Response]:
+        """Sleep for the configured latency; return an error response to inject, if any"""
+        self.requests += 1
+        if self.latency:
+            spread = self.latency * self.jitter
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-spread, spread)))
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=self.error_status)
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "injected_errors": self.errors}
+
+
+def fake_openai(fault: Fault) -> Starlette:
+    """Minimal OpenAI-compatible ``/chat/completions`` (non-streaming)"""
+
+    async def chat_completions(request: Request) -> Response:
+        body = await request.json()
+        error = await fault.apply()
+        if error is not None:
+            return error
+        max_tokens = int(body.get("max_tokens") or 256)
+        # Roughly four characters per token, like real output
+        text = ("lorem ipsum " * max_tokens)[: max_tokens * 4]
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": max_tokens,
+                "total_tokens": prompt_tokens + max_tokens,
+            },
+        })
+
+    return Starlette(routes=[Route("/chat/completions", chat_completions, methods=["POST"])])
+
+
+def _history_rows(n: int) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.UUID(int=i + 1)),
+            "user_id": USER_ID,
+            "type": TYPES[i % len(TYPES)],
+            "input_text": f"benchmark topic {i}",
+            "generated_text": "lorem ipsum dolor sit amet " * 40,
+            "created_at": (now - timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(n)
+    ]
+
+
+def _reminder_rows(n: int) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.UUID(int=10**6 + i)),
+            "user_id": USER_ID,
+            "title": f"Reminder {i}",
+            "topic": f"benchmark topic {i}",
+            "date": (now + timedelta(days=i % 30)).date().isoformat(),
+            "time": "09:00:00",
+            "daily": i % 5 == 0,
+            "repeat_days": None,
+            "created_at": (now - timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(n)
+    ]
+
+
+def fake_postgrest(fault: Fault, tables: Dict[str, List[Dict[str, Any]]]) -> Starlette:
+    """PostgREST stand-in serving fixed rows; honours ``limit``/``offset`` and count requests"""
+
+    async def table(request: Request) -> Response:
+        error = await fault.apply()
+        if error is not None:
+            return error
+        rows = tables.setdefault(request.path_params["table"], [])
+        if request.method in ("GET", "HEAD"):
+            offset = int(request.query_params.get("offset", 0))
+            limit = int(request.query_params.get("limit", len(rows)))
+            page = rows[offset:offset + limit]
+            headers = {}
+            if "count=" in request.headers.get("prefer", ""):
+                headers["Content-Range"] = f"{offset}-{offset + len(page) - 1}/{len(rows)}" if page else f"*/{len(rows)}"
+            if request.method == "HEAD":
+                return Response(headers=headers)
+            return JSONResponse(page, headers=headers)
+        if request.method == "POST":
+            body = await request.json()
+            created = [
+                {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat(), **row}
+                for row in (body if isinstance(body, list) else [body])
+            ]
+            return JSONResponse(created, status_code=201)
+        return JSONResponse([])
+
+    return Starlette(routes=[
+        Route("/rest/v1/{table}", table, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+    ])
+
+
+def _listen() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Inherited by accepted connections; without it small responses wait on delayed ACKs
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+class _Served:
+    """An ASGI app served by uvicorn on an ephemeral loopback port"""
+
+    def __init__(self, app, lifespan: str = "off"):
+        self.sock = _listen()
+        self.url = "http://127.0.0.1:%d" % self.sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, lifespan=lifespan, log_level="warning", access_log=False))
+        self.task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> Self:
+        self.task = asyncio.create_task(self.server.serve(sockets=[self.sock]))
+        while not self.server.started:
+            if self.task.done():
+                self.task.result()
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.server.should_exit = True
+        await self.task
+
+
+def _configure_app(openai_url: str, postgrest_url: str) -> None:
+    """Point the app at the stand-ins; must run before ``backend.main`` is imported"""
+    os.environ.update({
+        "CONTENT_PROVIDER": "groq",
+        "GROQ_API_KEY": "bench",
+        "GROQ_BASE_URL": openai_url,
+        "UPSTREAM_HTTP2": "false",
+        "SUPABASE_URL": postgrest_url,
+        "SUPABASE_ANON_KEY": "bench",
+        "USE_SUPABASE_REST": "true",
+        # Measure the app, not the per-caller limiter (every request comes from 127.0.0.1)
+        "GENERATE_USER_RPM": "100000000",
+        "GENERATE_USER_BURST": "100000000",
+        "REMINDER_SCHEDULER": "false",
+        "HISTORY_WRITE_BEHIND": "false",
+    })
+
+
+def _scenarios(topic_pool: int, page_size: int) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    def generate(i: int) -> Dict[str, Any]:
+        # A topic pool > 0 lets the result cache and single-flight layer hit
+        topic = f"benchmark topic {i % topic_pool if topic_pool else i}"
+        return {"method": "POST", "url": "/generate/", "json": {"type": TYPES[i % len(TYPES)], "topic": topic}}
+
+    return {
+        "generate": generate,
+        "history": lambda i: {"method": "GET", "url": "/history/", "params": {"limit": page_size}},
+        "reminders": lambda i: {"method": "GET", "url": "/reminders/"},
+    }
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _load(client: httpx.AsyncClient, build, requests: int, concurrency: int, offset: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = itertools.count(offset)
+    remaining = itertools.count()
+
+    async def worker() -> None:
+        while next(remaining) < requests:
+            spec = build(next(counter))
+            started = time.perf_counter()
+            try:
+                response = await client.request(**spec)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    ok = sum(n for s, n in statuses.items() if s.startswith("2"))
+    return {
+        "requests": requests,
+        "errors": requests - ok,
+        "statuses": statuses,
+        "seconds": round(elapsed, 4),
+        "per_second": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Percentage change of req/s and latency percentiles against a saved run"""
+    deltas: Dict[str, Any] = {}
+    for scenario, levels in results.items():
+        for level, current in levels.items():
+            before = baseline.get("results", {}).get(scenario, {}).get(level)
+            if not before:
+                continue
+            deltas.setdefault(scenario, {})[level] = {
+                key: round((current[key] - before[key]) / before[key] * 100, 1) if before[key] else None
+                for key in ("per_second", "p50_ms", "p95_ms", "p99_ms")
+            }
+    return deltas
+
+
+async def main(args: argparse.Namespace, baseline: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    upstream_fault = Fault(
+        args.upstream_latency_ms, args.jitter, args.upstream_error_rate, args.upstream_error_status, args.seed
+    )
+    postgrest_fault = Fault(
+        args.postgrest_latency_ms, args.jitter, args.postgrest_error_rate, 500, args.seed + 1
+    )
+    tables = {"content_history": _history_rows(args.history_rows), "reminders": _reminder_rows(args.reminder_rows)}
+
+    async with _Served(fake_openai(upstream_fault)) as openai, _Served(fake_postgrest(postgrest_fault, tables)) as rest:
+        _configure_app(openai.url, rest.url)
+        from backend.main import app
+
+        async with _Served(app, lifespan="on") as api:
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=api.url, limits=limits, timeout=60.0) as client:
+                scenarios = _scenarios(args.topic_pool, args.page_size)
+                results: Dict[str, Any] = {}
+                offset = 0
+                for name in args.scenarios:
+                    build = scenarios[name]
+                    await _load(client, build, args.warmup, min(args.warmup, 4), offset)
+                    offset += args.warmup
+                    results[name] = {}
+                    for level in args.concurrency:
+                        results[name][str(level)] = await _load(client, build, args.requests, level, offset)
+                        offset += args.requests
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "results": results,
+        "stand_ins": {"upstream": upstream_fault.stats(), "postgrest": postgrest_fault.stats()},
+    }
+    if baseline is not None:
+        report["baseline"] = {"commit": baseline.get("meta", {}).get("commit"), "delta_pct": _compare(results, baseline)}
+    return report
+
+
+def _csv(kind):
+    return lambda value: [kind(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=_csv(str), default=list(SCENARIOS), help="comma-separated subset of %s" % ",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-error-status", type=int, default=503)
+    parser.add_argument("--postgrest-latency-ms", type=float, default=5.0)
+    parser.add_argument("--postgrest-error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency spread as a fraction of the mean")
+    parser.add_argument("--topic-pool", type=int, default=0, help="distinct generate topics (0 = every request unique)")
+    parser.add_argument("--history-rows", type=int, default=500)
+    parser.add_argument("--reminder-rows", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="report from an earlier run to compare against")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # The app logs every request to stdout; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main(args, baseline))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
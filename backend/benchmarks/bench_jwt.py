@@ -0,0 +1,107 @@
+"""
+Microbenchmark: Supabase JWT validations per second.
+
+Compares the old path (fetch JWKS + RSA verify on every call) with the
+cached path (JWKS cache, cold tokens) and the verified-token LRU (warm
+tokens). The JWKS endpoint is an in-process stand-in with a configurable
+latency so no network is needed.
+
+    python -m benchmarks.bench_jwt --iterations 500 --jwks-latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from backend.utils.supabase_jwt import JWKSCache, VerifiedTokenCache
+
+JWKS_URL = "http://jwks.test/auth/v1/.well-known/jwks.json"
+KID = "bench-key"
+
+
+def _make_key():
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk = {k: (v.decode() if isinstance(v, bytes) else v) for k, v in public_jwk.items()}
+    public_jwk["kid"] = KID
+    return private_pem, {"keys": [public_jwk]}
+
+
+def _make_tokens(private_pem: bytes, n: int) -> list[str]:
+    exp = int(time.time()) + 3600
+    return [
+        jwt.encode({"sub": f"user-{i}", "exp": exp}, private_pem, algorithm="RS256", headers={"kid": KID})
+        for i in range(n)
+    ]
+
+
+def _transport(jwks: dict, latency: float) -> httpx.AsyncBaseTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=jwks)
+
+    return httpx.MockTransport(handler)
+
+
+async def _uncached(tokens: list[str], transport) -> None:
+    """The previous implementation: fetch the JWKS for every validation."""
+    for token in tokens:
+        async with httpx.AsyncClient(transport=transport) as client:
+            keys = (await client.get(JWKS_URL)).json()["keys"]
+        kid = jwt.get_unverified_header(token)["kid"]
+        key = next(k for k in keys if k["kid"] == kid)
+        jwt.decode(token, key, algorithms=["RS256"], options={"verify_aud": False})
+
+
+async def _jwks_cached(tokens: list[str], transport) -> None:
+    cache = JWKSCache(JWKS_URL, transport=transport)
+    for token in tokens:
+        key = await cache.get_key(jwt.get_unverified_header(token)["kid"])
+        jwt.decode(token, key, algorithms=["RS256"], options={"verify_aud": False})
+
+
+async def _token_cached(tokens: list[str], transport) -> None:
+    cache = JWKSCache(JWKS_URL, transport=transport)
+    verified = VerifiedTokenCache(max_size=len(tokens))
+    for token in tokens:
+        if verified.get(token) is not None:
+            continue
+        key = await cache.get_key(jwt.get_unverified_header(token)["kid"])
+        verified.put(token, jwt.decode(token, key, algorithms=["RS256"], options={"verify_aud": False}))
+
+
+async def main(iterations: int, latency_ms: float) -> dict:
+    private_pem, jwks = _make_key()
+    transport = _transport(jwks, latency_ms / 1000)
+    # 10 distinct tokens reused across iterations, like a handful of active sessions
+    distinct = _make_tokens(private_pem, 10)
+    tokens = [distinct[i % len(distinct)] for i in range(iterations)]
+
+    results = {}
+    for name, fn in [("uncached", _uncached), ("jwks_cached", _jwks_cached), ("token_cached", _token_cached)]:
+        start = time.perf_counter()
+        await fn(tokens, transport)
+        elapsed = time.perf_counter() - start
+        results[name] = {"validations": iterations, "seconds": round(elapsed, 4), "per_second": round(iterations / elapsed, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--jwks-latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.iterations, args.jwks_latency_ms)), indent=2))
@@ -0,0 +1,86 @@
+"""
+Benchmark: PostgREST (HTTPS) vs direct Postgres for the history queries.
+
+Runs the same repository calls through ``SupabaseClient`` and
+``PostgresRepository``: a keyset page of ``content_history`` (what
+``GET /history/`` issues), a per-type count (``GET /history/stats``) and a
+single-user projection (``GET /users/{id}``). Needs SUPABASE_URL,
+SUPABASE_ANON_KEY or SUPABASE_SERVICE_ROLE_KEY, and DATABASE_URL for the
+same project.
+
+    python -m benchmarks.bench_repository --iterations 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from backend import db as _db  # noqa: E402
+from backend.repository import PostgresRepository  # noqa: E402
+from backend.supabase_client import SupabaseClient  # noqa: E402
+
+
+def _queries(user_id: str):
+    return {
+        "history_page": lambda store: store.select(
+            "content_history", order_by="created_at.desc,id.desc", limit=51
+        ),
+        "history_count": lambda store: store.count("content_history", filters={"type": "tweet"}),
+        "user_stats": lambda store: store.select(
+            "users", filters={"id": user_id}, columns="id,name,email", limit=1
+        ),
+    }
+
+
+async def _run(store, query, iterations: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await query(store)
+            latencies.append(time.perf_counter() - started)
+
+    await query(store)  # warm the connection pool / statement cache
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(iterations)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "per_second": round(iterations / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+    }
+
+
+async def main(iterations: int, concurrency: int, user_id: str) -> dict:
+    rest = SupabaseClient()
+    await rest.open()
+    await _db.connect()
+    direct = PostgresRepository(_db.db)
+    results = {}
+    try:
+        for name, query in _queries(user_id).items():
+            results[name] = {
+                "rest": await _run(rest, query, iterations, concurrency),
+                "direct": await _run(direct, query, iterations, concurrency),
+            }
+    finally:
+        await rest.close()
+        await _db.disconnect()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--user-id", default="00000000-0000-0000-0000-000000000000")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.iterations, args.concurrency, args.user_id)), indent=2))
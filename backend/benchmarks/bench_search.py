@@ -0,0 +1,52 @@
+"""
+Microbenchmark: history search for a heavy user.
+
+Indexes ``--items`` history entries (the same blog/caption/tweet mix as
+``bench_serialization``) and reports build time, then cold (first query,
+fills the per-term cache) and warm latency for a few query shapes.
+
+    python -m benchmarks.bench_search --items 20000 --iterations 20
+"""
+import argparse
+import json
+import random
+import time
+
+from backend.search import InvertedIndex
+from benchmarks.bench_serialization import WORDS, _blog
+
+QUERIES = ["marketing", "brand strat", "content writing audience", "topic 1234", "nothingmatches"]
+
+
+def _documents(items: int):
+    rng = random.Random(1)
+    kinds = ["blog", "blog", "caption", "tweet", "caption"]
+    for i in range(items):
+        body = _blog(rng) if kinds[i % len(kinds)] == "blog" else " ".join(rng.choice(WORDS) for _ in range(25))
+        yield str(i), f"topic {i}\n{body}", {"id": str(i)}
+
+
+def main(items: int, iterations: int) -> dict:
+    index = InvertedIndex()
+    started = time.perf_counter()
+    index.add_many(_documents(items))
+    results = {"items": items, "build_ms": round((time.perf_counter() - started) * 1000, 1), **index.stats()}
+    results["queries"] = {}
+    for query in QUERIES:
+        started = time.perf_counter()
+        total, _ = index.search(query)
+        cold_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for _ in range(iterations):
+            index.search(query)
+        warm_ms = (time.perf_counter() - started) / iterations * 1000
+        results["queries"][query] = {"matched": total, "cold_ms": round(cold_ms, 2), "warm_ms": round(warm_ms, 2)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(main(args.items, args.iterations), indent=2))
@@ -0,0 +1,120 @@
+"""
+Microbenchmark: serializing a blog-heavy ``GET /history/`` page.
+
+Builds a 500-item ``HistoryPage`` (mostly ~3 KB blog bodies, like a heavy
+user's history) and times the steps FastAPI runs for it: response model
+validation plus ``mode="json"`` serialization, then rendering with the
+stdlib ``JSONResponse`` or ``FastJSONResponse``. Then it reports bytes on
+the wire and encode time for each compression option, and the size of the
+same page from ``GET /history/summary``.
+
+    python -m benchmarks.bench_serialization --items 500 --iterations 50
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from backend.responses import FastJSONResponse, brotli, orjson
+from backend.routers.history import HistoryPage, HistorySummaryPage, _preview
+
+# Word-level variety so compression ratios resemble real prose, not a repeated string
+WORDS = (
+    "the of and to in a is that for it as with was on be by this are from or have an they which one you "
+    "content writing audience strategy brand social media engaging story readers growth data insight "
+    "creative platform campaign trend voice value clear simple practical example approach research "
+    "community message quality consistent authentic experience digital marketing results"
+).split()
+
+
+def _blog(rng: random.Random) -> str:
+    sections = []
+    for n in range(4):
+        paragraph = " ".join(rng.choice(WORDS) for _ in range(90))
+        sections.append(f"## Section {n + 1}\n\n{paragraph.capitalize()}.\n\n- {rng.choice(WORDS)} point\n")
+    return "# " + " ".join(rng.choice(WORDS) for _ in range(6)).title() + "\n\n" + "\n".join(sections)
+
+
+def _payload(items: int) -> dict:
+    rng = random.Random(1)
+    now = datetime.now(timezone.utc)
+    kinds = ["blog", "blog", "blog", "caption", "tweet"]
+    rows = []
+    for i in range(items):
+        kind = kinds[i % len(kinds)]
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.UUID(int=1)),
+            "type": kind,
+            "input_text": f"benchmark topic number {i}",
+            "generated_text": _blog(rng) if kind == "blog" else " ".join(rng.choice(WORDS) for _ in range(25)) + " ✨ #content",
+            "created_at": (now - timedelta(minutes=i)).isoformat(),
+        })
+    return {"items": rows, "next_cursor": None}
+
+
+def _timed(fn, iterations: int):
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return result, (time.perf_counter() - started) / iterations * 1000
+
+
+def main(items: int, iterations: int) -> dict:
+    payload = _payload(items)
+    adapter = TypeAdapter(HistoryPage)
+
+    # What FastAPI's serialize_response does for a response_model route
+    def validate():
+        return adapter.dump_python(adapter.validate_python(payload), mode="json")
+
+    content, validate_ms = _timed(validate, iterations)
+    results = {"items": items, "validate_and_dump_ms": round(validate_ms, 3), "render": {}, "compression": {}}
+
+    for name, cls in [("stdlib", JSONResponse), ("fast", FastJSONResponse)]:
+        body, render_ms = _timed(lambda cls=cls: cls(content).body, iterations)
+        results["render"][name] = {"ms": round(render_ms, 3), "bytes": len(body)}
+    results["render"]["fast"]["backend"] = "orjson" if orjson is not None else "json"
+
+    body = FastJSONResponse(content).body
+    codecs = {
+        "identity": lambda: body,
+        "gzip_1": lambda: gzip.compress(body, compresslevel=1),
+        "gzip_6": lambda: gzip.compress(body, compresslevel=6),
+    }
+    if brotli is not None:
+        codecs["br_4"] = lambda: brotli.compress(body, quality=4)
+        codecs["br_11"] = lambda: brotli.compress(body, quality=11)
+    for name, encode in codecs.items():
+        encoded, encode_ms = _timed(encode, iterations)
+        results["compression"][name] = {
+            "ms": round(encode_ms, 3),
+            "bytes": len(encoded),
+            "ratio": round(len(body) / len(encoded), 2),
+        }
+
+    summary = TypeAdapter(HistorySummaryPage).validate_python({
+        "items": [{**row, "preview": _preview(row["generated_text"])} for row in payload["items"]],
+    })
+    summary_body = FastJSONResponse(summary.model_dump(mode="json")).body
+    results["summary"] = {
+        "bytes": len(summary_body),
+        "gzip_1_bytes": len(gzip.compress(summary_body, compresslevel=1)),
+        "reduction": round(len(body) / len(summary_body), 2),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(main(args.items, args.iterations), indent=2))
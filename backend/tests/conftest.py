@@ -0,0 +1,12 @@
+import pytest
+
+from backend.providers.ratelimit import KeyedRateLimiter
+from backend.routers import generate
+
+
+@pytest.fixture(autouse=True)
+def fresh_user_rate_limiter(monkeypatch):
+    """Every TestClient request shares one IP, so give each test its own buckets"""
+    limiter = KeyedRateLimiter(per_minute=20, burst=10)
+    monkeypatch.setattr(generate, "user_rate_limiter", limiter)
+    return limiter
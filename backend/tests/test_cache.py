@@ -0,0 +1,39 @@
+import asyncio
+
+from backend.providers.cache import GenerationCache
+
+
+def test_key_normalizes_case_and_whitespace():
+    assert GenerationCache.make_key("blog", "  Machine   LEARNING ", "groq") == GenerationCache.make_key(
+        "blog", "machine learning", "groq"
+    )
+
+
+def test_byte_cap_evicts_least_recently_used():
+    async def run():
+        cache = GenerationCache(max_bytes=10, ttl=60)
+        a, b, c = (cache.make_key("tweet", t, "groq") for t in "abc")
+        await cache.set(a, "aaaa")
+        await cache.set(b, "bbbb")
+        await cache.get(a)
+        await cache.set(c, "cccc")
+        return cache, [await cache.get(k) for k in (a, b, c)]
+
+    cache, values = asyncio.run(run())
+    assert values == ["aaaa", None, "cccc"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 8
+
+
+def test_ttl_expiry():
+    async def run():
+        cache = GenerationCache(ttl=0.01)
+        key = cache.make_key("tweet", "x", "groq")
+        await cache.set(key, "text")
+        await asyncio.sleep(0.02)
+        return cache, await cache.get(key)
+
+    cache, value = asyncio.run(run())
+    assert value is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,40 @@
+from jose import jwt
+
+from backend.etag import ANONYMOUS, ChangeVersions, _matches, user_key
+
+
+def test_versions_bump_and_expire():
+    now = [0.0]
+    versions = ChangeVersions(max_age=60, clock=lambda: now[0])
+    v1 = versions.current("history", "u1")
+    assert versions.current("history", "u1") == v1
+    assert versions.current("reminders", "u1") != v1
+
+    versions.bump("history", ["u1"])
+    v2 = versions.current("history", "u1")
+    assert v2 != v1
+
+    # Entries expire so writes made by other workers are eventually seen
+    now[0] = 61
+    assert versions.current("history", "u1") not in (v1, v2)
+
+
+def test_bump_for_covers_caller_owners_and_anonymous():
+    versions = ChangeVersions()
+    token = jwt.encode({"sub": "caller"}, "secret")
+    before = {u: versions.current("history", u) for u in ("caller", "owner", ANONYMOUS, "other")}
+    versions.bump_for("history", token, ["owner"])
+    after = {u: versions.current("history", u) for u in before}
+    assert [u for u in before if before[u] != after[u]] == ["caller", "owner", ANONYMOUS]
+
+
+def test_user_key():
+    assert user_key(None) == ANONYMOUS
+    assert user_key(jwt.encode({"sub": "abc"}, "secret")) == "abc"
+    assert user_key("opaque").startswith("token:")
+
+
+def test_if_none_match_parsing():
+    assert _matches('"a", W/"b"', '"b"')
+    assert _matches("*", '"x"')
+    assert not _matches('"a"', '"b"')
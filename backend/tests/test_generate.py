@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.providers import provider_manager
+from backend.providers.cache import generation_cache
+from backend.providers.manager import GroqProvider, LocalProvider
+from backend.providers.upstream import get_upstream
+
+client = TestClient(app)
+
+
+def _sse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def groq_stream(monkeypatch):
+    """Route the shared Groq upstream to a fake streaming completion."""
+    chunks = [
+        {"choices": [{"delta": {"content": "Hello"}}]},
+        {"choices": [{"delta": {"content": " world"}}]},
+        {"choices": [], "x_groq": {"usage": {"prompt_tokens": 12, "completion_tokens": 2}}},
+    ]
+    body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    upstream = get_upstream("groq")
+    monkeypatch.setattr(
+        upstream, "_client", httpx.AsyncClient(base_url=upstream.base_url, transport=httpx.MockTransport(handler))
+    )
+    monkeypatch.setattr(provider_manager, "_provider", GroqProvider("test-key"))
+
+
+def test_stream_groq_tokens_and_usage(groq_stream):
+    response = client.post("/generate/stream", json={"type": "tweet", "topic": "ai"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    assert [e for e in events if e[0] == "token"] == [("token", {"text": "Hello"}), ("token", {"text": " world"})]
+    name, done = events[-1]
+    assert name == "done"
+    assert done["usage"] == {"prompt_tokens": 12, "completion_tokens": 2}
+    assert done["chars"] == len("Hello world")
+    assert done["timing"]["ttft_ms"] is not None
+
+
+def test_stream_local_provider_yields_full_text(monkeypatch):
+    monkeypatch.setattr(provider_manager, "_provider", LocalProvider())
+    response = client.post("/generate/stream", json={"type": "tweet", "topic": "ai"})
+    events = _sse_events(response.text)
+    assert [name for name, _ in events] == ["token", "done"]
+    assert "ai" in events[0][1]["text"]
+
+
+class CountingProvider(LocalProvider):
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, type: str, topic: str) -> str:
+        self.calls += 1
+        return f"{type} about {topic} #{self.calls}"
+
+
+@pytest.fixture
+def counting_provider(monkeypatch):
+    provider = CountingProvider()
+    monkeypatch.setattr(provider_manager, "_provider", provider)
+    asyncio.run(generation_cache.clear())
+    yield provider
+    asyncio.run(generation_cache.clear())
+
+
+def test_generate_serves_repeat_topics_from_cache(counting_provider):
+    first = client.post("/generate/", json={"type": "tweet", "topic": "AI  News"}).json()
+    second = client.post("/generate/", json={"type": "tweet", "topic": "ai news"}).json()
+    assert first == second
+    assert counting_provider.calls == 1
+
+    fresh = client.post("/generate/", json={"type": "tweet", "topic": "ai news", "no_cache": True}).json()
+    assert fresh != first
+    assert counting_provider.calls == 2
+
+
+def test_generate_does_not_cache_fallback_text(monkeypatch):
+    asyncio.run(generation_cache.clear())
+    # No usable API key: GroqProvider falls back to LocalProvider placeholder text
+    monkeypatch.setattr(provider_manager, "_provider", GroqProvider(""))
+    client.post("/generate/", json={"type": "tweet", "topic": "fallback"})
+    assert generation_cache.stats()["entries"] == 0
+
+
+class FlakyProvider(LocalProvider):
+    async def generate(self, type: str, topic: str) -> str:
+        if topic == "bad":
+            raise RuntimeError("upstream failed")
+        await asyncio.sleep(0.01 if topic == "slow" else 0)
+        return f"{type}: {topic}"
+
+
+@pytest.fixture
+def flaky_provider(monkeypatch):
+    monkeypatch.setattr(provider_manager, "_provider", FlakyProvider())
+    asyncio.run(generation_cache.clear())
+    yield
+    asyncio.run(generation_cache.clear())
+
+
+def test_batch_returns_results_in_order_with_item_errors(flaky_provider):
+    items = [{"type": "tweet", "topic": t} for t in ("slow", "bad", "fast")]
+    response = client.post("/generate/batch", json={"items": items})
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"index": 0, "generated_text": "tweet: slow", "error": None},
+        {"index": 1, "generated_text": None, "error": "upstream failed"},
+        {"index": 2, "generated_text": "tweet: fast", "error": None},
+    ]
+
+
+def test_batch_stream_emits_results_as_they_complete(flaky_provider):
+    items = [{"type": "tweet", "topic": t} for t in ("slow", "fast")]
+    response = client.post("/generate/batch", json={"items": items, "stream": True})
+    events = _sse_events(response.text)
+    assert [name for name, _ in events] == ["result", "result", "done"]
+    assert [data["index"] for _, data in events[:2]] == [1, 0]
@@ -0,0 +1,283 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from backend.main import app
+from backend.supabase_client import supabase_client
+
+client = TestClient(app)
+
+
+def _row(n: int) -> dict:
+    return {
+        "id": f"00000000-0000-0000-0000-{n:012d}",
+        "user_id": "00000000-0000-0000-0000-000000000001",
+        "type": "tweet",
+        "input_text": f"topic {n}",
+        "generated_text": f"text {n}",
+        "created_at": f"2026-01-{n:02d}T10:00:00+00:00",
+    }
+
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    """Point the shared Supabase client at a fake PostgREST; yields the request log."""
+    requests: list[httpx.Request] = []
+    responses: list[httpx.Response] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses.pop(0)
+
+    monkeypatch.setattr(supabase_client, "base_url", "http://postgrest.test")
+    monkeypatch.setitem(supabase_client.headers, "apikey", "anon-key")
+    monkeypatch.setattr(supabase_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return requests, responses
+
+
+def test_history_pages_with_keyset_cursor(postgrest):
+    requests, responses = postgrest
+    responses.append(httpx.Response(200, json=[_row(n) for n in (9, 8, 7)]))
+    page = client.get("/history/", params={"limit": 2}).json()
+    assert [item["input_text"] for item in page["items"]] == ["topic 9", "topic 8"]
+    assert page["next_cursor"]
+    params = requests[0].url.params
+    assert params["limit"] == "3"
+    assert params["order"] == "created_at.desc,id.desc"
+    assert "or" not in params
+
+    responses.append(httpx.Response(200, json=[_row(7)]))
+    page = client.get("/history/", params={"limit": 2, "cursor": page["next_cursor"]}).json()
+    assert [item["input_text"] for item in page["items"]] == ["topic 7"]
+    assert page["next_cursor"] is None
+    keyset = requests[1].url.params["or"]
+    assert 'created_at.lt."2026-01-08T10:00:00+00:00"' in keyset
+    assert "id.lt.00000000-0000-0000-0000-000000000008" in keyset
+
+
+def test_history_rejects_bad_cursor(postgrest):
+    response = client.get("/history/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_history_stats_uses_head_counts(postgrest):
+    requests, responses = postgrest
+    for total in (3, 10, 7):
+        responses.append(httpx.Response(200, headers={"content-range": f"*/{total}"}))
+    stats = client.get("/history/stats", params={"method": "planned"}).json()
+    assert stats == {"blog": 3, "caption": 10, "tweet": 7, "total": 20}
+    assert all(r.method == "HEAD" for r in requests)
+    assert requests[0].headers["prefer"] == "count=planned"
+    assert requests[0].url.params["type"] == "eq.blog"
+
+
+def test_history_bulk_create_is_one_request(postgrest):
+    requests, responses = postgrest
+    rows = [_row(n) for n in (1, 2, 3)]
+    responses.append(httpx.Response(201, json=rows))
+    body = {"items": [
+        {k: row[k] for k in ("user_id", "type", "input_text", "generated_text")} for row in rows
+    ]}
+    response = client.post("/history/bulk", json=body)
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [row["id"] for row in rows]
+    assert len(requests) == 1
+    assert len(json.loads(requests[0].content)) == 3
+
+
+def test_history_bulk_delete_uses_in_filter(postgrest):
+    requests, responses = postgrest
+    ids = [_row(n)["id"] for n in (1, 2)]
+    responses.append(httpx.Response(200, json=[{"id": ids[0]}]))
+    response = client.request("DELETE", "/history/bulk", json={"ids": ids})
+    assert response.json() == {"deleted": [ids[0]]}
+    assert len(requests) == 1
+    assert requests[0].url.params["id"] == f'in.("{ids[0]}","{ids[1]}")'
+
+    # Non-UUID ids never reach PostgREST
+    assert client.request("DELETE", "/history/bulk", json={"ids": ["1,2"]}).status_code == 422
+
+
+def test_history_delete_only_unindexes_what_was_deleted(postgrest, monkeypatch):
+    from backend.routers import history
+
+    requests, responses = postgrest
+    removed: list = []
+    monkeypatch.setattr(history.history_search, "remove", removed.append)
+    item_id = _row(1)["id"]
+
+    # Another user's item: RLS deletes nothing
+    responses.append(httpx.Response(200, json=[]))
+    assert client.delete(f"/history/{item_id}").status_code == 404
+    assert removed == []
+
+    responses.append(httpx.Response(200, json=[{"id": item_id}]))
+    assert client.delete(f"/history/{item_id}").json() == {"deleted": item_id}
+    assert removed == [[item_id]]
+    assert requests[-1].url.params["id"] == f'in.("{item_id}")'
+
+
+def test_history_conditional_get(postgrest):
+    requests, responses = postgrest
+    token = jwt.encode({"sub": "00000000-0000-0000-0000-000000000001"}, "secret")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    responses.append(httpx.Response(200, json=[_row(1)]))
+    first = client.get("/history/", params={"limit": 5}, headers=headers)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+
+    # Unchanged: answered without touching PostgREST
+    again = client.get("/history/", params={"limit": 5}, headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert len(requests) == 1
+
+    # A different page has its own tag
+    responses.append(httpx.Response(200, json=[]))
+    other = client.get("/history/", params={"limit": 6}, headers={**headers, "If-None-Match": etag})
+    assert other.status_code == 200
+
+    # Saving bumps the owner's version
+    responses.append(httpx.Response(201, json=[_row(2)]))
+    created = client.post("/history/", json={
+        "type": "tweet", "input_text": "t", "generated_text": "g",
+        "user_id": "00000000-0000-0000-0000-000000000001",
+    }, headers=headers)
+    assert created.status_code == 200
+    responses.append(httpx.Response(200, json=[_row(2), _row(1)]))
+    changed = client.get("/history/", params={"limit": 5}, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_history_passthrough_relays_postgrest_bytes(monkeypatch):
+    from backend.routers import history
+
+    raw = json.dumps([_row(9), _row(8)], indent=1).encode()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.params.get("select") == "id,created_at":
+            # limit + 1 keys: a next page exists
+            assert request.url.params["limit"] == "3"
+            return httpx.Response(200, json=[_row(9), _row(8), _row(7)])
+        return httpx.Response(200, content=raw, headers={"Content-Type": "application/json"})
+
+    monkeypatch.setattr(history, "PASSTHROUGH_READS", True)
+    monkeypatch.setattr(supabase_client, "base_url", "http://postgrest.test")
+    monkeypatch.setitem(supabase_client.headers, "apikey", "anon-key")
+    monkeypatch.setattr(supabase_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    response = client.get("/history/", params={"limit": 2})
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    # The rows are relayed byte for byte, inside the usual page envelope
+    assert response.content.startswith(b'{"items":' + raw)
+    page = response.json()
+    assert [item["input_text"] for item in page["items"]] == ["topic 9", "topic 8"]
+    assert history._decode_cursor(page["next_cursor"])[1] == _row(8)["id"]
+    # Only the rows whose keys were read are streamed
+    assert requests[1].url.params["id"] == f'in.("{_row(9)["id"]}","{_row(8)["id"]}")'
+
+
+def test_history_passthrough_falls_back_on_errors(monkeypatch):
+    from backend.routers import history
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params.get("select") == "id,created_at":
+            return httpx.Response(200, json=[_row(3)])
+        return httpx.Response(500, json={"message": "boom"})
+
+    monkeypatch.setattr(history, "PASSTHROUGH_READS", True)
+    monkeypatch.setattr(supabase_client, "base_url", "http://postgrest.test")
+    monkeypatch.setitem(supabase_client.headers, "apikey", "anon-key")
+    monkeypatch.setattr(supabase_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    assert client.get("/history/", params={"limit": 3}).json() == {"items": [], "next_cursor": None}
+
+
+def test_history_passthrough_key_failure_does_not_end_paging(monkeypatch):
+    from backend.routers import history
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params.get("select"))
+        if request.url.params.get("select") == "id,created_at":
+            return httpx.Response(503, json={"message": "unavailable"})
+        return httpx.Response(200, json=[_row(n) for n in (9, 8, 7)])
+
+    monkeypatch.setattr(history, "PASSTHROUGH_READS", True)
+    monkeypatch.setattr(supabase_client, "base_url", "http://postgrest.test")
+    monkeypatch.setitem(supabase_client.headers, "apikey", "anon-key")
+    monkeypatch.setattr(supabase_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    page = client.get("/history/", params={"limit": 2}).json()
+    # Served by the regular path, with a real next cursor
+    assert calls == ["id,created_at", None]
+    assert len(page["items"]) == 2 and page["next_cursor"]
+
+
+def test_history_summary_projects_columns_and_truncates(postgrest):
+    requests, responses = postgrest
+    blog = {**_row(9), "type": "blog", "generated_text": "word " * 1000}
+    responses.append(httpx.Response(200, json=[blog, _row(8), _row(7)]))
+    page = client.get("/history/summary", params={"limit": 2}).json()
+    assert requests[0].url.params["select"] == "id,type,input_text,generated_text,created_at"
+    first, second = page["items"]
+    assert set(first) == {"id", "type", "input_text", "preview", "created_at"}
+    assert len(first["preview"]) <= 201 and first["preview"].endswith("word…")
+    assert second["preview"] == "text 8"
+    # Summary cursors page the same keyset as GET /history/
+    responses.append(httpx.Response(200, json=[_row(7)]))
+    client.get("/history/", params={"limit": 2, "cursor": page["next_cursor"]})
+    assert "id.lt.00000000-0000-0000-0000-000000000008" in requests[1].url.params["or"]
+
+
+def test_history_item_detail(postgrest):
+    requests, responses = postgrest
+    responses.append(httpx.Response(200, json=[_row(4)]))
+    item = client.get(f"/history/{_row(4)['id']}").json()
+    assert item["generated_text"] == "text 4"
+    assert requests[0].url.params["id"] == f"eq.{_row(4)['id']}"
+
+    responses.append(httpx.Response(200, json=[]))
+    assert client.get(f"/history/{_row(5)['id']}").status_code == 404
+    assert client.get("/history/not-a-uuid").status_code == 422
+
+
+def test_history_search(postgrest, monkeypatch):
+    from backend.routers import history
+    from backend.search import SearchIndexes
+
+    monkeypatch.setattr(history, "history_search", SearchIndexes(history._load_search_documents))
+    requests, responses = postgrest
+    rows = [
+        {**_row(3), "input_text": "coffee launch", "generated_text": "New espresso blend"},
+        {**_row(2), "input_text": "remote work", "generated_text": "Tips for async teams"},
+    ]
+    responses.append(httpx.Response(200, json=rows))
+    headers = {"Authorization": "Bearer user-token"}
+
+    assert client.get("/history/search", params={"q": "coffee"}).status_code == 401
+    result = client.get("/history/search", params={"q": "espr"}, headers=headers).json()
+    assert result["total"] == 1
+    assert result["items"][0]["id"] == _row(3)["id"]
+    assert result["items"][0]["preview"] == "New espresso blend"
+    # Loaded once, for the verified subject only
+    load = requests[0].url.params
+    assert load["user_id"] == "eq.test-user-id"
+    assert load["select"] == "id,type,input_text,generated_text,created_at"
+
+    # Creates and deletes update the loaded index without reloading
+    created = {**_row(5), "user_id": "test-user-id", "input_text": "espresso tasting", "generated_text": "Notes"}
+    responses.append(httpx.Response(201, json=[created]))
+    client.post("/history/", json={k: created[k] for k in ("type", "input_text", "generated_text", "user_id")}, headers=headers)
+    responses.append(httpx.Response(200, json=[{"id": _row(3)["id"]}]))
+    client.delete(f"/history/{_row(3)['id']}", headers=headers)
+    result = client.get("/history/search", params={"q": "espresso"}, headers=headers).json()
+    assert [item["id"] for item in result["items"]] == [_row(5)["id"]]
+    assert sum(r.method == "GET" for r in requests) == 1
@@ -0,0 +1,56 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.jobs import JobQueue, QueueFullError
+from backend.main import app
+
+
+def test_workers_drain_queue_and_record_outcomes():
+    async def handler(payload):
+        await asyncio.sleep(0.01)
+        if payload == "bad":
+            raise RuntimeError("boom")
+        return payload.upper()
+
+    async def run():
+        queue = JobQueue(handler, workers=2, max_depth=10)
+        await queue.start()
+        jobs = [queue.submit(p) for p in ("a", "bad", "c")]
+        await asyncio.gather(*(job.done.wait() for job in jobs))
+        await queue.stop()
+        return jobs
+
+    ok, failed, other = asyncio.run(run())
+    assert (ok.status, ok.result) == ("succeeded", "A")
+    assert (failed.status, failed.error) == ("failed", "boom")
+    assert other.result == "C"
+
+
+def test_submit_rejects_when_queue_is_full():
+    async def run():
+        queue = JobQueue(lambda p: asyncio.sleep(1), workers=1, max_depth=1)
+        await queue.start()
+        queue.submit("first")
+        await asyncio.sleep(0)  # the worker picks up the first job
+        queue.submit("second")
+        try:
+            queue.submit("third")
+        except QueueFullError:
+            return True
+        finally:
+            await queue.stop()
+        return False
+
+    assert asyncio.run(run())
+
+
+def test_job_endpoints_round_trip():
+    with TestClient(app) as client:
+        response = client.post("/generate/jobs", json={"type": "tweet", "topic": "queues", "no_cache": True})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        job = client.get(f"/generate/jobs/{job_id}", params={"wait": 5}).json()
+        assert job["status"] == "succeeded"
+        assert "queues" in job["generated_text"]
+        assert client.get("/generate/jobs/missing").status_code == 404
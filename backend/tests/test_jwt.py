@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import httpx
+
+from backend.utils.supabase_jwt import JWKSCache, VerifiedTokenCache
+
+
+def test_jwks_cache_reuses_keys_and_refetches_unknown_kid():
+    key_sets = [{"keys": [{"kid": "a"}]}, {"keys": [{"kid": "a"}, {"kid": "b"}]}]
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        body = key_sets[min(calls, len(key_sets) - 1)]
+        calls += 1
+        return httpx.Response(200, json=body)
+
+    async def run():
+        cache = JWKSCache("http://jwks.test", min_refetch_interval=0, transport=httpx.MockTransport(handler))
+        await cache.get_key("a")
+        await cache.get_key("a")
+        assert cache.fetches == 1
+        # Rotated key: refetched once and then served from memory
+        assert (await cache.get_key("b"))["kid"] == "b"
+        await cache.get_key("b")
+        return cache.fetches
+
+    assert asyncio.run(run()) == 2
+
+
+def test_verified_token_cache_evicts_at_exp_and_by_size():
+    cache = VerifiedTokenCache(max_size=2)
+    cache.put("expired", {"sub": "x", "exp": time.time() - 1})
+    assert cache.get("expired") is None
+
+    future = time.time() + 60
+    cache.put("t1", {"sub": "1", "exp": future})
+    cache.put("t2", {"sub": "2", "exp": future})
+    cache.get("t1")
+    cache.put("t3", {"sub": "3", "exp": future})
+    assert cache.get("t2") is None  # least recently used
+    assert cache.get("t1")["sub"] == "1"
+    assert cache.get("t3")["sub"] == "3"
@@ -0,0 +1,72 @@
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+
+from backend.log import (
+    ContextFilter,
+    JsonFormatter,
+    _NonBlockingQueueHandler,
+    parse_sample_rates,
+    request_id,
+)
+from backend.main import app
+from backend.metrics import log_records_dropped
+
+
+def _record(level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("backend.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_request_id_and_extra_fields():
+    token = request_id.set("req-1")
+    try:
+        record = _record(status=502)
+        assert ContextFilter().filter(record)
+    finally:
+        request_id.reset(token)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "hello world"
+    assert entry["level"] == "info"
+    assert entry["request_id"] == "req-1"
+    assert entry["status"] == 502
+
+
+def test_parse_sample_rates():
+    rates = parse_sample_rates("debug=0.01, info=0.5,bogus=1,warning=x")
+    assert rates == {logging.DEBUG: 0.01, logging.INFO: 0.5}
+
+
+def test_sampling_keeps_or_drops_whole_requests():
+    sampler = ContextFilter({logging.INFO: 0.5})
+    for rid in ("a", "b", "c", "d", "e"):
+        token = request_id.set(rid)
+        try:
+            decisions = {sampler.filter(_record()) for _ in range(5)}
+        finally:
+            request_id.reset(token)
+        assert len(decisions) == 1
+    # Unlisted levels are always kept
+    assert all(sampler.filter(_record(level=logging.WARNING)) for _ in range(20))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    before = log_records_dropped.total()
+    handler.handle(_record())
+    handler.handle(_record())
+    assert handler.queue.qsize() == 1
+    assert log_records_dropped.total() == before + 1
+    assert handler.queue.get().msg == "hello world"
+
+
+def test_request_id_header():
+    client = TestClient(app)
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 32
+    assert client.get("/health", headers={"X-Request-ID": "trace-42"}).headers["x-request-id"] == "trace-42"
+    # Malformed ids are replaced rather than echoed
+    assert client.get("/health", headers={"X-Request-ID": "bad id\t"}).headers["x-request-id"] != "bad id\t"
@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.metrics import Counter, Histogram
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("latency_seconds", "Latency", ("op",), buckets=(0.1, 1.0))
+    h.observe(0.05, op="read")
+    h.observe(0.5, op="read")
+    h.observe(5, op="read")
+    text = h.render()
+    assert 'latency_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{op="read",le="1"} 2' in text
+    assert 'latency_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{op="read"} 3' in text
+
+
+def test_counter_rejects_wrong_labels():
+    c = Counter("calls_total", "Calls", ("upstream",))
+    try:
+        c.inc(status="200")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_metrics_endpoint_reports_generation_latency():
+    client.post("/generate/", json={"type": "tweet", "topic": "metrics", "no_cache": True})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE contentgen_generation_duration_seconds histogram" in response.text
+    assert 'contentgen_generation_duration_seconds_count{provider="local",model="local",type="tweet"}' in response.text
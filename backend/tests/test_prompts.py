@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.providers.custom_model import CustomContentModel
+from backend.providers.manager import GroqProvider
+from backend.providers.prompts import CUSTOM_AI_PROMPTS, PROMPTS_VERSION, PromptTemplate
+from backend.routers.generate import _custom_ai_payload
+
+
+def test_render_substitutes_every_topic():
+    template = PromptTemplate("blog", "About {topic}. More on {topic}.", max_tokens=10)
+    assert template.render("cats") == "About cats. More on cats."
+    # 17 static chars + 2 * 4 topic chars = 25 chars -> 7 tokens
+    assert template.estimate_input_tokens("cats") == 7
+
+
+def test_short_types_get_small_budgets_and_stop_sequences():
+    groq = GroqProvider("key")
+    tweet = groq._payload("tweet", "rust")
+    blog = groq._payload("blog", "rust")
+    assert tweet["max_tokens"] == 160
+    assert tweet["stop"]
+    assert "rust" in tweet["messages"][1]["content"]
+    assert blog["max_tokens"] == 2000
+    assert "stop" not in blog
+
+    caption = CustomContentModel(api_key="key", backend="groq")._groq_payload("caption", "rust", stream=True)
+    assert caption["max_tokens"] == 120
+    assert caption["top_p"] == 0.9
+    assert caption["stream_options"] == {"include_usage": True}
+
+
+def test_unknown_type_falls_back_to_blog():
+    assert _custom_ai_payload("poem", "rust")["max_tokens"] == 2000
+
+
+def test_custom_ai_inlines_system_prompt():
+    messages = CUSTOM_AI_PROMPTS.messages("tweet", "rust")
+    assert len(messages) == 1
+    assert messages[0]["content"].startswith(CUSTOM_AI_PROMPTS.system)
+
+
+def test_prompts_endpoint():
+    client = TestClient(app)
+    body = client.get("/generate/prompts").json()
+    assert body["version"] == PROMPTS_VERSION
+    assert body["sets"]["groq"]["types"]["caption"]["max_tokens"] == 120
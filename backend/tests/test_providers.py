@@ -0,0 +1,45 @@
+import asyncio
+
+import httpx
+
+from backend.providers.custom_model import CustomContentModel
+from backend.providers.manager import GroqProvider
+from backend.providers.upstream import UpstreamClient, get_upstream
+
+
+def test_providers_share_one_upstream_client():
+    groq = GroqProvider("key")
+    custom = CustomContentModel(api_key="key", backend="groq")
+    assert groq.upstream is custom.upstream is get_upstream("groq")
+    hf = CustomContentModel(api_key="key", backend="huggingface")
+    assert hf.upstream is get_upstream("huggingface")
+    assert hf.upstream is not groq.upstream
+
+
+def test_upstream_concurrency_limit():
+    """Requests beyond max_concurrency wait for a free slot."""
+    peak = 0
+    active = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal peak, active
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={})
+
+    async def run():
+        upstream = UpstreamClient("test", "http://upstream.test", max_concurrency=2, http2=False)
+        upstream._client = httpx.AsyncClient(
+            base_url=upstream.base_url, transport=httpx.MockTransport(handler)
+        )
+        await asyncio.gather(*(upstream.post("/x") for _ in range(6)))
+        stats = upstream.stats()
+        await upstream.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert peak == 2
+    assert stats["requests_total"] == 6
+    assert stats["in_flight"] == 0
@@ -0,0 +1,151 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.providers.ratelimit import (
+    KeyedRateLimiter,
+    RateLimitExceeded,
+    TokenBucket,
+    UpstreamRateLimiter,
+    parse_duration,
+)
+from backend.providers.upstream import UpstreamClient
+
+
+def test_parse_duration():
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("3") == 3.0
+    assert parse_duration("") is None
+    assert parse_duration("soon") is None
+
+
+def test_token_bucket_queues_callers_in_order():
+    bucket = TokenBucket(60, period=60)  # one per second
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(1) == pytest.approx(2.0, abs=0.05)
+    assert TokenBucket(None).reserve(10**6) == 0.0
+
+
+def test_upstream_limiter_queues_then_rejects():
+    limiter = UpstreamRateLimiter("test", rpm=600, max_wait=0.15)  # 10 per second
+
+    async def run():
+        for _ in range(600):
+            await limiter.acquire()
+        # Concurrent callers queue behind each other: ~0.1s fits, ~0.2s does not
+        return await asyncio.gather(limiter.acquire(), limiter.acquire(), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first is None
+    assert isinstance(second, RateLimitExceeded)
+    assert second.retry_after > 0.15
+    assert limiter.rejected == 1
+
+
+def test_upstream_limiter_adapts_to_headers():
+    limiter = UpstreamRateLimiter("test")
+    limiter.update_from_headers({
+        "x-ratelimit-limit-tokens": "6000",
+        "x-ratelimit-remaining-tokens": "100",
+    })
+    assert limiter.tokens.capacity == 6000
+    assert limiter.tokens.level == pytest.approx(100, abs=1)
+
+    limiter.update_from_headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "30s"})
+    assert limiter.stats()["paused_for"] == pytest.approx(30, abs=0.1)
+
+
+def test_upstream_retries_a_short_429_once():
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return httpx.Response(429, headers={"retry-after": "0.01"})
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        upstream = UpstreamClient("test", "http://upstream.test", http2=False)
+        upstream._client = httpx.AsyncClient(base_url=upstream.base_url, transport=httpx.MockTransport(handler))
+        response = await upstream.post("/x", json={"messages": []})
+        await upstream.close()
+        return response
+
+    assert asyncio.run(run()).status_code == 200
+    assert calls == 2
+
+
+def test_keyed_limiter_is_per_key():
+    limiter = KeyedRateLimiter(per_minute=60, burst=2)
+    assert limiter.check("a") is None
+    assert limiter.check("a") is None
+    assert limiter.check("a") == pytest.approx(1.0, abs=0.05)
+    assert limiter.check("b") is None
+
+
+def test_keyed_limiter_charges_the_full_cost():
+    limiter = KeyedRateLimiter(per_minute=20, burst=10)
+    with pytest.raises(ValueError):
+        limiter.check("u", 20)
+    assert limiter.check("u", 10) is None
+    assert limiter.check("u", 1) is not None
+
+
+def test_batch_larger_than_the_burst_is_rejected(monkeypatch, fresh_user_rate_limiter):
+    monkeypatch.setenv("CONTENT_PROVIDER", "local")
+    fresh_user_rate_limiter.burst = 3
+    client = TestClient(app)
+    items = [{"type": "tweet", "topic": f"limits {n}"} for n in range(4)]
+    assert client.post("/generate/batch", json={"items": items}).status_code == 422
+    assert client.post("/generate/batch", json={"items": items[:3]}).status_code == 200
+    assert client.post("/generate/batch", json={"items": items[:1]}).status_code == 429
+
+
+def test_generate_rate_limits_per_user(monkeypatch, fresh_user_rate_limiter):
+    from backend.routers import generate
+
+    async def validate(token):
+        if not token.startswith("valid-"):
+            raise RuntimeError("Invalid token")
+        return {"sub": token[len("valid-"):]}
+
+    monkeypatch.setattr(generate, "validate_supabase_jwt", validate)
+    monkeypatch.setenv("CONTENT_PROVIDER", "local")
+    fresh_user_rate_limiter.burst = 2
+    client = TestClient(app)
+    alice = {"Authorization": "Bearer valid-alice"}
+
+    # Rotating the body's user_id does not reset the bucket
+    assert client.post("/generate/", json={"type": "tweet", "topic": "limits", "user_id": "a"}, headers=alice).status_code == 200
+    assert client.post("/generate/", json={"type": "tweet", "topic": "limits", "user_id": "b"}, headers=alice).status_code == 200
+    limited = client.post("/generate/", json={"type": "tweet", "topic": "limits", "user_id": "c"}, headers=alice)
+    assert limited.status_code == 429
+    assert int(limited.headers["retry-after"]) >= 1
+
+    # Another verified user has their own bucket
+    assert client.post("/generate/", json={"type": "tweet", "topic": "limits"}, headers={"Authorization": "Bearer valid-bob"}).status_code == 200
+
+
+def test_unverified_callers_share_the_ip_bucket(monkeypatch, fresh_user_rate_limiter):
+    from backend.routers import generate
+
+    async def validate(token):
+        raise RuntimeError("Invalid token")
+
+    monkeypatch.setattr(generate, "validate_supabase_jwt", validate)
+    monkeypatch.setenv("CONTENT_PROVIDER", "local")
+    fresh_user_rate_limiter.burst = 2
+    client = TestClient(app)
+    statuses = [
+        client.post("/generate/", json={"type": "tweet", "topic": "limits", "user_id": f"u{n}"},
+                    headers={"Authorization": f"Bearer forged-{n}"}).status_code
+        for n in range(3)
+    ]
+    assert statuses == [200, 200, 429]
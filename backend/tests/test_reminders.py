@@ -0,0 +1,100 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.routers import reminders
+from backend.supabase_client import supabase_client
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            return httpx.Response(200, json=[])
+        if request.method == "DELETE":
+            return httpx.Response(200, json=[{"id": v.strip('"')} for v in request.url.params["id"][4:-1].split(",")])
+        return httpx.Response(201, json=json.loads(request.content))
+
+    monkeypatch.setattr(supabase_client, "base_url", "http://postgrest.test")
+    monkeypatch.setitem(supabase_client.headers, "apikey", "anon-key")
+    monkeypatch.setattr(supabase_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return requests
+
+
+def test_bulk_upsert_assigns_ids_and_merges_duplicates(postgrest):
+    existing = "00000000-0000-0000-0000-000000000007"
+    body = {"items": [{"title": "new"}, {"id": existing, "title": "edited", "daily": True}]}
+    response = client.post("/reminders/bulk", json=body)
+    assert response.status_code == 200
+    ids = response.json()["ids"]
+    assert len(ids) == 2 and ids[1] == existing
+
+    insert, upsert = sorted(postgrest, key=lambda r: "on_conflict" in r.url.params)
+    assert "on_conflict" not in insert.url.params
+    assert json.loads(insert.content)[0]["id"] == ids[0]
+    assert upsert.url.params["on_conflict"] == "id"
+    assert "resolution=merge-duplicates" in upsert.headers["prefer"]
+
+
+def test_bulk_upsert_keeps_the_owner_and_unset_fields(postgrest):
+    existing = "00000000-0000-0000-0000-000000000007"
+    other = "00000000-0000-0000-0000-000000000008"
+    body = {"items": [
+        {"id": existing, "title": "edited"},
+        {"id": other, "title": "moved", "topic": "launch"},
+    ]}
+    assert client.post("/reminders/bulk", json=body).status_code == 200
+    # Rows with different fields go out as separate upserts
+    rows = sorted((json.loads(r.content) for r in postgrest), key=len)
+    assert rows == [
+        [{"id": existing, "title": "edited"}],
+        [{"id": other, "title": "moved", "topic": "launch"}],
+    ]
+
+
+def test_bulk_delete_is_one_request(postgrest):
+    ids = [f"00000000-0000-0000-0000-00000000000{n}" for n in range(1, 4)]
+    response = client.request("DELETE", "/reminders/bulk", json={"ids": ids})
+    assert response.json() == {"deleted": ids}
+    assert len(postgrest) == 1
+
+
+def test_list_revalidates_until_a_write(postgrest):
+    etag = client.get("/reminders/").headers["etag"]
+    assert client.get("/reminders/", headers={"If-None-Match": etag}).status_code == 304
+    assert len(postgrest) == 1
+
+    client.post("/reminders/bulk", json={"items": [{"title": "new"}]})
+    assert client.get("/reminders/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_delete_keeps_schedule_when_nothing_was_deleted(monkeypatch):
+    reminder_id = "00000000-0000-0000-0000-000000000009"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        # RLS hides another user's row: success, but no rows returned
+        return httpx.Response(200, json=[])
+
+    monkeypatch.setattr(supabase_client, "base_url", "http://postgrest.test")
+    monkeypatch.setitem(supabase_client.headers, "apikey", "anon-key")
+    monkeypatch.setattr(supabase_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setitem(reminders.reminder_scheduler._prepared, reminder_id, {"reminder_id": reminder_id})
+
+    assert client.delete(f"/reminders/{reminder_id}").status_code == 404
+    assert reminders.reminder_scheduler.prepared(reminder_id) is not None
+
+
+def test_delete_unschedules_the_deleted_reminder(postgrest, monkeypatch):
+    reminder_id = "00000000-0000-0000-0000-000000000009"
+    monkeypatch.setitem(reminders.reminder_scheduler._prepared, reminder_id, {"reminder_id": reminder_id})
+
+    assert client.delete(f"/reminders/{reminder_id}").json() == {"deleted": reminder_id}
+    assert reminders.reminder_scheduler.prepared(reminder_id) is None
@@ -0,0 +1,191 @@
+import asyncio
+import uuid
+from datetime import date, datetime, timezone
+
+from backend.repository import PostgresRepository, get_repository
+from backend.supabase_client import supabase_client
+
+
+class FakeRecord:
+    def __init__(self, row: dict):
+        self._mapping = row
+
+
+class FakeDatabase:
+    """Records statements instead of running them"""
+
+    is_connected = True
+
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.queries: list[tuple[str, dict]] = []
+
+    async def fetch_all(self, query: str, values: dict):
+        self.queries.append((query, values))
+        return [FakeRecord(row) for row in self.rows]
+
+
+def test_select_translates_postgrest_filters_to_bound_sql():
+    created = datetime(2026, 1, 8, 10, tzinfo=timezone.utc)
+    item_id = uuid.uuid4()
+    fake = FakeDatabase(rows=[{"id": item_id, "created_at": created}])
+    repo = PostgresRepository(fake, scoped=False)
+
+    rows = asyncio.run(repo.select(
+        "content_history",
+        filters={"type": "tweet"},
+        order_by="created_at.desc,id.desc",
+        limit=3,
+        params={"or": f'(created_at.lt."{created.isoformat()}",and(created_at.eq."{created.isoformat()}",id.lt.{item_id}))'},
+    ))
+
+    # Rows come back shaped like PostgREST JSON
+    assert rows == [{"id": str(item_id), "created_at": "2026-01-08T10:00:00+00:00"}]
+    (sql, values), = fake.queries
+    assert sql == (
+        'SELECT * FROM content_history WHERE "type" = :p0 AND '
+        '("created_at" < :p1 OR ("created_at" = :p2 AND "id" < :p3)) '
+        'ORDER BY "created_at" DESC, "id" DESC LIMIT :limit'
+    )
+    assert values == {"p0": "tweet", "p1": created, "p2": created, "p3": str(item_id), "limit": 3}
+
+
+def test_statement_text_does_not_depend_on_values():
+    fake = FakeDatabase()
+    repo = PostgresRepository(fake, scoped=False)
+
+    async def run():
+        await repo.select("users", filters={"id": "a"}, columns="id,email", limit=1)
+        await repo.select("users", filters={"id": "b"}, columns="id,email", limit=1)
+
+    asyncio.run(run())
+    assert fake.queries[0][0] == fake.queries[1][0]
+
+
+def test_writes_use_returning_and_on_conflict():
+    fake = FakeDatabase(rows=[{"id": "r1"}])
+    repo = PostgresRepository(fake, scoped=False)
+
+    async def run():
+        await repo.upsert_many("reminders", [
+            {"id": "r1", "title": "a", "date": "2026-02-01"},
+            {"id": "r2", "title": "b", "date": None},
+        ])
+        await repo.upsert_many("content_history", [{"id": "h1", "type": "tweet"}], ignore_duplicates=True)
+        return await repo.delete_many("reminders", ["r1", "r2"])
+
+    assert asyncio.run(run()) == ["r1"]
+    upsert, ignore, delete = fake.queries
+    assert upsert[0] == (
+        'INSERT INTO reminders ("id", "title", "date") VALUES (:p0, :p1, :p2), (:p3, :p4, :p5) '
+        'ON CONFLICT ("id") DO UPDATE SET "title" = EXCLUDED."title", "date" = EXCLUDED."date" RETURNING *'
+    )
+    assert upsert[1]["p2"] == date(2026, 2, 1)
+    assert ignore[0].endswith('ON CONFLICT ("id") DO NOTHING RETURNING *')
+    assert delete == ('DELETE FROM reminders WHERE "id" = ANY(:p0) RETURNING id', {"p0": ["r1", "r2"]})
+
+
+def test_unknown_identifiers_never_reach_sql():
+    fake = FakeDatabase()
+    repo = PostgresRepository(fake)
+    assert asyncio.run(repo.select("content_history", filters={"1=1; drop table users": "x"})) == []
+    assert asyncio.run(repo.insert("secrets", {"id": "x"})) is None
+    assert fake.queries == []
+
+
+def test_routers_fall_back_to_rest_until_the_pool_is_connected():
+    assert get_repository() is supabase_client
+
+
+def _as_user(monkeypatch, tokens: dict):
+    """Verify tokens by lookup instead of against a JWKS"""
+    from backend import repository
+
+    async def validate(token):
+        if token not in tokens:
+            raise RuntimeError("Invalid token")
+        return {"sub": tokens[token]}
+
+    monkeypatch.setattr(repository, "validate_supabase_jwt", validate)
+
+
+def test_scoped_queries_are_restricted_to_the_token_subject(monkeypatch):
+    _as_user(monkeypatch, {"alice-token": "alice"})
+    fake = FakeDatabase(rows=[{"id": "h1"}])
+    repo = PostgresRepository(fake)
+
+    async def run():
+        await repo.select("content_history", order_by="created_at.desc", auth_token="alice-token")
+        await repo.delete_many("content_history", ["h1", "h2"], auth_token="alice-token")
+        await repo.update("reminders", "r1", {"title": "x"}, auth_token="alice-token")
+
+    asyncio.run(run())
+    (select, select_values), (delete, delete_values), (update, update_values) = fake.queries
+    assert select == 'SELECT * FROM content_history WHERE "user_id" = :p0 ORDER BY "created_at" DESC'
+    assert select_values == {"p0": "alice"}
+    assert delete.endswith('WHERE "id" = ANY(:p0) AND "user_id" = :p1 RETURNING id')
+    assert delete_values["p1"] == "alice"
+    assert update.endswith('WHERE "id" = :p1 AND "user_id" = :p2 RETURNING *')
+    assert update_values["p2"] == "alice"
+
+
+def test_one_user_cannot_list_or_delete_anothers_rows(monkeypatch):
+    """Against an in-memory table: Bob's token only ever reaches Bob's rows"""
+    _as_user(monkeypatch, {"alice-token": "alice", "bob-token": "bob"})
+    table = [{"id": "a1", "user_id": "alice"}, {"id": "b1", "user_id": "bob"}]
+
+    class TableDatabase(FakeDatabase):
+        async def fetch_all(self, query: str, values: dict):
+            self.queries.append((query, values))
+            owner = values.get("p0") if query.startswith("SELECT") else values.get("p1")
+            rows = [r for r in table if r["user_id"] == owner]
+            if query.startswith("DELETE"):
+                rows = [r for r in rows if r["id"] in values["p0"]]
+                for r in rows:
+                    table.remove(r)
+            return [FakeRecord(r) for r in rows]
+
+    repo = PostgresRepository(TableDatabase())
+
+    async def run():
+        listed = await repo.select("content_history", auth_token="bob-token")
+        deleted = await repo.delete_many("content_history", ["a1"], auth_token="bob-token")
+        anonymous = await repo.select("content_history")
+        forged = await repo.select("content_history", auth_token="forged")
+        stolen = await repo.insert("content_history", {"id": "x", "user_id": "alice"}, auth_token="bob-token")
+        return listed, deleted, anonymous, forged, stolen
+
+    listed, deleted, anonymous, forged, stolen = asyncio.run(run())
+    assert listed == [{"id": "b1", "user_id": "bob"}]
+    assert deleted == []
+    assert {"id": "a1", "user_id": "alice"} in table
+    # No token, a bad token or someone else's user_id never reaches SQL
+    assert anonymous == [] and forged == [] and stolen is None
+
+
+def test_service_repository_is_unscoped():
+    fake = FakeDatabase()
+    asyncio.run(PostgresRepository(fake, scoped=False).select("reminders"))
+    assert fake.queries == [("SELECT * FROM reminders", {})]
+
+
+def test_direct_postgres_is_opt_in(monkeypatch):
+    from backend import repository
+
+    monkeypatch.setattr(repository.postgres_repository, "database", FakeDatabase())
+    assert get_repository() is supabase_client
+    monkeypatch.setattr(repository, "DIRECT_POSTGRES", True)
+    assert get_repository() is repository.postgres_repository
+    assert get_repository(service=True) is repository.postgres_service_repository
+
+
+def test_scoped_upserts_never_update_other_users_rows(monkeypatch):
+    _as_user(monkeypatch, {"alice-token": "alice"})
+    fake = FakeDatabase()
+    asyncio.run(PostgresRepository(fake).upsert_many(
+        "reminders", [{"id": "r1", "user_id": "alice", "title": "a"}], auth_token="alice-token"
+    ))
+    (sql, values), = fake.queries
+    assert values["p3"] == "alice"
+    assert sql.endswith('DO UPDATE SET "user_id" = EXCLUDED."user_id", "title" = EXCLUDED."title" '
+                        'WHERE reminders."user_id" = :p3 RETURNING *')
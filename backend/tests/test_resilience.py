@@ -0,0 +1,153 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.providers.manager import BaseProvider, GroqProvider, HedgedProvider, fallback_used
+from backend.providers.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker
+from backend.providers.upstream import UpstreamClient
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    asyncio.run(asyncio.sleep(0.02))
+    assert breaker.allow()  # the half-open probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast_without_calling_upstream():
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    async def run():
+        upstream = UpstreamClient(
+            "test", "http://upstream.test", http2=False,
+            breaker=CircuitBreaker("test", failure_threshold=2, reset_timeout=60),
+        )
+        upstream._client = httpx.AsyncClient(base_url=upstream.base_url, transport=httpx.MockTransport(handler))
+        await upstream.post("/x")
+        await upstream.post("/x")
+        with pytest.raises(CircuitOpenError):
+            await upstream.post("/x")
+        await upstream.close()
+
+    asyncio.run(run())
+    assert calls == 2
+
+
+def test_open_circuit_falls_back_without_a_traceback(monkeypatch, caplog):
+    provider = GroqProvider("key")
+
+    async def post(*args, **kwargs):
+        raise CircuitOpenError("Circuit open for upstream groq")
+
+    monkeypatch.setattr(provider.upstream, "post", post)
+    with caplog.at_level("WARNING", logger="backend.providers.manager"):
+        text = asyncio.run(provider.generate("tweet", "outages"))
+    assert text
+    records = [r for r in caplog.records if "Groq" in r.getMessage()]
+    assert records and all(r.levelname == "WARNING" and r.exc_info is None for r in records)
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker()
+    assert tracker.percentile(95) is None
+    for ms in range(1, 101):
+        tracker.observe(ms / 1000)
+    assert tracker.percentile(95) == pytest.approx(0.095, abs=0.002)
+
+
+class SleepyProvider(BaseProvider):
+    def __init__(self, name: str, delay: float, fallback: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fallback = fallback
+        self.cancelled = False
+
+    async def generate(self, type: str, topic: str) -> str:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fallback:
+            fallback_used.set(True)
+        return self.name
+
+
+def _hedged(primary, secondary):
+    return HedgedProvider(primary, secondary, min_delay=0.01, max_delay=0.01)
+
+
+def test_hedge_fires_secondary_when_primary_is_slow():
+    primary, secondary = SleepyProvider("primary", 1.0), SleepyProvider("secondary", 0.0)
+    assert asyncio.run(_hedged(primary, secondary).generate("tweet", "x")) == "secondary"
+    assert primary.cancelled
+
+
+def test_hedge_skips_secondary_when_primary_is_fast():
+    secondary = SleepyProvider("secondary", 0.0)
+    assert asyncio.run(_hedged(SleepyProvider("primary", 0.0), secondary).generate("tweet", "x")) == "primary"
+
+
+def test_hedge_prefers_real_answer_over_fallback_text():
+    async def run():
+        fallback_used.set(False)
+        text = await _hedged(SleepyProvider("primary", 0.0, fallback=True), SleepyProvider("secondary", 0.02)).generate(
+            "tweet", "x"
+        )
+        return text, fallback_used.get()
+
+    assert asyncio.run(run()) == ("secondary", False)
+
+
+def test_streams_do_not_shift_hedge_delay():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"data: [DONE]\n\n")
+
+    class UpstreamProvider(SleepyProvider):
+        model_id = "m"
+
+    async def run():
+        upstream = UpstreamClient("test", "http://upstream.test", http2=False)
+        upstream._client = httpx.AsyncClient(base_url=upstream.base_url, transport=httpx.MockTransport(handler))
+        primary = UpstreamProvider("primary", 0.0)
+        primary.upstream = upstream
+        hedged = HedgedProvider(primary, SleepyProvider("secondary", 0.0), min_delay=0.0, max_delay=60.0)
+        # Slow blog completions set the delay for blogs
+        for _ in range(25):
+            upstream._observe(4.0, ("m", "blog"))
+        before = hedged.hedge_delay("blog")
+        for _ in range(50):
+            async with upstream.stream("/chat"):
+                pass
+        await upstream.close()
+        return before, hedged.hedge_delay("blog"), len(upstream.latency)
+
+    before, after, samples = asyncio.run(run())
+    assert before == after == 4.0
+    assert samples == 25
+
+
+def test_hedge_delay_is_tracked_per_model_and_type():
+    upstream = UpstreamClient("test", "http://upstream.test", http2=False)
+    for _ in range(25):
+        upstream._observe(0.5, ("m", "tweet"))
+        upstream._observe(6.0, ("m", "blog"))
+    assert upstream.latency_percentile(95, ("m", "tweet")) == 0.5
+    assert upstream.latency_percentile(95, ("m", "blog")) == 6.0
+    # Unknown keys fall back to every completion
+    assert upstream.latency_percentile(95, ("m", "caption")) == 6.0
@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.responses import CompressionMiddleware, FastJSONResponse, negotiate, passthrough_response
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+
+@app.get("/big")
+async def big():
+    return {"items": [{"n": i, "text": "lorem ipsum " * 5} for i in range(50)]}
+
+
+@app.get("/small")
+async def small():
+    return {"ok": True}
+
+
+@app.get("/events")
+async def events():
+    async def gen():
+        for i in range(3):
+            yield f"data: {'x' * 400}\n\n"
+
+    return StreamingResponse(gen(), media_type="text/event-stream")
+
+
+@app.get("/chunks")
+async def chunks():
+    async def gen():
+        yield b"["
+        for i in range(100):
+            yield (b"," if i else b"") + b'{"n":%d}' % i
+        yield b"]"
+
+    return StreamingResponse(gen(), media_type="application/json")
+
+
+client = TestClient(app)
+
+
+def test_fast_json_render():
+    body = FastJSONResponse(content=None).render({"when": datetime(2026, 1, 1, tzinfo=timezone.utc), "x": "é"})
+    assert body == '{"when":"2026-01-01T00:00:00+00:00","x":"é"}'.encode()
+
+
+def test_negotiate():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("*") in ("gzip", "br")
+    assert negotiate("deflate") is None
+
+
+def test_large_responses_are_compressed():
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()["items"]) == 50
+    assert int(response.headers["content-length"]) < len(response.content)
+
+
+def test_small_responses_and_event_streams_are_not():
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streamed_bodies_are_compressed_incrementally():
+    with client.stream("GET", "/chunks", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw).startswith(b'[{"n":0},{"n":1}')
+
+
+def test_large_bodies_compress_off_the_event_loop():
+    threaded = FastAPI()
+    threaded.add_middleware(CompressionMiddleware, minimum_size=10, thread_min_size=100)
+    threaded.add_api_route("/big", big)
+    response = TestClient(threaded).get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["items"]) == 50
+
+
+@app.get("/tagged")
+async def tagged():
+    return FastJSONResponse({"items": ["x" * 40] * 50}, headers={"ETag": '"abc"'})
+
+
+def test_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    response = client.get("/big", headers={"Accept-Encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == "br"
+    with client.stream("GET", "/chunks", headers={"Accept-Encoding": "br"}) as streamed:
+        raw = b"".join(streamed.iter_raw())
+    assert streamed.headers["content-encoding"] == "br"
+    assert brotli.decompress(raw).startswith(b'[{"n":0},{"n":1}')
+
+
+def test_compression_weakens_strong_etags():
+    assert client.get("/tagged", headers={"Accept-Encoding": "gzip"}).headers["etag"] == 'W/"abc"'
+    assert client.get("/tagged", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"abc"'
+
+
+def test_passthrough_closes_the_upstream_when_the_client_leaves_early():
+    closed = []
+
+    @asynccontextmanager
+    async def source():
+        try:
+            yield httpx.Response(200, content=b"[]")
+        finally:
+            closed.append(True)
+
+    async def run():
+        response = await passthrough_response(source())
+        assert closed == []
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            await asyncio.sleep(0.01)
+            raise OSError("client went away")
+
+        try:
+            await response({"type": "http"}, receive, send)
+        except OSError:
+            pass
+        # Closed by the response itself, not by garbage collection later
+        assert closed == [True]
+
+    asyncio.run(run())
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.metrics import generations_in_flight
+from backend.routers import reminders
+from backend.scheduler import ReminderScheduler, next_fire_time
+
+NOW = datetime(2026, 3, 4, 8, 59, tzinfo=timezone.utc)  # a Wednesday
+
+
+def test_next_fire_time_one_shot_daily_and_weekdays():
+    assert next_fire_time({"date": "2026-03-04", "time": "09:00:00"}, NOW) == NOW.replace(minute=0, hour=9)
+    assert next_fire_time({"date": "2026-03-03", "time": "09:00:00"}, NOW) is None
+    assert next_fire_time({"time": "08:00:00", "daily": True}, NOW) == datetime(2026, 3, 5, 8, tzinfo=timezone.utc)
+    # repeat_days uses JS getDay() numbering: 0 = Sunday
+    assert next_fire_time({"time": "09:00:00", "repeat_days": [0]}, NOW) == datetime(2026, 3, 8, 9, tzinfo=timezone.utc)
+    assert next_fire_time({"date": "2026-03-04"}, NOW) is None
+
+
+def _scheduler(generated: list, **kwargs) -> ReminderScheduler:
+    async def pregenerate(reminder: dict) -> str:
+        generated.append(reminder["topic"])
+        return f"content about {reminder['topic']}"
+
+    # Real-time clock that starts at NOW
+    offset = NOW.timestamp() - time.time()
+    return ReminderScheduler(pregenerate, lead_time=300, clock=lambda: time.time() + offset, **kwargs)
+
+
+def test_pregenerates_within_lead_time_and_forgets_deleted():
+    generated: list = []
+
+    async def run():
+        scheduler = _scheduler(generated)
+        await scheduler.start()
+        scheduler.upsert({"id": "soon", "topic": "tides", "date": "2026-03-04", "time": "09:01:00"})
+        scheduler.upsert({"id": "later", "topic": "moons", "date": "2026-03-05", "time": "09:00:00"})
+        scheduler.upsert({"id": "gone", "topic": "comets", "date": "2026-03-04", "time": "09:02:00"})
+        scheduler.remove("gone")
+        await asyncio.sleep(0.05)
+        result = scheduler.prepared("soon"), scheduler.prepared("later"), scheduler.stats()
+        await scheduler.stop()
+        return result
+
+    soon, later, stats = asyncio.run(run())
+    assert generated == ["tides"]
+    assert soon["generated_text"] == "content about tides"
+    assert later is None
+    assert stats["scheduled"] == 2
+
+
+def test_pregeneration_waits_for_off_peak():
+    generated: list = []
+
+    async def run():
+        scheduler = _scheduler(generated, max_busy=1, busy_retry=0.01)
+        await scheduler.start()
+        generations_in_flight.inc(provider="busy-test")
+        try:
+            scheduler.upsert({"id": "r", "topic": "tides", "date": "2026-03-04", "time": "09:01:00"})
+            await asyncio.sleep(0.05)
+            during_peak = list(generated)
+        finally:
+            generations_in_flight.dec(provider="busy-test")
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return during_peak
+
+    assert asyncio.run(run()) == []
+    assert generated == ["tides"]
+
+
+def test_reminder_content_404_until_prepared():
+    response = TestClient(app).get(
+        "/reminders/00000000-0000-0000-0000-000000000001/content", headers={"Authorization": "Bearer token"}
+    )
+    assert response.status_code == 404
+
+
+def test_reminder_content_only_for_its_owner(monkeypatch):
+    reminder_id = "00000000-0000-0000-0000-000000000002"
+    monkeypatch.setitem(reminders.reminder_scheduler._prepared, reminder_id, {
+        "reminder_id": reminder_id, "user_id": "someone-else", "topic": "tides", "generated_text": "secret",
+    })
+    client = TestClient(app)
+    assert client.get(f"/reminders/{reminder_id}/content").status_code == 401
+    # Dev mode verifies every token as test-user-id
+    headers = {"Authorization": "Bearer token"}
+    assert client.get(f"/reminders/{reminder_id}/content", headers=headers).status_code == 404
+    reminders.reminder_scheduler._prepared[reminder_id]["user_id"] = "test-user-id"
+    response = client.get(f"/reminders/{reminder_id}/content", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["generated_text"] == "secret"
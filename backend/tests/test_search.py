@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from backend.search import InvertedIndex, SearchIndexes, tokenize
+
+
+def _index() -> InvertedIndex:
+    index = InvertedIndex()
+    index.add_many([
+        ("a", "Marketing strategy for a small brand", "A"),
+        ("b", "Ten tweets about coffee and marketing, marketing, marketing", "B"),
+        ("c", "A blog post on remote work", "C"),
+    ])
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Café #Launch, día 2!") == ["café", "launch", "día", "2"]
+    assert tokenize(None) == []
+
+
+def test_bm25_ranks_by_term_frequency_and_rarity():
+    total, hits = _index().search("marketing")
+    assert total == 2
+    assert [payload for payload, _ in hits] == ["B", "A"]
+    # A rarer term outweighs a common one
+    total, hits = _index().search("marketing remote")
+    assert total == 3
+    assert hits[0][0] == "C"
+
+
+def test_prefix_matching_and_limit():
+    index = _index()
+    assert index.search("mark", prefix=False) == (0, [])
+    total, hits = index.search("mark strat", limit=1)
+    assert total == 2
+    assert [payload for payload, _ in hits] == ["A"]
+    assert index.search("zzz") == (0, [])
+
+
+def test_incremental_add_and_remove():
+    index = _index()
+    index.add("d", "Marketing newsletter", "D")
+    assert "D" in [payload for payload, _ in index.search("newsletter")[1]]
+    index.remove(["b", "missing"])
+    assert sorted(payload for payload, _ in index.search("marketing")[1]) == ["A", "D"]
+    # Re-adding an id replaces the old document
+    index.add("a", "Remote teams", "A2")
+    assert index.search("strategy") == (0, [])
+    assert len(index) == 3
+
+
+def test_compaction_keeps_results():
+    index = InvertedIndex()
+    index.add_many((str(n), f"note {n} common", n) for n in range(8))
+    index.remove(["0", "1", "2"])
+    assert index.stats()["deleted"] == 0  # compacted once a quarter was dead
+    total, hits = index.search("common", limit=10)
+    assert total == 5
+    assert sorted(payload for payload, _ in hits) == [3, 4, 5, 6, 7]
+    assert index.search("note 6")[1][0][0] == 6
+
+
+def test_indexes_build_once_and_replay_writes_made_while_loading():
+    loads = []
+    release = asyncio.Event()
+
+    async def loader(user, auth_token):
+        loads.append((user, auth_token))
+        await release.wait()
+        return [("1", "first draft", "one")]
+
+    async def run():
+        indexes = SearchIndexes(loader)
+        first = asyncio.create_task(indexes.get("u1", "tok"))
+        second = asyncio.create_task(indexes.get("u1", "tok"))
+        await asyncio.sleep(0)
+        # Writes during the load are applied to the built index
+        indexes.add("u1", "2", "second draft", "two")
+        indexes.remove(["1"])
+        indexes.add("u2", "3", "not loaded", "three")
+        release.set()
+        index = await first
+        assert await second is index
+        return indexes, index
+
+    indexes, index = asyncio.run(run())
+    assert loads == [("u1", "tok")]
+    total, hits = index.search("draft")
+    assert total == 1 and hits[0][0] == "two"
+    assert indexes.stats()["users"] == 1
+
+
+def test_indexes_rebuild_in_background_after_max_age():
+    now = [0.0]
+    versions = iter(["old", "new"])
+
+    async def loader(user, auth_token):
+        return [("1", next(versions), "doc")]
+
+    async def run():
+        indexes = SearchIndexes(loader, max_age=10, clock=lambda: now[0])
+        stale = await indexes.get("u")
+        now[0] = 11
+        # The expired index keeps answering while the new one loads
+        assert await indexes.get("u") is stale
+        await asyncio.sleep(0.05)
+        return stale, await indexes.get("u")
+
+    stale, fresh = asyncio.run(run())
+    assert fresh is not stale
+    assert fresh.search("new")[0] == 1
+
+
+def test_failed_builds_are_not_cached():
+    async def loader(user, auth_token):
+        raise RuntimeError("boom")
+
+    async def run():
+        indexes = SearchIndexes(loader)
+        with pytest.raises(RuntimeError):
+            await indexes.get("u")
+        return indexes.stats()
+
+    stats = asyncio.run(run())
+    assert stats["users"] == 0 and stats["build_failures"] == 1
@@ -0,0 +1,66 @@
+import asyncio
+
+from backend.providers.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+        return flights, results
+
+    flights, results = asyncio.run(run())
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4, "cancelled": 0}
+
+
+def test_leader_disconnect_does_not_cancel_followers():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def run():
+        flights = SingleFlight()
+        leader = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return flights, await follower, leader.cancelled()
+
+    flights, result, leader_cancelled = asyncio.run(run())
+    assert result == "result"
+    assert leader_cancelled
+    assert flights.cancelled == 0
+
+
+def test_last_waiter_leaving_cancels_upstream():
+    upstream_cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            upstream_cancelled.set()
+            raise
+
+    async def run():
+        flights = SingleFlight()
+        caller = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.wait_for(upstream_cancelled.wait(), 1)
+        return flights
+
+    flights = asyncio.run(run())
+    assert flights.stats()["cancelled"] == 1
+    assert flights.stats()["in_flight"] == 0
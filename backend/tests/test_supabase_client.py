@@ -0,0 +1,78 @@
+import asyncio
+
+import httpx
+
+from backend.supabase_client import SupabaseClient
+
+
+def _client_with(handler) -> SupabaseClient:
+    sb = SupabaseClient()
+    sb.base_url = "http://postgrest.test"
+    sb.headers["apikey"] = "anon-key"
+    sb._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return sb
+
+
+def test_shared_client_is_reused_and_counted():
+    """All operations go through one pooled client and update the counters."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json=[{"id": "1"}])
+        return httpx.Response(201, json=[{"id": "2"}])
+
+    async def run():
+        sb = _client_with(handler)
+        shared = sb._client
+        assert await sb.select("content_history") == [{"id": "1"}]
+        assert await sb.insert("content_history", {"x": 1}) == {"id": "2"}
+        assert sb._client is shared
+        stats = sb.pool_stats()
+        await sb.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["requests_total"] == 2
+    assert stats["in_flight"] == 0
+    assert stats["peak_in_flight"] == 1
+    assert stats["errors_total"] == 0
+
+
+def test_transport_errors_are_counted():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("boom")
+
+    async def run():
+        sb = _client_with(handler)
+        rows = await sb.select("content_history")
+        stats = sb.pool_stats()
+        await sb.close()
+        return rows, stats
+
+    rows, stats = asyncio.run(run())
+    assert rows == []
+    assert stats["errors_total"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_select_projects_columns_and_count_reads_content_range():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"content-range": "0-24/3573"})
+        return httpx.Response(200, json=[{"id": "1", "email": "a@b.c"}])
+
+    async def run():
+        sb = _client_with(handler)
+        rows = await sb.select("users", columns="id,email", limit=1)
+        total = await sb.count("users")
+        await sb.close()
+        return rows, total
+
+    rows, total = asyncio.run(run())
+    assert rows == [{"id": "1", "email": "a@b.c"}]
+    assert total == 3573
+    assert seen[0].url.params["select"] == "id,email"
+    assert seen[0].url.params["limit"] == "1"
+    assert seen[1].headers["prefer"] == "count=exact"
@@ -0,0 +1,159 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.routers import history
+from backend.supabase_client import supabase_client
+from backend.writebehind import WriteBehindBuffer
+
+
+class FakeWriter:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches: list[tuple[list, object]] = []
+
+    async def __call__(self, table, rows, auth_token):
+        if self.failures:
+            self.failures -= 1
+            return None
+        self.batches.append((rows, auth_token))
+        return rows
+
+
+def test_flushes_when_batch_is_full():
+    writer = FakeWriter()
+
+    async def run():
+        buffer = WriteBehindBuffer("t", writer, max_batch=3, flush_interval=60)
+        await buffer.start()
+        for n in range(3):
+            buffer.add({"n": n})
+        await asyncio.sleep(0.01)
+        buffer.add({"n": 3})
+        await asyncio.sleep(0.01)
+        depth = buffer.stats()["depth"]
+        await buffer.stop()
+        return depth
+
+    # The size threshold flushed three rows; stop() flushed the remainder
+    assert asyncio.run(run()) == 1
+    assert [len(rows) for rows, _ in writer.batches] == [3, 1]
+
+
+def test_flush_splits_batches_by_auth_token():
+    writer = FakeWriter()
+
+    async def run():
+        buffer = WriteBehindBuffer("t", writer, max_batch=10, flush_interval=0.01)
+        await buffer.start()
+        buffer.add({"n": 1}, auth_token="alice")
+        buffer.add({"n": 2}, auth_token="bob")
+        buffer.add({"n": 3}, auth_token="alice")
+        await asyncio.sleep(0.05)
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert sorted((token, len(rows)) for rows, token in writer.batches) == [("alice", 2), ("bob", 1)]
+
+
+def test_failed_flush_retries_with_backoff_then_keeps_rows():
+    writer = FakeWriter(failures=3)
+
+    async def run():
+        buffer = WriteBehindBuffer("t", writer, max_batch=10, max_retries=1, backoff=0.001)
+        await buffer.start()
+        buffer.add({"n": 1})
+        await buffer.flush()  # initial attempt + 1 retry, both fail
+        kept = buffer.stats()["depth"]
+        await buffer.flush()  # fails once more, then succeeds on retry
+        stats = buffer.stats()
+        await buffer.stop()
+        return kept, stats
+
+    kept, stats = asyncio.run(run())
+    assert kept == 1
+    assert stats["depth"] == 0 and stats["failures"] == 3
+    assert len(writer.batches) == 1
+
+
+def test_final_flush_drops_rows_it_cannot_write():
+    writer = FakeWriter(failures=100)
+
+    async def run():
+        buffer = WriteBehindBuffer("t", writer, max_retries=1, backoff=0.001, flush_interval=60)
+        await buffer.start()
+        buffer.add({"n": 1})
+        await buffer.stop()
+        return buffer.stats()
+
+    stats = asyncio.run(run())
+    assert stats["dropped"] == 1 and stats["depth"] == 0
+
+
+def test_rows_that_keep_failing_are_dropped_after_max_flushes():
+    writer = FakeWriter(failures=100)
+
+    async def run():
+        buffer = WriteBehindBuffer("t", writer, max_retries=0, max_flushes=3, flush_interval=60)
+        await buffer.start()
+        buffer.add({"n": 1})
+        depths = []
+        for _ in range(3):
+            await buffer.flush()
+            depths.append(buffer.stats()["depth"])
+        stats = buffer.stats()
+        await buffer.stop()
+        return depths, stats
+
+    depths, stats = asyncio.run(run())
+    assert depths == [1, 1, 0]
+    assert stats["failures"] == 3 and stats["dropped"] == 1
+
+
+def test_cancelled_flush_keeps_rows_that_already_failed():
+    async def writer(table, rows, auth_token):
+        if auth_token == "alice":
+            return None
+        await asyncio.Event().wait()  # bob's insert never finishes
+
+    async def run():
+        buffer = WriteBehindBuffer("t", writer, max_retries=0, flush_interval=60)
+        await buffer.start()
+        buffer.add({"n": 1}, auth_token="alice")
+        buffer.add({"n": 2}, auth_token="bob")
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.01)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        return buffer.stats()["depth"]
+
+    assert asyncio.run(run()) == 2
+
+
+def test_history_create_is_acknowledged_then_flushed_on_shutdown(monkeypatch):
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(201, json=json.loads(request.content))
+
+    monkeypatch.setattr(history, "HISTORY_WRITE_BEHIND", True)
+    monkeypatch.setattr(history.history_buffer, "flush_interval", 60)
+    monkeypatch.setattr(supabase_client, "base_url", "http://postgrest.test")
+    monkeypatch.setitem(supabase_client.headers, "apikey", "anon-key")
+    monkeypatch.setattr(supabase_client, "open", lambda: asyncio.sleep(0))
+    monkeypatch.setattr(supabase_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    body = {"type": "tweet", "input_text": "t", "generated_text": "g", "user_id": "u"}
+    with TestClient(app) as client:
+        response = client.post("/history/", json=body)
+        assert response.status_code == 202
+        assert response.json()["id"]
+        assert requests == []
+
+    (request,) = requests
+    assert "resolution=ignore-duplicates" in request.headers["prefer"]
+    assert json.loads(request.content)[0]["id"] == response.json()["id"]
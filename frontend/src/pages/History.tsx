@@ -13,11 +13,18 @@ interface HistoryItem {
   created_at: string
 }
 
+interface HistoryPage {
+  items: HistoryItem[]
+  next_cursor: string | null
+}
+
 export default function History() {
   const { session } = useAuth()
   const [filter, setFilter] = useState<ContentType | 'all'>('all')
   const [items, setItems] = useState<HistoryItem[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [copiedId, setCopiedId] = useState<string | null>(null)
   const [expandedId, setExpandedId] = useState<string | null>(null)
 
@@ -25,23 +32,28 @@ export default function History() {
     fetchHistory()
   }, [filter])
 
-  const fetchHistory = async () => {
-    setLoading(true)
+  const fetchHistory = async (cursor?: string) => {
+    if (cursor) setLoadingMore(true)
+    else setLoading(true)
     try {
       const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000'
-      const url = filter === 'all' 
-        ? `${apiUrl}/history/`
-        : `${apiUrl}/history/?type=${filter}`
+      const params = new URLSearchParams()
+      if (filter !== 'all') params.set('type', filter)
+      if (cursor) params.set('cursor', cursor)
+      const query = params.toString()
+      const url = query ? `${apiUrl}/history/?${query}` : `${apiUrl}/history/`
       
       const headers: Record<string, string> = {}
       if (session?.access_token) headers['Authorization'] = `Bearer ${session.access_token}`
       const response = await fetch(url, { headers })
-      const data = await response.json()
-      setItems(data)
+      const data: HistoryPage = await response.json()
+      setItems(prev => (cursor ? [...prev, ...data.items] : data.items))
+      setNextCursor(data.next_cursor)
     } catch (error) {
       console.error('Failed to fetch history:', error)
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
@@ -180,6 +192,17 @@ export default function History() {
                 </div>
               )
             })}
+            {nextCursor && (
+              <div className="text-center pt-2">
+                <button
+                  onClick={() => fetchHistory(nextCursor)}
+                  disabled={loadingMore}
+                  className="px-4 py-2 bg-white/20 text-white rounded-lg hover:bg-white/30 transition disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>